@@ -1,10 +1,49 @@
 import os
 import json
+import time
+import inspect
+import logging
+import contextvars
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from transport import get_shared_transport, env_flag
+from streaming import iter_completion_deltas
+import metrics
+import logs
+from singleflight import get_shared_single_flight, request_key
+from json_repair import parse_llm_json, SchemaError, mark_truncated, is_truncated
+from hedging import Hedger, hedging_enabled
+from routing import get_shared_router
+from backends import get_shared_backends
+from cache import normalize_framework_name, normalize_text
+from resilience import (Timeouts, RetryPolicy, UpstreamError, get_shared_breaker, remaining, check_deadline,
+                        parse_retry_after, RETRYABLE_STATUSES, CIRCUIT_OPEN_ERROR, DEADLINE_ERROR)
 
 load_dotenv()  # Load environment variables from .env file
 
+logger = logging.getLogger(__name__)
+
+# Instructions sent as the system message of every call, by every agent. They are kept
+# byte-identical (no per-agent wording, no per-call values) so the API's prompt cache can
+# reuse them across endpoints; whatever varies goes in the messages after them.
+SHARED_INSTRUCTIONS = """You are a decision-making framework expert. You help people choose, understand, apply and \
+compare decision-making frameworks, such as SWOT analysis, the Eisenhower Matrix or a cost-benefit analysis, for the \
+decisions they face at work and in life.
+
+Each request consists of these instructions, then the user's situation if the request concerns one, then the task \
+to carry out. Follow the task for what to produce, and take the situation into account wherever the task refers to it.
+
+Guidelines for every answer:
+- Be specific to the user's situation and goals rather than generic.
+- Use plain language, and explain any term a non-expert may not know.
+- Keep every field concise; do not repeat the situation back to the user.
+- Use exactly the fields the task asks for, with the types it asks for.
+
+Your entire response must be valid JSON that can be parsed with json.loads(). Do not include any explanatory text \
+before or after the JSON, and do not wrap it in code fences."""
+
+
 class BaseAgent:
     """
     Base agent class that all other agents inherit from.
@@ -15,33 +54,152 @@ class BaseAgent:
     
     The BaseAgent establishes a consistent interface for all agents in the system and
     centralizes configuration like model selection and token limits.
+    
+    Agents whose answer is a JSON object ask the API for JSON output (response_format
+    json_object) unless LLM_JSON_MODE is turned off. JSON mode only produces objects,
+    so agents that answer with an array set JSON_OUTPUT to "array" and rely on the prompt.
+    
+    max_tokens is the agent's token budget: no call may ask for more. Within it, each
+    call asks for what the caller actually needs (output_budget), so a request for two
+    frameworks does not reserve room for ten. Agents set BASE_TOKENS and TOKENS_PER_ITEM
+    to size their responses and MAX_TOKENS_ENV to make the budget configurable.
+    
+    Unless a model is passed in, the model of each call is picked by the shared
+    ModelRouter (see routing.py) from the agent's ROUTE, the prompt size and the
+    route's latency SLO. self.model is the route's primary model; caches and
+    per-agent metrics are keyed on it.
+    
+    Requests are sent to the backends of the shared BackendPool (see backends.py): the
+    OpenAI API by default, or any OpenAI-compatible servers listed in LLM_BACKENDS.
+    The pool picks a backend serving the call's model for every attempt and adapts the
+    request to it (credentials, served model name, JSON mode).
+    
+    Messages are laid out so that calls share the longest possible byte-identical
+    prefix, which the API serves from its prompt cache: SHARED_INSTRUCTIONS as the
+    system message, then the user's situation, then the agent's task prompt and the
+    details of the call (see compose_messages).
     """
     
-    def __init__(self, model="gpt-4o-mini", max_tokens=1024):
+    JSON_OUTPUT = "object"
+    ROUTE = None  # Routing entry of the agent's calls, e.g. "parse"
+    MAX_TOKENS_ENV = None
+    BASE_TOKENS = None  # Tokens for a response without list items; None to always use max_tokens
+    TOKENS_PER_ITEM = 0
+    
+    def __init__(self, model=None, max_tokens=None, transport=None):
         """
         Initialize the BaseAgent with model configuration.
         
         Args:
-            model (str): The name of the language model to use (default: "gpt-4o-mini")
-            max_tokens (int): Maximum number of tokens in the response (default: 1024)
+            model (str): The name of the language model to use for every call
+                         (default: routed per call, or "gpt-4o-mini" with LLM_ROUTING off)
+            max_tokens (int): Most tokens any response may use (env MAX_TOKENS_ENV, default: 1024)
+            transport (PooledTransport): HTTP transport to send requests through
+                                         (default: the process-wide shared transport)
         """
+        if max_tokens is None:
+            max_tokens = int(os.getenv(self.MAX_TOKENS_ENV, '1024')) if self.MAX_TOKENS_ENV else 1024
+        # None when the model is pinned or LLM_ROUTING is off
+        self.router = get_shared_router() if model is None and self.ROUTE else None
+        if model is None:
+            model = self.router.primary_model(self.ROUTE) if self.router else "gpt-4o-mini"
         self.api_key = os.getenv('OPENAI_API_KEY')
         self.model = model
         self.max_tokens = max_tokens
+        self.transport = transport or get_shared_transport()
+        self.backends = get_shared_backends()
+        self.single_flight = get_shared_single_flight()  # None when LLM_SINGLE_FLIGHT is off
+        self.json_mode = env_flag('LLM_JSON_MODE', True) and self.JSON_OUTPUT == "object"
+        self.hedger = Hedger() if hedging_enabled() else None  # Tracks this agent's own latencies
+        self.timeouts = Timeouts()
+        self.retry_policy = RetryPolicy()
+        self.breaker = get_shared_breaker()  # None when LLM_CIRCUIT_BREAKER is off
         
-    def call_llm(self, messages):
+    def output_budget(self, items=0):
         """
-        Call the language model with the given messages.
+        Work out max_tokens for a response holding the given number of list items.
         
-        This method handles the API request to the language model service,
-        including authentication and error handling.
+        Args:
+            items (int): Items the caller needs, e.g. frameworks or questions (default: 0)
+        
+        Returns:
+            int: Tokens for that much output, never more than the agent's max_tokens
+        """
+        if self.BASE_TOKENS is None:
+            return self.max_tokens
+        return min(self.max_tokens, self.BASE_TOKENS + self.TOKENS_PER_ITEM * max(int(items), 0))
+        
+    def pick_model(self, messages, route=None):
+        """
+        Choose the model for one call.
+        
+        Args:
+            messages (list): The messages of the call; their length counts as the input size
+            route (str): Route of the call (default: the agent's ROUTE)
+        
+        Returns:
+            str: The routed model, or the agent's model when it is pinned or routing is off
+        """
+        if self.router is None:
+            return self.model
+        input_chars = sum(len(message.get('content') or '') for message in messages)
+        return self.router.choose(route or self.ROUTE, input_chars)
+    
+    def get_system_prompt(self):
+        """
+        Return the system prompt, which is the same for every agent and every call.
+        
+        Returns:
+            str: SHARED_INSTRUCTIONS
+        """
+        return SHARED_INSTRUCTIONS
+    
+    def get_task_prompt(self):
+        """
+        Define the instructions for the agent's task. Subclasses override this.
+        
+        Returns:
+            str: The task instructions, without leading indentation
+        """
+        return ""
+    
+    def compose_messages(self, request, situation=None, task=None):
+        """
+        Build the chat messages of a call, most widely shared content first.
+        
+        The system message is identical for every call, the situation message is
+        identical for every call about the same situation whatever the endpoint, and
+        the task prompt is identical for every call of the same kind. Only the request
+        at the very end differs, so the prompt cache can reuse everything before it.
+        
+        Args:
+            request (str): What this call asks for, e.g. "Apply the SWOT Analysis framework."
+            situation (str): The user's situation, or None if the call has none
+            task (str): Task instructions (default: get_task_prompt())
+        
+        Returns:
+            list: The system and user messages to send to the language model
+        """
+        messages = [{'role': 'system', 'content': self.get_system_prompt()}]
+        if situation is not None:
+            messages.append({'role': 'user', 'content': f"My situation: {str(situation).strip()}"})
+        if task is None:
+            task = self.get_task_prompt()
+        messages.append({'role': 'user', 'content': f"{task}\n\n{request}"})
+        return messages
+    
+    def build_request(self, messages, stream=False, max_tokens=None, model=None):
+        """
+        Build the headers and JSON body for a chat-completions request.
         
         Args:
             messages (list): A list of message objects with 'role' and 'content' keys
-                            following the chat completion format
+            stream (bool): Whether to ask the API to stream the response (default: False)
+            max_tokens (int): Token limit for this call (default: the agent's max_tokens)
+            model (str): Model for this call (default: the agent's model)
         
         Returns:
-            dict: The JSON response from the language model API or an error object
+            tuple: (headers, data) ready to be sent to the API
         """
         headers = {
             'Authorization': f'Bearer {self.api_key}',
@@ -49,23 +207,324 @@ class BaseAgent:
         }
         
         data = {
-            'model': self.model,
+            'model': model or self.model,
             'messages': messages,
-            'max_tokens': self.max_tokens
+            'max_tokens': max_tokens or self.max_tokens
         }
+        if self.json_mode:
+            data['response_format'] = {'type': 'json_object'}
+        if stream:
+            data['stream'] = True
+        
+        return headers, data
+    
+    def parse_json_content(self, response, label, limit=None):
+        """
+        Extract the message content from a completion response and parse it as JSON.
+        
+        Fenced, wrapped and truncated JSON is repaired where possible, and the result is
+        checked against the response schema registered for the label in json_repair.SCHEMAS.
+        
+        Args:
+            response (dict): The JSON response from the language model API
+            label (str): Name of the calling method, used in log messages and as the schema name
+            limit (int): Keep only this many items of an array result (default: None, keep all)
+        
+        Returns:
+            The parsed JSON value, or a dict with an 'error' key if something went wrong
+        """
+        if "error" in response:
+            return response
+        
+        content = None
+        try:
+            # Extract the content from the response
+            if 'choices' in response and len(response['choices']) > 0:
+                content = response['choices'][0]['message']['content']
+                
+                # Log the extracted content
+                logs.debug_payload(logger, "llm.content", content, label=label)
+                
+                # Parse the JSON from the content
+                value = parse_llm_json(content, self.model, label)
+                returned = value[:limit] if limit is not None and isinstance(value, list) else value
+                if is_truncated(value):
+                    returned = mark_truncated(returned)  # Slicing drops the flag
+                metrics.record_returned_tokens(self.model, response.get('usage'), value, returned)
+                return returned
+            else:
+                metrics.count_parse_failure(self.model)
+                return {"error": "No valid choices in LLM response"}
+                
+        except json.JSONDecodeError as e:
+            logs.log_event(logger, logging.WARNING, "llm.parse_failed", label=label, error=str(e), content=content)
+            return {"error": f"Failed to parse JSON from LLM response: {str(e)}"}
+        except SchemaError as e:
+            logs.log_event(logger, logging.WARNING, "llm.schema_invalid", label=label, error=str(e), content=content)
+            return {"error": f"LLM response did not have the expected format: {str(e)}"}
+        except Exception as e:
+            return {"error": f"Error processing LLM response: {str(e)}"}
+    
+    def call_llm(self, messages, max_tokens=None, route=None):
+        """
+        Call the language model with the given messages.
+        
+        This method handles the API request to the language model service,
+        including authentication and error handling. Requests go through the
+        agent's pooled transport so warm connections are reused between calls.
+        
+        Identical requests that are already in flight (same model, messages and
+        parameters) are not sent again: the caller waits for the running request
+        and shares its response.
+        
+        With LLM_HEDGING on, a call that takes longer than usual for this agent is
+        hedged with a second identical request and the faster response is used.
+        
+        Calls never outlive the deadline of the request being handled: rate limits,
+        server errors and connection failures are retried with jittered backoff only
+        while time is left, and calls are refused outright while the circuit breaker
+        is open.
+        
+        Args:
+            messages (list): A list of message objects with 'role' and 'content' keys
+                            following the chat completion format
+            max_tokens (int): Token limit for this call (default: the agent's max_tokens)
+            route (str): Route the model is picked by (default: the agent's ROUTE)
+        
+        Returns:
+            dict: The JSON response from the language model API or an error object
+        """
+        route = route or self.ROUTE
+        headers, data = self.build_request(messages, max_tokens=max_tokens, model=self.pick_model(messages, route))
         
         # Log the data being sent to the LLM
-        print("Data sent to LLM:")
-        print(json.dumps(data, indent=4))
+        logs.debug_payload(logger, "llm.request", data)
+        
+        if self.single_flight is None:
+            return self.send_with_retries(headers, data, route)
         
-        response = requests.post('https://api.openai.com/v1/chat/completions', 
-                                headers=headers, 
-                                json=data)
+        result, shared = self.single_flight.do(request_key(data), lambda: self.send_with_retries(headers, data, route),
+                                               shareable=self.shareable)
+        if shared:
+            metrics.count_coalesced(data['model'])
+        return result
+    
+    @staticmethod
+    def shareable(result):
+        """
+        Check whether the result of a coalesced call may be handed to the calls that waited for it.
+        
+        A deadline error only means the leading request ran out of time; the requests
+        waiting for it have deadlines of their own and make their own call instead.
+        
+        Args:
+            result (dict): The leader's response or error object
+        
+        Returns:
+            bool: False for a deadline error
+        """
+        return not (isinstance(result, dict) and result.get('error') == DEADLINE_ERROR)
+    
+    def send_with_retries(self, headers, data, route=None):
+        """
+        Send a request, retrying retryable failures while the deadline and circuit breaker allow.
+        
+        Args:
+            headers (dict): Request headers from build_request
+            data (dict): Request body from build_request
+            route (str): Route of the call, to record its latency against (default: None)
+        
+        Returns:
+            dict: The JSON response from the language model API or an error object
+        
+        Raises:
+            requests.RequestException: If the last attempt failed without a response
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            left = remaining()
+            if left is not None and left <= 0:
+                return {"error": DEADLINE_ERROR}
+            if self.breaker is not None and not self.breaker.allow():
+                metrics.count_circuit_rejection(data['model'])
+                return {"error": CIRCUIT_OPEN_ERROR}
+            
+            try:
+                result = self.send_hedged(headers, data, route)
+            except UpstreamError as e:
+                error, reason, retry_after = e, str(e.status), e.retry_after
+            except requests.RequestException as e:
+                error, reason, retry_after = e, 'timeout' if isinstance(e, requests.Timeout) else 'connection', None
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()  # Interrupted, or failed in a way that says nothing about the API
+                raise
+            else:
+                if self.breaker is not None:
+                    self.breaker.record(failed=False)
+                return result
+            
+            if self.breaker is not None:
+                self.breaker.record(failed=True)
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            if delay is None:
+                break
+            metrics.count_retry(data['model'], reason)
+            logs.log_event(logger, logging.WARNING, "llm.retry", model=data['model'], attempt=attempt,
+                           reason=reason, delay_ms=round(delay * 1000, 1))
+            time.sleep(delay)
+        
+        if isinstance(error, UpstreamError):
+            return {"error": f"Failed to call LLM: {error.body}"}
+        left = remaining()
+        if left is not None and left <= 0:
+            return {"error": DEADLINE_ERROR}  # Timed out because the request ran out of time
+        raise error
+    
+    def send_hedged(self, headers, data, route=None):
+        """
+        Send a request, hedging it with a second one if it is slow and hedging is on.
+        
+        Args:
+            headers (dict): Request headers from build_request
+            data (dict): Request body from build_request
+            route (str): Route of the call, to record its latency against (default: None)
+        
+        Returns:
+            dict: The JSON response from the language model API or an error object
+        """
+        if self.hedger is None:
+            return self.send_request(headers, data, route)
+        return self.hedger.call(lambda: self.send_request(headers, data, route), data['model'])
+    
+    def send_request(self, headers, data, route=None):
+        """
+        Send one chat-completions request and record its latency, status and token usage.
+        
+        The backend pool picks the server the request goes to. The latency of a
+        successful call is also reported to the router, which falls the route back to a
+        faster tier if it breaches its SLO.
+        
+        Args:
+            headers (dict): Request headers from build_request
+            data (dict): Request body from build_request
+            route (str): Route of the call, to record its latency against (default: None)
+        
+        Returns:
+            dict: The JSON response from the language model API or an error object
+        
+        Raises:
+            UpstreamError: For a rate limit or server error that is worth retrying
+            requests.RequestException: If no response arrived in time
+        """
+        model = data['model']
+        backend = self.backends.choose(model)
+        if backend is None:
+            return {"error": f"No LLM backend serves the model {model}"}
+        headers, body = backend.prepare(headers, data)
+        
+        start = time.perf_counter()
+        try:
+            response = self.transport.post('/chat/completions',
+                                           base_url=backend.base_url,
+                                           headers=headers,
+                                           json=body,
+                                           timeout=self.timeouts.current())
+        except Exception as e:
+            metrics.observe_upstream(model, time.perf_counter() - start, None)
+            self.backends.record(backend, None)
+            logs.log_event(logger, logging.WARNING, "llm.connection_failed", model=model, backend=backend.name,
+                           error=str(e))
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe_upstream(model, elapsed, response.status_code)
+        self.backends.record(backend, response.status_code)
         
         if response.status_code == 200:
-            return response.json()
+            result = response.json()
+            metrics.record_usage(model, result.get('usage'), data.get('max_tokens'))
+            if self.router is not None and route:
+                self.router.observe(route, model, elapsed)
+            logs.log_event(logger, logging.INFO, "llm.call", sample=True, model=model, backend=backend.name,
+                           duration_ms=round(elapsed * 1000, 1), usage=result.get('usage'))
+            logs.debug_payload(logger, "llm.response", result)
+            return result
         else:
+            logs.log_event(logger, logging.WARNING, "llm.call_failed", model=model, backend=backend.name,
+                           status=response.status_code, duration_ms=round(elapsed * 1000, 1), body=response.text)
+            if response.status_code in RETRYABLE_STATUSES:
+                raise UpstreamError(response.status_code, response.text,
+                                    parse_retry_after(response.headers.get('Retry-After')))
             return {"error": f"Failed to call LLM: {response.text}"}
+    
+    def stream_llm(self, messages, max_tokens=None, route=None):
+        """
+        Call the language model with streaming enabled and yield content as it is generated.
+        
+        The upstream connection is closed as soon as the caller stops iterating, so
+        abandoning the generator early (e.g. once enough items have arrived or the
+        browser disconnects) also stops paying for the rest of the generation. A stream
+        is not retried once it has started, and it is stopped when the request's
+        deadline passes.
+        
+        Args:
+            messages (list): A list of message objects with 'role' and 'content' keys
+                            following the chat completion format
+            max_tokens (int): Token limit for this call (default: the agent's max_tokens)
+            route (str): Route the model is picked by (default: the agent's ROUTE)
+        
+        Yields:
+            str: Each piece of generated content in order
+        
+        Raises:
+            RuntimeError: If the API rejects the request, no backend can stream the model
+                          or the circuit breaker is open
+            DeadlineExceeded: If the request's deadline passes during the stream
+        """
+        model = self.pick_model(messages, route)
+        headers, data = self.build_request(messages, stream=True, max_tokens=max_tokens, model=model)
+        
+        # Log the data being sent to the LLM
+        logs.debug_payload(logger, "llm.request", data, stream=True)
+        
+        check_deadline()
+        backend = self.backends.choose(model, stream=True)
+        if backend is None:
+            raise RuntimeError(f"No LLM backend can stream the model {model}")
+        headers, body = backend.prepare(headers, data)
+        if self.breaker is not None and not self.breaker.allow():
+            metrics.count_circuit_rejection(model)
+            raise RuntimeError(CIRCUIT_OPEN_ERROR)
+        
+        start = time.perf_counter()
+        try:
+            response = self.transport.post('/chat/completions',
+                                           base_url=backend.base_url,
+                                           headers=headers,
+                                           json=body,
+                                           stream=True,
+                                           timeout=self.timeouts.current())
+        except Exception:
+            metrics.observe_upstream(model, time.perf_counter() - start, None)
+            self.backends.record(backend, None)
+            if self.breaker is not None:
+                self.breaker.record(failed=True)
+            raise
+        self.backends.record(backend, response.status_code)
+        if self.breaker is not None:
+            self.breaker.record(failed=response.status_code in RETRYABLE_STATUSES)
+        try:
+            if response.status_code != 200:
+                raise RuntimeError(f"Failed to call LLM: {response.text}")
+            lines = response.iter_lines(decode_unicode=True)
+            for delta in iter_completion_deltas(lines):
+                check_deadline()
+                yield delta
+        finally:
+            response.close()
+            # Upstream latency of a stream covers the whole generation, until it ended or was abandoned
+            metrics.observe_upstream(model, time.perf_counter() - start, response.status_code)
 
 
 class FrameworkSuggesterAgent(BaseAgent):
@@ -79,40 +538,154 @@ class FrameworkSuggesterAgent(BaseAgent):
     
     The FrameworkSuggesterAgent serves as the entry point for users seeking guidance
     on which decision-making approaches might be most effective for their needs.
+    
+    Suggestions for near-identical situations can be served from a similarity cache,
+    repeated situations from the shared result cache of all workers, and situations
+    that clearly match frameworks in the local catalog can be answered by the retriever
+    without an LLM call. Bump PROMPT_VERSION whenever get_task_prompt or SHARED_INSTRUCTIONS
+    changes so stale entries are not served.
+    
+    The model is asked for exactly as many frameworks as the caller wants, and max_tokens
+    is sized for that many, so no tokens are spent on frameworks that would be cut off.
     """
     
-    def __init__(self, model="gpt-4o-mini", max_tokens=1024):
+    ROUTE = "parse"
+    PROMPT_VERSION = "3"
+    JSON_OUTPUT = "array"
+    MAX_TOKENS_ENV = "PARSE_MAX_TOKENS"
+    BASE_TOKENS = 40
+    TOKENS_PER_ITEM = 110  # A name plus a sentence or two of description and strengths
+    
+    def __init__(self, model=None, max_tokens=None, transport=None, cache=None, retriever=None, result_cache=None):
         """
         Initialize the FrameworkSuggesterAgent with model configuration.
         
         Args:
-            model (str): The name of the language model to use (default: "gpt-4o-mini")
-            max_tokens (int): Maximum number of tokens in the response (default: 1024)
+            model (str): The name of the language model to use (default: routed per call)
+            max_tokens (int): Most tokens any response may use (env PARSE_MAX_TOKENS, default: 1024)
+            transport (PooledTransport): HTTP transport to send requests through (default: shared transport)
+            cache (SimilarityCache): Near-duplicate cache for suggestions (default: None, no caching)
+            retriever (FrameworkRetriever): Local catalog search for confident matches (default: None, always use the LLM)
+            result_cache (ResultCache): Exact-match cache shared by all workers (default: None, no sharing)
         """
-        super().__init__(model, max_tokens)
+        super().__init__(model, max_tokens, transport)
+        self.cache = cache
+        self.retriever = retriever
+        self.result_cache = result_cache
+    
+    def get_cached_suggestions(self, user_input, num_frameworks=1):
+        """
+        Look up suggestions previously generated for a near-identical situation.
         
-    def get_system_prompt(self):
+        The similarity cache of this process is checked first, then the shared result
+        cache for the exact situation; shared hits are added to the similarity cache.
+        
+        Args:
+            user_input (str): The user's description of their situation
+            num_frameworks (int): Number of frameworks wanted; shorter cached lists are not served (default: 1)
+        
+        Returns:
+            list: The cached list of frameworks, or None if there is no cache or no close match
+                  with enough frameworks
         """
-        Define the system prompt that instructs the language model how to respond.
+        if not user_input:
+            return None
+        if self.cache is not None:
+            match = self.cache.get(user_input, namespace=f"{self.model}|{self.PROMPT_VERSION}")
+            if match is not None and len(match[0]) >= num_frameworks:
+                return match[0]
+        if self.result_cache is None:
+            return None
+        frameworks = self.result_cache.lookup(self.result_key(user_input))
+        if frameworks is None or len(frameworks) < num_frameworks:
+            return None
+        if self.cache is not None:
+            self.cache.set(user_input, frameworks, namespace=f"{self.model}|{self.PROMPT_VERSION}")
+        return frameworks
+    
+    def result_key(self, user_input):
+        """
+        Build the shared result cache key for a situation.
         
-        This prompt guides the model to act as a decision-making framework expert
-        and format its responses in a consistent JSON structure.
+        Args:
+            user_input (str): The user's description of their situation
         
         Returns:
-            str: The system prompt for the language model
+            str: The cache key
+        """
+        return self.result_cache.make_key("parse", self.model, self.PROMPT_VERSION, normalize_text(user_input))
+    
+    def get_retrieved_suggestions(self, user_input, num_frameworks=2, quality="auto"):
         """
-        return """You are a decision-making framework expert. Your task is to suggest the most appropriate 
-        decision-making frameworks for the user's situation. For each framework, provide:
-        1. The name of the framework
-        2. A brief description of the framework
-        3. The key strengths of the framework for this specific situation
+        Suggest frameworks from the local catalog, without an LLM call.
         
-        Format your response as a JSON array of objects, with each object containing 'name', 'description', and 'strengths' fields.
+        Args:
+            user_input (str): The user's description of their situation
+            num_frameworks (int): Number of frameworks wanted (default: 2)
+            quality (str): "llm" to skip retrieval and always ask the model (default: "auto")
         
-        IMPORTANT: Your entire response must be valid JSON that can be parsed with json.loads(). Do not include any explanatory text before or after the JSON.
+        Returns:
+            list: The retrieved frameworks, or None if retrieval is off, skipped or not confident
         """
+        if self.retriever is None or not user_input:
+            return None
+        if self.breaker is not None and self.breaker.is_open():
+            # The model is unavailable, so the best catalog matches beat an error whatever their score
+            logs.log_event(logger, logging.WARNING, "parse.degraded", reason="circuit_open")
+            return self.retriever.suggest(user_input, num_frameworks, min_score=0.0, min_margin=0.0)
+        if quality == "llm":
+            return None
+        return self.retriever.suggest(user_input, num_frameworks)
     
-    def suggest_frameworks(self, user_input):
+    def cache_suggestions(self, user_input, frameworks):
+        """
+        Store generated suggestions for later near-identical situations.
+        
+        Args:
+            user_input (str): The user's description of their situation
+            frameworks (list): The parsed list of frameworks; truncated output is not cached
+        """
+        if not user_input or not isinstance(frameworks, list) or is_truncated(frameworks):
+            return
+        if self.cache is not None:
+            self.cache.set(user_input, frameworks, namespace=f"{self.model}|{self.PROMPT_VERSION}")
+        if self.result_cache is not None:
+            self.result_cache.store(self.result_key(user_input), frameworks)
+        
+    def get_task_prompt(self):
+        """
+        Define the task prompt that instructs the language model how to respond.
+        
+        This prompt asks for framework suggestions for the situation and a
+        consistent JSON structure.
+        
+        Returns:
+            str: The task prompt for the language model
+        """
+        return inspect.cleandoc("""
+            Your task is to suggest the most appropriate decision-making frameworks for the user's situation,
+            exactly as many as the request asks for, best fit first. For each framework, provide:
+            1. The name of the framework
+            2. A brief description of the framework, in one sentence
+            3. The key strengths of the framework for this specific situation, in one or two sentences
+        
+            Format your response as a JSON array of objects, with each object containing 'name', 'description', and 'strengths' fields.
+            """)
+    
+    def build_messages(self, user_input, num_frameworks=2):
+        """
+        Build the chat messages for a suggestion request.
+        
+        Args:
+            user_input (str): The user's description of their situation or decision-making challenge
+            num_frameworks (int): Number of frameworks to ask for (default: 2)
+        
+        Returns:
+            list: The system and user messages to send to the language model
+        """
+        return self.compose_messages(f"Suggest {num_frameworks} frameworks.", situation=user_input)
+    
+    def suggest_frameworks(self, user_input, num_frameworks=2, quality="auto"):
         """
         Suggest frameworks based on user input.
         
@@ -121,43 +694,28 @@ class FrameworkSuggesterAgent(BaseAgent):
         
         Args:
             user_input (str): The user's description of their situation or decision-making challenge
+            num_frameworks (int): Number of frameworks wanted (default: 2)
+            quality (str): "llm" to skip local retrieval and always ask the model (default: "auto")
         
         Returns:
-            list: A list of framework objects, each containing 'name', 'description', and 'strengths'
-                 or a dict with an 'error' key if something went wrong
+            list: At most num_frameworks framework objects, each containing 'name', 'description',
+                 and 'strengths', or a dict with an 'error' key if something went wrong
         """
-        messages = [
-            {'role': 'system', 'content': self.get_system_prompt()},
-            {'role': 'user', 'content': user_input}
-        ]
+        cached = self.get_cached_suggestions(user_input, num_frameworks)
+        if cached is not None:
+            return cached[:num_frameworks]
         
-        response = self.call_llm(messages)
+        retrieved = self.get_retrieved_suggestions(user_input, num_frameworks, quality)
+        if retrieved is not None:
+            return retrieved
         
-        if "error" in response:
-            return response
+        messages = self.build_messages(user_input, num_frameworks)
         
-        try:
-            # Extract the content from the response
-            if 'choices' in response and len(response['choices']) > 0:
-                content = response['choices'][0]['message']['content']
-                
-                # Log the extracted content
-                print("Extracted Content in suggest_frameworks:")
-                print(content)
-                
-                # Parse the JSON from the content
-                frameworks = json.loads(content)
-                return frameworks
-            else:
-                return {"error": "No valid choices in LLM response"}
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            print("Content that failed to parse:")
-            print(content)
-            return {"error": f"Failed to parse JSON from LLM response: {str(e)}"}
-        except Exception as e:
-            return {"error": f"Error processing LLM response: {str(e)}"}
+        response = self.call_llm(messages, max_tokens=self.output_budget(num_frameworks))
+        
+        frameworks = self.parse_json_content(response, "suggest_frameworks", limit=num_frameworks)
+        self.cache_suggestions(user_input, frameworks)
+        return frameworks
 
 
 class FrameworkExplainerAgent(BaseAgent):
@@ -170,42 +728,134 @@ class FrameworkExplainerAgent(BaseAgent):
     
     The FrameworkExplainerAgent helps users understand the theoretical foundations
     and practical applications of a framework they're interested in exploring further.
+    
+    Explanations only depend on the framework name and the level of detail, so they can
+    be cached. Bump PROMPT_VERSION whenever get_task_prompt or SHARED_INSTRUCTIONS changes
+    so stale entries are not served. A "brief" explanation is asked for in fewer words and with a smaller
+    max_tokens than a "full" one; a cached full explanation also serves brief requests.
     """
     
-    def __init__(self, model="gpt-4o-mini", max_tokens=1024):
+    ROUTE = "explain"
+    PROMPT_VERSION = "2"
+    MAX_TOKENS_ENV = "EXPLAIN_MAX_TOKENS"
+    DETAIL_TOKENS = {"brief": 350, "full": 1000}
+    
+    def __init__(self, model=None, max_tokens=None, transport=None, cache=None, catalog=None):
         """
         Initialize the FrameworkExplainerAgent with model configuration.
         
         Args:
-            model (str): The name of the language model to use (default: "gpt-4o-mini")
-            max_tokens (int): Maximum number of tokens in the response (default: 1024)
+            model (str): The name of the language model to use (default: routed per call)
+            max_tokens (int): Most tokens any response may use (env EXPLAIN_MAX_TOKENS, default: 1024)
+            transport (PooledTransport): HTTP transport to send requests through (default: shared transport)
+            cache (ExplanationCache): Cache for generated explanations (default: None, no caching)
+            catalog (FrameworkCatalog): Local catalog of precomputed explanations (default: None, no catalog)
+        """
+        super().__init__(model, max_tokens, transport)
+        self.cache = cache
+        self.catalog = catalog
+    
+    def output_budget(self, detail="full"):
         """
-        super().__init__(model, max_tokens)
+        Work out max_tokens for an explanation.
         
-    def get_system_prompt(self):
+        Args:
+            detail (str): "brief" or "full" (default: "full")
+        
+        Returns:
+            int: Tokens for that level of detail, never more than the agent's max_tokens
+        """
+        return min(self.max_tokens, self.DETAIL_TOKENS.get(detail, self.DETAIL_TOKENS["full"]))
+    
+    def cache_version(self, detail="full"):
+        """
+        Return the prompt version explanations of a level of detail are cached under.
+        
+        Args:
+            detail (str): "brief" or "full" (default: "full")
+        
+        Returns:
+            str: PROMPT_VERSION, with a suffix for brief explanations
+        """
+        return self.PROMPT_VERSION if detail != "brief" else f"{self.PROMPT_VERSION}-brief"
+    
+    def get_cached_explanation(self, framework_name, detail="full"):
+        """
+        Look up an explanation that does not need an LLM call.
+        
+        The local catalog is checked first, then the cache of previously generated explanations.
+        
+        Args:
+            framework_name (str): The name of the framework to explain
+            detail (str): "brief" or "full"; brief requests are also served full explanations (default: "full")
+        
+        Returns:
+            dict: The stored explanation, or None if neither the catalog nor the cache has one
+        """
+        if self.catalog is not None:
+            explanation = self.catalog.get(framework_name)
+            if explanation is not None:
+                return explanation
+        if self.cache is None:
+            return None
+        if detail == "brief":
+            explanation = self.cache.get(framework_name, self.model, self.cache_version("brief"))
+            if explanation is not None:
+                return explanation
+        return self.cache.get(framework_name, self.model, self.PROMPT_VERSION)
+    
+    def cache_explanation(self, framework_name, explanation, detail="full"):
         """
-        Define the system prompt that instructs the language model how to respond.
+        Store a generated explanation for later requests.
         
-        This prompt guides the model to provide detailed explanations of decision-making
-        frameworks and format its responses in a consistent JSON structure.
+        Args:
+            framework_name (str): The name of the framework that was explained
+            explanation (dict): The parsed explanation; truncated output is not cached
+            detail (str): Level of detail it was generated with (default: "full")
+        """
+        if self.cache is not None and not is_truncated(explanation):
+            self.cache.set(framework_name, self.model, self.cache_version(detail), explanation)
+        
+    def get_task_prompt(self):
+        """
+        Define the task prompt that instructs the language model how to respond.
+        
+        This prompt asks for an explanation of a decision-making framework in a
+        consistent JSON structure.
         
         Returns:
-            str: The system prompt for the language model
+            str: The task prompt for the language model
+        """
+        return inspect.cleandoc("""
+            Your task is to explain the specified framework, including:
+            1. An explanation of how the framework works
+            2. Step-by-step instructions for applying the framework
+            3. Examples of when this framework is most effective
+            4. Potential limitations or challenges when using this framework
+        
+            Format your response as a JSON object with 'explanation', 'steps', 'examples', and 'limitations' fields.
+            The 'steps', 'examples', and 'limitations' should be arrays of strings.
+            """)
+    
+    def build_messages(self, framework_name, detail="full"):
         """
-        return """You are a decision-making framework expert. Your task is to explain the specified framework
-        in detail, including:
-        1. A comprehensive explanation of how the framework works
-        2. Step-by-step instructions for applying the framework
-        3. Examples of when this framework is most effective
-        4. Potential limitations or challenges when using this framework
+        Build the chat messages for an explanation request.
         
-        Format your response as a JSON object with 'explanation', 'steps', 'examples', and 'limitations' fields.
-        The 'steps', 'examples', and 'limitations' should be arrays of strings.
+        Args:
+            framework_name (str): The name of the framework to explain
+            detail (str): "brief" for a short explanation, "full" for a detailed one (default: "full")
         
-        IMPORTANT: Your entire response must be valid JSON that can be parsed with json.loads(). Do not include any explanatory text before or after the JSON.
+        Returns:
+            list: The system and user messages to send to the language model
         """
+        if detail == "brief":
+            request = (f"Explain the {framework_name} framework briefly: two or three sentences, "
+                       "at most 4 steps, 2 examples and 2 limitations.")
+        else:
+            request = f"Explain the {framework_name} framework in detail."
+        return self.compose_messages(request)
     
-    def explain_framework(self, framework_name):
+    def explain_framework(self, framework_name, detail="full"):
         """
         Explain a specific framework in detail.
         
@@ -214,43 +864,38 @@ class FrameworkExplainerAgent(BaseAgent):
         
         Args:
             framework_name (str): The name of the framework to explain
+            detail (str): "brief" or "full" (default: "full")
         
         Returns:
             dict: A dictionary containing 'explanation', 'steps', 'examples', and 'limitations'
                  or a dict with an 'error' key if something went wrong
         """
-        messages = [
-            {'role': 'system', 'content': self.get_system_prompt()},
-            {'role': 'user', 'content': f"Explain the {framework_name} framework in detail."}
-        ]
+        cached = self.get_cached_explanation(framework_name, detail)
+        if cached is not None:
+            return cached
         
-        response = self.call_llm(messages)
+        explanation = self.generate_explanation(framework_name, detail)
+        if "error" not in explanation:
+            self.cache_explanation(framework_name, explanation, detail)
+        return explanation
+    
+    def generate_explanation(self, framework_name, detail="full"):
+        """
+        Generate a fresh explanation with the LLM, bypassing the catalog and the cache.
         
-        if "error" in response:
-            return response
+        Args:
+            framework_name (str): The name of the framework to explain
+            detail (str): "brief" or "full" (default: "full")
         
-        try:
-            # Extract the content from the response
-            if 'choices' in response and len(response['choices']) > 0:
-                content = response['choices'][0]['message']['content']
-                
-                # Log the extracted content
-                print("Extracted Content in explain_framework:")
-                print(content)
-                
-                # Parse the JSON from the content
-                explanation = json.loads(content)
-                return explanation
-            else:
-                return {"error": "No valid choices in LLM response"}
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            print("Content that failed to parse:")
-            print(content)
-            return {"error": f"Failed to parse JSON from LLM response: {str(e)}"}
-        except Exception as e:
-            return {"error": f"Error processing LLM response: {str(e)}"}
+        Returns:
+            dict: A dictionary containing 'explanation', 'steps', 'examples', and 'limitations'
+                 or a dict with an 'error' key if something went wrong
+        """
+        messages = self.build_messages(framework_name, detail)
+        
+        response = self.call_llm(messages, max_tokens=self.output_budget(detail))
+        
+        return self.parse_json_content(response, "explain_framework")
 
 
 class FrameworkApplicationAgent(BaseAgent):
@@ -264,41 +909,115 @@ class FrameworkApplicationAgent(BaseAgent):
     
     The FrameworkApplicationAgent bridges the gap between theoretical knowledge of
     frameworks and their practical application to real-world scenarios.
+    
+    The number of questions is part of the request, and max_tokens grows with it.
+    
+    Guides for a framework, situation and number of questions that were already
+    generated can be served from the shared result cache. Bump PROMPT_VERSION whenever
+    get_task_prompt or SHARED_INSTRUCTIONS changes so stale entries are not served.
     """
     
-    def __init__(self, model="gpt-4o-mini", max_tokens=1024):
+    ROUTE = "apply"
+    PROMPT_VERSION = "2"
+    MAX_TOKENS_ENV = "APPLY_MAX_TOKENS"
+    BASE_TOKENS = 450  # Template and interpretation guidance
+    TOKENS_PER_ITEM = 40  # One question
+    DEFAULT_QUESTIONS = 5
+    
+    def __init__(self, model=None, max_tokens=None, transport=None, cache=None):
         """
         Initialize the FrameworkApplicationAgent with model configuration.
         
         Args:
-            model (str): The name of the language model to use (default: "gpt-4o-mini")
-            max_tokens (int): Maximum number of tokens in the response (default: 1024)
+            model (str): The name of the language model to use (default: routed per call)
+            max_tokens (int): Most tokens any response may use (env APPLY_MAX_TOKENS, default: 1024)
+            transport (PooledTransport): HTTP transport to send requests through (default: shared transport)
+            cache (ResultCache): Cache for generated guides (default: None, no caching)
         """
-        super().__init__(model, max_tokens)
+        super().__init__(model, max_tokens, transport)
+        self.cache = cache
+    
+    def cache_key(self, framework_name, user_situation, num_questions=DEFAULT_QUESTIONS):
+        """
+        Build the cache key for a guide.
         
-    def get_system_prompt(self):
+        Args:
+            framework_name (str): The name of the framework to apply
+            user_situation (str): The user's description of their situation
+            num_questions (int): Number of questions asked for (default: 5)
+        
+        Returns:
+            str: The cache key
         """
-        Define the system prompt that instructs the language model how to respond.
+        return self.cache.make_key("apply", self.model, self.PROMPT_VERSION, normalize_framework_name(framework_name),
+                                   normalize_text(user_situation), num_questions)
+    
+    def get_cached_application(self, framework_name, user_situation, num_questions=DEFAULT_QUESTIONS):
+        """
+        Look up a guide generated earlier for the same request.
         
-        This prompt guides the model to provide practical application guidance for
-        decision-making frameworks and format its responses in a consistent JSON structure.
+        Args:
+            framework_name (str): The name of the framework to apply
+            user_situation (str): The user's description of their situation
+            num_questions (int): Number of questions asked for (default: 5)
         
         Returns:
-            str: The system prompt for the language model
+            dict: The cached guide, or None if there is no cache or no entry
+        """
+        if self.cache is None:
+            return None
+        return self.cache.lookup(self.cache_key(framework_name, user_situation, num_questions))
+    
+    def cache_application(self, framework_name, user_situation, num_questions, application):
+        """
+        Store a generated guide for later identical requests.
+        
+        Args:
+            framework_name (str): The name of the framework that was applied
+            user_situation (str): The user's description of their situation
+            num_questions (int): Number of questions asked for
+            application (dict): The parsed guide; errors and truncated output are not cached
+        """
+        if (self.cache is not None and isinstance(application, dict) and "error" not in application
+                and not is_truncated(application)):
+            self.cache.store(self.cache_key(framework_name, user_situation, num_questions), application)
+        
+    def get_task_prompt(self):
         """
-        return """You are a decision-making framework application expert. Your task is to help the user apply
-        the specified framework to their specific situation. Provide:
-        1. Tailored questions to gather the necessary information for the framework
-        2. A structured template for applying the framework to their situation
-        3. Guidance on interpreting the results
+        Define the task prompt that instructs the language model how to respond.
         
-        Format your response as a JSON object with 'questions', 'template', and 'interpretation_guidance' fields.
-        The 'questions' field should be an array of strings.
+        This prompt asks for practical guidance on applying a decision-making
+        framework to the situation in a consistent JSON structure.
         
-        IMPORTANT: Your entire response must be valid JSON that can be parsed with json.loads(). Do not include any explanatory text before or after the JSON.
+        Returns:
+            str: The task prompt for the language model
         """
+        return inspect.cleandoc("""
+            Your task is to help the user apply the specified framework to their situation. Provide:
+            1. Tailored questions to gather the necessary information for the framework
+            2. A structured template for applying the framework to their situation
+            3. Guidance on interpreting the results
+        
+            Format your response as a JSON object with 'questions', 'template', and 'interpretation_guidance' fields.
+            The 'questions' field should be an array of strings.
+            """)
     
-    def apply_framework(self, framework_name, user_situation):
+    def build_messages(self, framework_name, user_situation, num_questions=DEFAULT_QUESTIONS):
+        """
+        Build the chat messages for an application request.
+        
+        Args:
+            framework_name (str): The name of the framework to apply
+            user_situation (str): The user's description of their situation
+            num_questions (int): Number of questions to ask for (default: 5)
+        
+        Returns:
+            list: The system and user messages to send to the language model
+        """
+        return self.compose_messages(f"Apply the {framework_name} framework. Ask {num_questions} questions.",
+                                     situation=user_situation)
+    
+    def apply_framework(self, framework_name, user_situation, num_questions=DEFAULT_QUESTIONS):
         """
         Help apply a framework to a specific situation.
         
@@ -309,43 +1028,23 @@ class FrameworkApplicationAgent(BaseAgent):
         Args:
             framework_name (str): The name of the framework to apply
             user_situation (str): The user's description of their situation
+            num_questions (int): Number of questions to ask for (default: 5)
         
         Returns:
             dict: A dictionary containing 'questions', 'template', and 'interpretation_guidance'
                  or a dict with an 'error' key if something went wrong
         """
-        messages = [
-            {'role': 'system', 'content': self.get_system_prompt()},
-            {'role': 'user', 'content': f"Help me apply the {framework_name} framework to this situation: {user_situation}"}
-        ]
+        cached = self.get_cached_application(framework_name, user_situation, num_questions)
+        if cached is not None:
+            return cached
         
-        response = self.call_llm(messages)
+        messages = self.build_messages(framework_name, user_situation, num_questions)
         
-        if "error" in response:
-            return response
+        response = self.call_llm(messages, max_tokens=self.output_budget(num_questions))
         
-        try:
-            # Extract the content from the response
-            if 'choices' in response and len(response['choices']) > 0:
-                content = response['choices'][0]['message']['content']
-                
-                # Log the extracted content
-                print("Extracted Content in apply_framework:")
-                print(content)
-                
-                # Parse the JSON from the content
-                application = json.loads(content)
-                return application
-            else:
-                return {"error": "No valid choices in LLM response"}
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            print("Content that failed to parse:")
-            print(content)
-            return {"error": f"Failed to parse JSON from LLM response: {str(e)}"}
-        except Exception as e:
-            return {"error": f"Error processing LLM response: {str(e)}"}
+        application = self.parse_json_content(response, "apply_framework")
+        self.cache_application(framework_name, user_situation, num_questions, application)
+        return application
 
 
 class FrameworkComparisonAgent(BaseAgent):
@@ -359,38 +1058,129 @@ class FrameworkComparisonAgent(BaseAgent):
     
     The FrameworkComparisonAgent helps users make informed decisions about which
     framework(s) to use when multiple options seem viable.
+    
+    In fan-out mode each framework is evaluated against the situation in its own call,
+    all in parallel, and a short synthesis call then combines the evaluations. Wall-clock
+    time is roughly one evaluation plus the synthesis instead of one long generation
+    that grows with the number of frameworks.
+    
+    A single-call comparison gets a max_tokens that grows with the number of frameworks.
+    
+    Comparisons already generated for the same frameworks, situation and mode can be
+    served from the shared result cache. Bump PROMPT_VERSION whenever one of the task
+    prompts or SHARED_INSTRUCTIONS changes so stale entries are not served. The
+    evaluation and synthesis calls of a fan-out share the system and situation
+    messages, so all but the first are served mostly from the prompt cache.
     """
     
-    def __init__(self, model="gpt-4o-mini", max_tokens=1024):
+    ROUTE = "compare"
+    PROMPT_VERSION = "2"
+    MAX_TOKENS_ENV = "COMPARE_MAX_TOKENS"
+    BASE_TOKENS = 200  # Recommendation
+    TOKENS_PER_ITEM = 220  # Features, pros and cons of one framework
+    
+    def __init__(self, model=None, max_tokens=None, transport=None,
+                 fan_out_workers=None, evaluation_max_tokens=400, synthesis_max_tokens=600, cache=None):
         """
         Initialize the FrameworkComparisonAgent with model configuration.
         
         Args:
-            model (str): The name of the language model to use (default: "gpt-4o-mini")
-            max_tokens (int): Maximum number of tokens in the response (default: 1024)
+            model (str): The name of the language model to use (default: routed per call)
+            max_tokens (int): Most tokens any response may use (env COMPARE_MAX_TOKENS, default: 1024)
+            transport (PooledTransport): HTTP transport to send requests through (default: shared transport)
+            fan_out_workers (int): Threads used to evaluate frameworks in parallel
+                                   (env COMPARE_FAN_OUT_WORKERS, default: 8)
+            evaluation_max_tokens (int): Token limit for each per-framework evaluation (default: 400)
+            synthesis_max_tokens (int): Token limit for the synthesis call (default: 600)
+            cache (ResultCache): Cache for generated comparisons (default: None, no caching)
+        """
+        super().__init__(model, max_tokens, transport)
+        self.cache = cache
+        if fan_out_workers is None:
+            fan_out_workers = int(os.getenv('COMPARE_FAN_OUT_WORKERS', '8'))
+        self.fan_out_workers = fan_out_workers
+        self.evaluation_max_tokens = evaluation_max_tokens
+        self.synthesis_max_tokens = synthesis_max_tokens
+        self._executor = ThreadPoolExecutor(max_workers=fan_out_workers, thread_name_prefix="compare-fan-out")
+    
+    def cache_key(self, framework_names, user_situation, fan_out=False):
         """
-        super().__init__(model, max_tokens)
+        Build the cache key for a comparison.
         
-    def get_system_prompt(self):
+        Args:
+            framework_names (list): The framework names, in the order they were sent
+            user_situation (str): The user's description of their situation
+            fan_out (bool): Whether the comparison was made in fan-out mode (default: False)
+        
+        Returns:
+            str: The cache key
+        """
+        return self.cache.make_key("compare_fan_out" if fan_out else "compare", self.model, self.PROMPT_VERSION,
+                                   [normalize_framework_name(name) for name in framework_names],
+                                   normalize_text(user_situation))
+    
+    def get_cached_comparison(self, framework_names, user_situation, fan_out=False):
         """
-        Define the system prompt that instructs the language model how to respond.
+        Look up a comparison generated earlier for the same request.
         
-        This prompt guides the model to compare multiple decision-making frameworks
-        and format its responses in a consistent JSON structure.
+        Args:
+            framework_names (list): A list of framework names to compare
+            user_situation (str): The user's description of their situation
+            fan_out (bool): Whether the comparison is made in fan-out mode (default: False)
         
         Returns:
-            str: The system prompt for the language model
+            dict: The cached comparison, or None if there is no cache or no entry
         """
-        return """You are a decision-making framework comparison expert. Your task is to compare the specified
-        frameworks for the user's situation. Provide:
-        1. A comparison of the key features of each framework
-        2. The pros and cons of each framework for this specific situation
-        3. A recommendation on which framework(s) would be most effective and why
+        if self.cache is None:
+            return None
+        return self.cache.lookup(self.cache_key(framework_names, user_situation, fan_out))
+    
+    def cache_comparison(self, framework_names, user_situation, comparison, fan_out=False):
+        """
+        Store a generated comparison for later identical requests.
+        
+        Args:
+            framework_names (list): The framework names that were compared
+            user_situation (str): The user's description of their situation
+            comparison (dict): The parsed comparison; errors and truncated output are not cached
+            fan_out (bool): Whether it was made in fan-out mode (default: False)
+        """
+        if (self.cache is not None and isinstance(comparison, dict) and "error" not in comparison
+                and not is_truncated(comparison)):
+            self.cache.store(self.cache_key(framework_names, user_situation, fan_out), comparison)
+        
+    def get_task_prompt(self):
+        """
+        Define the task prompt that instructs the language model how to respond.
         
-        Format your response as a JSON object with 'comparison', 'pros_cons', and 'recommendation' fields.
+        This prompt asks for a comparison of multiple decision-making frameworks for
+        the situation in a consistent JSON structure.
         
-        IMPORTANT: Your entire response must be valid JSON that can be parsed with json.loads(). Do not include any explanatory text before or after the JSON.
+        Returns:
+            str: The task prompt for the language model
         """
+        return inspect.cleandoc("""
+            Your task is to compare the specified frameworks for the user's situation. Provide:
+            1. A comparison of the key features of each framework
+            2. The pros and cons of each framework for this specific situation
+            3. A recommendation on which framework(s) would be most effective and why
+        
+            Format your response as a JSON object with 'comparison', 'pros_cons', and 'recommendation' fields.
+            """)
+    
+    def build_messages(self, framework_names, user_situation):
+        """
+        Build the chat messages for a comparison request.
+        
+        Args:
+            framework_names (list): A list of framework names to compare
+            user_situation (str): The user's description of their situation
+        
+        Returns:
+            list: The system and user messages to send to the language model
+        """
+        frameworks_list = ", ".join(framework_names)
+        return self.compose_messages(f"Compare these frameworks: {frameworks_list}.", situation=user_situation)
     
     def compare_frameworks(self, framework_names, user_situation):
         """
@@ -408,39 +1198,159 @@ class FrameworkComparisonAgent(BaseAgent):
             dict: A dictionary containing 'comparison', 'pros_cons', and 'recommendation'
                  or a dict with an 'error' key if something went wrong
         """
-        frameworks_list = ", ".join(framework_names)
-        messages = [
-            {'role': 'system', 'content': self.get_system_prompt()},
-            {'role': 'user', 'content': f"Compare these frameworks for my situation: {frameworks_list}. My situation: {user_situation}"}
-        ]
+        cached = self.get_cached_comparison(framework_names, user_situation)
+        if cached is not None:
+            return cached
         
-        response = self.call_llm(messages)
+        messages = self.build_messages(framework_names, user_situation)
         
-        if "error" in response:
-            return response
+        response = self.call_llm(messages, max_tokens=self.output_budget(len(framework_names)))
         
-        try:
-            # Extract the content from the response
-            if 'choices' in response and len(response['choices']) > 0:
-                content = response['choices'][0]['message']['content']
+        comparison = self.parse_json_content(response, "compare_frameworks")
+        self.cache_comparison(framework_names, user_situation, comparison)
+        return comparison
+        
+    def get_evaluation_prompt(self):
+        """
+        Define the task prompt for evaluating a single framework in fan-out mode.
                 
-                # Log the extracted content
-                print("Extracted Content in compare_frameworks:")
-                print(content)
+        Returns:
+            str: The task prompt for the language model
+        """
+        return inspect.cleandoc("""
+            Your task is to evaluate how well the specified framework fits the user's situation. Provide:
+            1. The key features of the framework that matter for this situation
+            2. The pros of using it for this situation
+            3. The cons of using it for this situation
+            4. A fit score from 1 (poor fit) to 10 (excellent fit)
                 
-                # Parse the JSON from the content
-                comparison = json.loads(content)
-                return comparison
+            Format your response as a JSON object with 'framework', 'key_features', 'pros', 'cons' and 'fit_score' fields.
+            The 'pros' and 'cons' fields should be arrays of strings. Keep every field brief.
+            """)
+    
+    def get_synthesis_prompt(self):
+        """
+        Define the task prompt for combining per-framework evaluations in fan-out mode.
+        
+        Returns:
+            str: The task prompt for the language model
+        """
+        return inspect.cleandoc("""
+            You are given a JSON array of evaluations, one per framework, of how well it fits the user's situation.
+            Combine them into:
+            1. A comparison of the key features of each framework
+            2. The pros and cons of each framework for this specific situation
+            3. A recommendation on which framework(s) would be most effective and why
+        
+            Format your response as a JSON object with 'comparison', 'pros_cons', and 'recommendation' fields.
+            Base your answer only on the evaluations provided and keep it concise.
+            """)
+    
+    def build_evaluation_messages(self, framework_name, user_situation):
+        """
+        Build the chat messages for evaluating a single framework.
+        
+        Args:
+            framework_name (str): The name of the framework to evaluate
+            user_situation (str): The user's description of their situation
+        
+        Returns:
+            list: The system and user messages to send to the language model
+        """
+        return self.compose_messages(f"Evaluate the {framework_name} framework.", situation=user_situation,
+                                     task=self.get_evaluation_prompt())
+    
+    def evaluate_framework(self, framework_name, user_situation):
+        """
+        Evaluate a single framework against the user's situation.
+        
+        Args:
+            framework_name (str): The name of the framework to evaluate
+            user_situation (str): The user's description of their situation
+        
+        Returns:
+            dict: A dictionary containing 'framework', 'key_features', 'pros', 'cons' and 'fit_score'
+                 or a dict with an 'error' key if something went wrong
+        """
+        messages = self.build_evaluation_messages(framework_name, user_situation)
+        
+        response = self.call_llm(messages, max_tokens=self.evaluation_max_tokens, route="compare_evaluate")
+        
+        return self.parse_json_content(response, "evaluate_framework")
+    
+    def build_synthesis_messages(self, evaluations, user_situation):
+        """
+        Build the chat messages for the synthesis call.
+        
+        Args:
+            evaluations (list): Successful per-framework evaluations
+            user_situation (str): The user's description of their situation
+        
+        Returns:
+            list: The system and user messages to send to the language model
+        """
+        return self.compose_messages(f"Evaluations: {json.dumps(evaluations)}", situation=user_situation,
+                                     task=self.get_synthesis_prompt())
+    
+    def collect_evaluations(self, framework_names, results):
+        """
+        Keep the successful evaluations, labelling each with the framework it belongs to.
+        
+        Args:
+            framework_names (list): The framework names, in the same order as results
+            results (list): The per-framework evaluation results
+        
+        Returns:
+            tuple: (evaluations, errors) where errors lists the frameworks that failed
+        """
+        evaluations = []
+        errors = []
+        for framework_name, result in zip(framework_names, results):
+            if isinstance(result, dict) and "error" not in result:
+                result['framework'] = framework_name
+                evaluations.append(result)
             else:
-                return {"error": "No valid choices in LLM response"}
+                errors.append(framework_name)
+        return evaluations, errors
                 
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            print("Content that failed to parse:")
-            print(content)
-            return {"error": f"Failed to parse JSON from LLM response: {str(e)}"}
-        except Exception as e:
-            return {"error": f"Error processing LLM response: {str(e)}"}
+    def compare_frameworks_fan_out(self, framework_names, user_situation):
+        """
+        Compare multiple frameworks by evaluating each one in parallel and then synthesizing.
+        
+        Frameworks whose evaluation fails are left out of the synthesis; the comparison
+        only fails if none of them could be evaluated.
+        
+        Args:
+            framework_names (list): A list of framework names to compare
+            user_situation (str): The user's description of their situation
+        
+        Returns:
+            dict: A dictionary containing 'comparison', 'pros_cons', and 'recommendation'
+                 or a dict with an 'error' key if something went wrong
+        """
+        cached = self.get_cached_comparison(framework_names, user_situation, fan_out=True)
+        if cached is not None:
+            return cached
+        
+        # Each evaluation runs in a copy of the caller's context so its metrics keep the request's endpoint label
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, self.evaluate_framework, framework_name, user_situation)
+            for framework_name in framework_names
+        ]
+        results = [future.result() for future in futures]
+        
+        evaluations, errors = self.collect_evaluations(framework_names, results)
+        if not evaluations:
+            return {"error": f"Failed to evaluate any of the frameworks: {', '.join(errors)}"}
+        
+        response = self.call_llm(self.build_synthesis_messages(evaluations, user_situation),
+                                 max_tokens=self.synthesis_max_tokens, route="compare_synthesis")
+        
+        comparison = self.parse_json_content(response, "compare_frameworks_fan_out")
+        if not errors and not any(is_truncated(evaluation) for evaluation in evaluations):
+            # A synthesis that had to leave frameworks out, or work from cut-off evaluations, is not kept
+            self.cache_comparison(framework_names, user_situation, comparison, fan_out=True)
+        return comparison
 
 
 # Example usage
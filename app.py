@@ -1,28 +1,251 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, g
 from flask_cors import CORS  # Import CORS
 import json
 import os
+import time
+import uuid
+import logging
 from dotenv import load_dotenv
 import requests  # Assuming you are using requests to call the LLM
 from agents import FrameworkSuggesterAgent, FrameworkExplainerAgent, FrameworkApplicationAgent, FrameworkComparisonAgent
+from transport import get_shared_transport, env_flag
+from backends import get_shared_backends
+from cache import ExplanationCache, ResultCache, SimilarityCache, get_shared_cache_backend
+from catalog import FrameworkCatalog, start_background_refresh, refresh_on_startup_enabled
+from retrieval import FrameworkRetriever
+from streaming import sse_event, JSONArrayItemParser
+from batch import BatchRunner, parse_jobs
+from json_repair import parse_llm_json, SchemaError
+from resilience import set_deadline, reset_deadline, endpoint_deadline, remaining
+from lifecycle import get_shared_lifecycle
+from prefetch import ExplainPrefetcher, prefetch_enabled
+import metrics
+import logs
 
 load_dotenv()  # Load environment variables from .env file
 
+# Structured logs are written by a background thread so request handlers never block on stdout
+logs.configure_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Shared HTTP transport
+# One pooled keep-alive session is shared by every agent so requests reuse warm connections
+transport = get_shared_transport()
+
 # Initialize agents
 # These agents handle different aspects of the framework suggestion and application process
-suggester_agent = FrameworkSuggesterAgent()  # Suggests appropriate frameworks based on user input
-explainer_agent = FrameworkExplainerAgent()  # Provides detailed explanations of specific frameworks
-application_agent = FrameworkApplicationAgent()  # Helps apply frameworks to specific situations
-comparison_agent = FrameworkComparisonAgent()  # Compares multiple frameworks for a specific situation
+suggestion_cache = SimilarityCache()  # Near-duplicate cache of suggestions for similar situations
+cache_backend = get_shared_cache_backend()  # Shared tier of the result caches (SQLite file or Redis, see CACHE_BACKEND)
+result_cache = ResultCache(cache_backend)  # Memory + shared cache of generated suggestions, guides and comparisons
+framework_catalog = FrameworkCatalog()  # Precomputed explanations of common frameworks, served without an LLM call
+framework_retriever = FrameworkRetriever(framework_catalog) if env_flag('PARSE_RETRIEVAL', False) else None  # Local catalog search for /parse
+suggester_agent = FrameworkSuggesterAgent(transport=transport, cache=suggestion_cache, retriever=framework_retriever,
+                                          result_cache=result_cache)  # Suggests appropriate frameworks based on user input
+explanation_cache = ExplanationCache(backend=cache_backend)  # Memory + shared cache of generated explanations
+explainer_agent = FrameworkExplainerAgent(transport=transport, cache=explanation_cache, catalog=framework_catalog)  # Provides detailed explanations of specific frameworks
+application_agent = FrameworkApplicationAgent(transport=transport, cache=result_cache)  # Helps apply frameworks to specific situations
+comparison_agent = FrameworkComparisonAgent(transport=transport, cache=result_cache)  # Compares multiple frameworks for a specific situation
+batch_runner = BatchRunner(suggester_agent, explainer_agent, application_agent, comparison_agent)  # Runs /batch jobs through the agents above
+lifecycle = get_shared_lifecycle()  # Readiness and in-flight requests of this process, for /readyz and draining
+explain_prefetcher = (ExplainPrefetcher(explainer_agent, backend=cache_backend, lifecycle=lifecycle)
+                      if prefetch_enabled() else None)  # Explains suggested frameworks before they are clicked
+
+def start_process_services(refresh_catalog=True):
+    """
+    Start the background work of a serving process: warm upstream connections and the catalog refresh.
+    
+    A single-process server runs this at import. serve.py preloads the app in the master
+    and runs it in each worker after the fork instead, since neither connections nor
+    threads survive a fork.
+    
+    Args:
+        refresh_catalog (bool): Whether this process runs the startup catalog refresh (default: True)
+    """
+    if env_flag('LLM_PRECONNECT'):
+        for backend in get_shared_backends().backends:
+            transport.preconnect(int(os.getenv('LLM_PRECONNECT_COUNT', '1')), base_url=backend.base_url)
+    if refresh_catalog and refresh_on_startup_enabled():
+        start_background_refresh(framework_catalog, explainer_agent)  # Regenerate stale catalog entries without delaying startup
+
+def reset_after_fork():
+    """
+    Replace what a worker forked from the preloaded master cannot share with it.
+    
+    Agents, caches, the catalog and the retrieval index are inherited copy-on-write.
+    Pooled upstream sockets and the shared cache's SQLite or Redis connections belong to
+    the master, and the log writer thread does not exist in the child, so those are re-created.
+    """
+    logs.reset_after_fork()
+    transport.reset()
+    if cache_backend is not None:
+        cache_backend.reopen()
+    lifecycle.reset_after_fork()
+
+if not env_flag('SERVE_PRELOAD'):
+    start_process_services()
+
+# Model of the agent behind each view, used to label the handler latency histogram
+VIEW_MODELS = {
+    'parse': suggester_agent.model,
+    'parse_stream': suggester_agent.model,
+    'explain': explainer_agent.model,
+    'explain_stream': explainer_agent.model,
+    'apply': application_agent.model,
+    'apply_stream': application_agent.model,
+    'compare': comparison_agent.model,
+    'compare_stream': comparison_agent.model,
+}
+
+@app.before_request
+def start_request_metrics():
+    """
+    Label the request's metrics and logs and start the handler timer.
+    
+    Every log record of the request carries its request id (taken from an incoming
+    X-Request-ID header or generated), and its LLM calls share the route's deadline. Sending "X-Debug-Payloads: 1" logs the full
+    request, completion and result payloads for that request only, unless
+    LOG_ALLOW_DEBUG_HEADER is turned off.
+    """
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_token = metrics.set_endpoint(g.metrics_endpoint)
+    g.metrics_start = time.perf_counter()
+    g.deadline_token = set_deadline(endpoint_deadline(g.metrics_endpoint))
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    debug = env_flag('LOG_ALLOW_DEBUG_HEADER', True) and request.headers.get('X-Debug-Payloads') == '1'
+    g.log_tokens = logs.set_request_context(g.request_id, debug)
+    lifecycle.request_started()
+
+@app.after_request
+def add_request_id(response):
+    """Return the request id so clients can find the request's log lines."""
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    g.status_code = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """
+    Record the handler time and log the request once it is finished.
+    
+    Teardown runs after a streamed response body has been fully sent, so streaming
+    routes are timed until their last event rather than until their first byte.
+    """
+    if 'metrics_start' not in g:
+        return
+    elapsed = time.perf_counter() - g.metrics_start
+    metrics.observe_handler(g.metrics_endpoint, VIEW_MODELS.get(request.endpoint, 'none'), elapsed)
+    logs.log_event(logger, logging.INFO, "request.finished", sample=True, method=request.method,
+                   endpoint=g.metrics_endpoint, status=g.get('status_code', 500), duration_ms=round(elapsed * 1000, 1))
+    logs.reset_request_context(g.log_tokens)
+    reset_deadline(g.deadline_token)
+    metrics.reset_endpoint(g.metrics_token)
+    lifecycle.request_finished()
 
 @app.route('/')
 def home():
     """Serve the main HTML page of the application."""
     return render_template('index.html')  # Serve the HTML file
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness check: the process is up and handling requests.
+    
+    It never calls the LLM or any other dependency, so a slow or failing API does not
+    get healthy workers restarted.
+    """
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness check for the load balancer.
+    
+    Returns 200 once the agents, caches and indexes are built, and 503 from the moment
+    the process starts draining for shutdown, while its in-flight requests finish.
+    
+    Response JSON format:
+    {"status": "ready", "pid": 4242, "ready": true, "draining": false, "in_flight": 3, "uptime_s": 812.4}
+    """
+    state = lifecycle.stats()
+    if lifecycle.is_ready():
+        return jsonify({"status": "ready", **state})
+    return jsonify({"status": "draining" if state['draining'] else "starting", **state}), 503
+
+def hedging_stats():
+    """
+    Collect the hedging statistics of every agent.
+    
+    Returns:
+        dict: Stats per agent, or None if LLM_HEDGING is off
+    """
+    agents = {"suggester": suggester_agent, "explainer": explainer_agent,
+              "application": application_agent, "comparison": comparison_agent}
+    if all(agent.hedger is None for agent in agents.values()):
+        return None
+    return {name: agent.hedger.stats() for name, agent in agents.items() if agent.hedger}
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """
+    Endpoint to report runtime statistics.
+    
+    Response JSON format:
+    {
+        "transport": {"requests_sent": 10, "connections_opened": 2, "connections_reused": 8, ...},
+        "explain_cache": {"memory": {"hits": 5, "misses": 3, "evictions": 0, ...}, "shared": {"backend": "sqlite", ...}},
+        "result_cache": {"memory": {...}, "shared": {...}},
+        "catalog": {"path": "data/frameworks.json", "size": 18, "hits": 12, "misses": 3},
+        "parse_cache": {"lookups": 8, "hits": 3, "hit_rate": 0.375, "evictions": 0, ...},
+        "retrieval": {"indexed": 18, "lookups": 5, "hits": 3, "fallbacks": 2, "hit_rate": 0.6, ...},
+        "single_flight": {"leaders": 9, "coalesced": 4, "timeouts": 0, "unshared": 0, "in_flight": 1},
+        "hedging": {"suggester": {"calls": 40, "hedged": 2, "hedge_wins": 1, "p95_ms": 2100.0, ...}, ...},
+        "circuit_breaker": {"state": "closed", "window_calls": 12, "failure_rate": 0.0, "times_opened": 0, "rejected": 0},
+        "routing": {"compare": {"model": "gpt-4o", "slo_ms": 20000, "p95_ms": 8400.0, "falling_back": false, ...}, ...},
+        "backends": {"local1": {"base_url": "http://10.0.0.5:8000/v1", "weight": 3.0, "requests": 120, "errors": 1, ...}, ...},
+        "prefetch": {"scheduled": 30, "generated": 29, "failed": 1, "skipped": {"cached": 14, "busy": 2, ...}, "hits": 21, "hit_rate": 0.724, ...},
+        "prompt_cache": {"/apply": {"calls": 20, "hit_calls": 17, "prompt_tokens": 31000, "cached_tokens": 22400, "cached_ratio": 0.723, ...}, ...},
+        "process": {"pid": 4242, "ready": true, "draining": false, "in_flight": 3, "uptime_s": 812.4}
+    }
+    
+    Under serve.py every worker keeps its own statistics; this reports the worker that
+    handled the request.
+    """
+    return jsonify({
+        "transport": transport.stats(),
+        "explain_cache": explanation_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "catalog": framework_catalog.stats(),
+        "parse_cache": suggestion_cache.stats(),
+        "retrieval": framework_retriever.stats() if framework_retriever else None,
+        "single_flight": explainer_agent.single_flight.stats() if explainer_agent.single_flight else None,
+        "hedging": hedging_stats(),
+        "circuit_breaker": explainer_agent.breaker.stats() if explainer_agent.breaker else None,
+        "routing": explainer_agent.router.stats() if explainer_agent.router else None,
+        "backends": explainer_agent.backends.stats(),
+        "prefetch": explain_prefetcher.stats() if explain_prefetcher else None,
+        "prompt_cache": metrics.prompt_cache_report(),
+        "process": lifecycle.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Endpoint exposing request, upstream, parsing and token metrics in the Prometheus text format.
+    
+    Histograms: http_handler_seconds, llm_upstream_latency_seconds, llm_parse_seconds
+    (labeled by endpoint and model).
+    Counters: llm_tokens_total (kind: prompt, completion, cached), llm_parse_failures_total,
+    llm_upstream_errors_total (code: HTTP status or "connection"),
+    llm_routed_calls_total (route, reason: primary, long_input, slo_fallback),
+    llm_backend_requests_total (backend, code).
+    """
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
 # Keep the original parse_response function for reference and backward compatibility
 def parse_response(response_content, num_frameworks):
     """
@@ -55,6 +278,30 @@ def parse_response(response_content, num_frameworks):
     except Exception as e:
         return {"error": str(e)}
 
+def prefetch_explanations(frameworks):
+    """
+    Start explaining suggested frameworks in the background, when EXPLAIN_PREFETCH is on.
+    
+    Args:
+        frameworks (list): The frameworks returned to the client
+    """
+    if explain_prefetcher is not None:
+        explain_prefetcher.schedule(frameworks)
+
+def claim_prefetch(framework_name):
+    """
+    Count an explain request that a prefetch anticipated.
+    
+    If that prefetch is still running in this process, wait for it (within the
+    request's deadline) so the explanation is served from the cache instead of
+    being generated twice.
+    
+    Args:
+        framework_name (str): The framework the client asked to explain
+    """
+    if explain_prefetcher is not None and explain_prefetcher.claim(framework_name):
+        explain_prefetcher.wait(framework_name, remaining())
+
 @app.route('/parse', methods=['POST'])
 def parse():
     """
@@ -63,10 +310,19 @@ def parse():
     This endpoint receives the user's situation description, processes it using
     the FrameworkSuggesterAgent, and returns a list of recommended frameworks.
     
+    Situations that clearly match frameworks in the local catalog are answered without
+    an LLM call; the catalog's descriptions and strengths are generic rather than tailored
+    to the situation. Send "quality": "llm" to always get the model's answer. The model is
+    asked for num_frameworks frameworks, with max_tokens sized to match.
+    
+    With EXPLAIN_PREFETCH on, explanations of the returned frameworks are then
+    generated in the background, so a following /explain is usually a cache hit.
+    
     Request JSON format:
     {
         "response": "User's situation description",
-        "num_frameworks": 2  // Optional, defaults to 2
+        "num_frameworks": 2,  // Optional, defaults to 2
+        "quality": "auto"  // Optional, "auto" (default) or "llm"
     }
     
     Response JSON format:
@@ -86,20 +342,26 @@ def parse():
 
         user_input = data.get('response')
         num_frameworks = data.get('num_frameworks', 2)  # Default to 2
+        quality = data.get('quality', 'auto')
 
         # Log the input data
-        print("User Input:")
-        print(json.dumps({"User Input": user_input}, indent=4))
+        logs.debug_payload(logger, "parse.request", {"User Input": user_input})
+        
+        # Serve suggestions cached for a near-identical situation
+        cached = suggester_agent.get_cached_suggestions(user_input, num_frameworks)
+        if cached is not None:
+            prefetch_explanations(cached[:num_frameworks])
+            return jsonify(cached[:num_frameworks])
+        
+        # Answer confident matches from the local catalog
+        retrieved = suggester_agent.get_retrieved_suggestions(user_input, num_frameworks, quality)
+        if retrieved is not None:
+            prefetch_explanations(retrieved)
+            return jsonify(retrieved)
 
         # Use the FrameworkSuggesterAgent to get frameworks
-        response = suggester_agent.call_llm([
-            {'role': 'system', 'content': suggester_agent.get_system_prompt()},
-            {'role': 'user', 'content': user_input}
-        ])
-        
-        # Log the raw response from the LLM
-        print("Raw LLM Response:")
-        print(json.dumps(response, indent=4))
+        response = suggester_agent.call_llm(suggester_agent.build_messages(user_input, num_frameworks),
+                                            max_tokens=suggester_agent.output_budget(num_frameworks))
         
         # Check for errors in the LLM response
         if "error" in response:
@@ -110,40 +372,42 @@ def parse():
             if 'choices' in response and len(response['choices']) > 0:
                 content = response['choices'][0]['message']['content']
                 
-                # Log the extracted content
-                print("Extracted Content:")
-                print(content)
-                
-                # Parse the JSON from the content
-                frameworks = json.loads(content)
+                # Parse the JSON from the content, repairing fences and truncation and checking its shape
+                frameworks = parse_llm_json(content, suggester_agent.model, "suggest_frameworks")
                 
                 # Log the output after parsing
-                print("Output after parsing:")
-                print(json.dumps(frameworks, indent=4))
+                logs.debug_payload(logger, "parse.result", frameworks)
+                
+                suggester_agent.cache_suggestions(user_input, frameworks)
                 
                 # Limit the number of frameworks based on user request
                 limited_frameworks = frameworks[:num_frameworks] if isinstance(frameworks, list) else frameworks
+                metrics.record_returned_tokens(suggester_agent.model, response.get('usage'), frameworks, limited_frameworks)
                 
+                prefetch_explanations(limited_frameworks)
                 return jsonify(limited_frameworks)
             else:
                 error_msg = "No valid choices in LLM response"
-                print(f"Error: {error_msg}")
+                metrics.count_parse_failure(suggester_agent.model)
+                logs.log_event(logger, logging.WARNING, "parse.failed", error=error_msg)
                 return jsonify({"error": error_msg}), 400
                 
         except json.JSONDecodeError as e:
             error_msg = f"Failed to parse JSON from LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
-            print("Content that failed to parse:")
-            print(content)
+            logs.log_event(logger, logging.WARNING, "parse.parse_failed", error=error_msg, content=content)
+            return jsonify({"error": error_msg}), 400
+        except SchemaError as e:
+            error_msg = f"LLM response did not have the expected format: {str(e)}"
+            logs.log_event(logger, logging.WARNING, "parse.schema_invalid", error=error_msg, content=content)
             return jsonify({"error": error_msg}), 400
         except Exception as e:
             error_msg = f"Error processing LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
+            logs.log_event(logger, logging.WARNING, "parse.failed", error=error_msg)
             return jsonify({"error": error_msg}), 400
 
     except Exception as e:
         error_msg = f"Server error: {str(e)}"
-        print(f"Error: {error_msg}")
+        logs.log_event(logger, logging.ERROR, "parse.server_error", error=error_msg)
         return jsonify({"error": error_msg}), 500  # Return the error message
 
 # Keep the original call_llm function for reference, but comment it out
@@ -192,7 +456,8 @@ def explain():
     
     Request JSON format:
     {
-        "framework_name": "Name of the framework to explain"
+        "framework_name": "Name of the framework to explain",
+        "detail": "full"  // Optional, "full" (default) or "brief" for a shorter, cheaper explanation
     }
     
     Response JSON format:
@@ -209,22 +474,23 @@ def explain():
             return jsonify({"error": "No data received"}), 400
 
         framework_name = data.get('framework_name')
+        detail = data.get('detail', 'full')
         if not framework_name:
             return jsonify({"error": "No framework name provided"}), 400
 
         # Log the input data
-        print("Explain Request:")
-        print(json.dumps({"framework_name": framework_name}, indent=4))
+        logs.debug_payload(logger, "explain.request", {"framework_name": framework_name, "detail": detail})
+        
+        claim_prefetch(framework_name)
+        
+        # Serve catalog and repeat explanations without calling the LLM
+        cached = explainer_agent.get_cached_explanation(framework_name, detail)
+        if cached is not None:
+            return jsonify(cached)
 
         # Call the LLM directly to get the raw response
-        response = explainer_agent.call_llm([
-            {'role': 'system', 'content': explainer_agent.get_system_prompt()},
-            {'role': 'user', 'content': f"Explain the {framework_name} framework in detail."}
-        ])
-        
-        # Log the raw response from the LLM
-        print("Raw LLM Response (Explain):")
-        print(json.dumps(response, indent=4))
+        response = explainer_agent.call_llm(explainer_agent.build_messages(framework_name, detail),
+                                            max_tokens=explainer_agent.output_budget(detail))
         
         # Check for errors in the LLM response
         if "error" in response:
@@ -235,37 +501,37 @@ def explain():
             if 'choices' in response and len(response['choices']) > 0:
                 content = response['choices'][0]['message']['content']
                 
-                # Log the extracted content
-                print("Extracted Content (Explain):")
-                print(content)
-                
-                # Parse the JSON from the content
-                explanation = json.loads(content)
+                # Parse the JSON from the content, repairing fences and truncation and checking its shape
+                explanation = parse_llm_json(content, explainer_agent.model, "explain_framework")
                 
                 # Log the output after parsing
-                print("Output after parsing (Explain):")
-                print(json.dumps(explanation, indent=4))
+                logs.debug_payload(logger, "explain.result", explanation)
                 
+                metrics.record_returned_tokens(explainer_agent.model, response.get('usage'), explanation, explanation)
+                explainer_agent.cache_explanation(framework_name, explanation, detail)
                 return jsonify(explanation)
             else:
                 error_msg = "No valid choices in LLM response"
-                print(f"Error: {error_msg}")
+                metrics.count_parse_failure(explainer_agent.model)
+                logs.log_event(logger, logging.WARNING, "explain.failed", error=error_msg)
                 return jsonify({"error": error_msg}), 400
                 
         except json.JSONDecodeError as e:
             error_msg = f"Failed to parse JSON from LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
-            print("Content that failed to parse:")
-            print(content)
+            logs.log_event(logger, logging.WARNING, "explain.parse_failed", error=error_msg, content=content)
+            return jsonify({"error": error_msg}), 400
+        except SchemaError as e:
+            error_msg = f"LLM response did not have the expected format: {str(e)}"
+            logs.log_event(logger, logging.WARNING, "explain.schema_invalid", error=error_msg, content=content)
             return jsonify({"error": error_msg}), 400
         except Exception as e:
             error_msg = f"Error processing LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
+            logs.log_event(logger, logging.WARNING, "explain.failed", error=error_msg)
             return jsonify({"error": error_msg}), 400
 
     except Exception as e:
         error_msg = f"Server error: {str(e)}"
-        print(f"Error: {error_msg}")
+        logs.log_event(logger, logging.ERROR, "explain.server_error", error=error_msg)
         return jsonify({"error": error_msg}), 500
 
 @app.route('/apply', methods=['POST'])
@@ -281,7 +547,8 @@ def apply():
     Request JSON format:
     {
         "framework_name": "Name of the framework to apply",
-        "situation": "Description of the user's situation"
+        "situation": "Description of the user's situation",
+        "num_questions": 5  // Optional, defaults to 5
     }
     
     Response JSON format:
@@ -305,18 +572,17 @@ def apply():
             return jsonify({"error": "No situation provided"}), 400
 
         # Log the input data
-        print("Apply Request:")
-        print(json.dumps({"framework_name": framework_name, "situation": user_situation}, indent=4))
+        logs.debug_payload(logger, "apply.request", {"framework_name": framework_name, "situation": user_situation})
 
-        # Call the LLM directly to get the raw response
-        response = application_agent.call_llm([
-            {'role': 'system', 'content': application_agent.get_system_prompt()},
-            {'role': 'user', 'content': f"Help me apply the {framework_name} framework to this situation: {user_situation}"}
-        ])
+        # Serve guides already generated for the same request by any worker
+        num_questions = data.get('num_questions', application_agent.DEFAULT_QUESTIONS)
+        cached = application_agent.get_cached_application(framework_name, user_situation, num_questions)
+        if cached is not None:
+            return jsonify(cached)
         
-        # Log the raw response from the LLM
-        print("Raw LLM Response (Apply):")
-        print(json.dumps(response, indent=4))
+        # Call the LLM directly to get the raw response
+        response = application_agent.call_llm(application_agent.build_messages(framework_name, user_situation, num_questions),
+                                              max_tokens=application_agent.output_budget(num_questions))
         
         # Check for errors in the LLM response
         if "error" in response:
@@ -327,37 +593,37 @@ def apply():
             if 'choices' in response and len(response['choices']) > 0:
                 content = response['choices'][0]['message']['content']
                 
-                # Log the extracted content
-                print("Extracted Content (Apply):")
-                print(content)
-                
-                # Parse the JSON from the content
-                application = json.loads(content)
+                # Parse the JSON from the content, repairing fences and truncation and checking its shape
+                application = parse_llm_json(content, application_agent.model, "apply_framework")
                 
                 # Log the output after parsing
-                print("Output after parsing (Apply):")
-                print(json.dumps(application, indent=4))
+                logs.debug_payload(logger, "apply.result", application)
                 
+                metrics.record_returned_tokens(application_agent.model, response.get('usage'), application, application)
+                application_agent.cache_application(framework_name, user_situation, num_questions, application)
                 return jsonify(application)
             else:
                 error_msg = "No valid choices in LLM response"
-                print(f"Error: {error_msg}")
+                metrics.count_parse_failure(application_agent.model)
+                logs.log_event(logger, logging.WARNING, "apply.failed", error=error_msg)
                 return jsonify({"error": error_msg}), 400
                 
         except json.JSONDecodeError as e:
             error_msg = f"Failed to parse JSON from LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
-            print("Content that failed to parse:")
-            print(content)
+            logs.log_event(logger, logging.WARNING, "apply.parse_failed", error=error_msg, content=content)
+            return jsonify({"error": error_msg}), 400
+        except SchemaError as e:
+            error_msg = f"LLM response did not have the expected format: {str(e)}"
+            logs.log_event(logger, logging.WARNING, "apply.schema_invalid", error=error_msg, content=content)
             return jsonify({"error": error_msg}), 400
         except Exception as e:
             error_msg = f"Error processing LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
+            logs.log_event(logger, logging.WARNING, "apply.failed", error=error_msg)
             return jsonify({"error": error_msg}), 400
 
     except Exception as e:
         error_msg = f"Server error: {str(e)}"
-        print(f"Error: {error_msg}")
+        logs.log_event(logger, logging.ERROR, "apply.server_error", error=error_msg)
         return jsonify({"error": error_msg}), 500
 
 @app.route('/compare', methods=['POST'])
@@ -370,10 +636,15 @@ def compare():
     analysis of the frameworks, including their features, pros and cons, and
     a recommendation on which to use.
     
+    With "fan_out" enabled, each framework is evaluated in a parallel call and a short
+    synthesis call combines the evaluations, so latency no longer grows with the
+    number of frameworks. The default comes from the COMPARE_FAN_OUT setting.
+    
     Request JSON format:
     {
         "framework_names": ["Framework 1", "Framework 2", ...],
-        "situation": "Description of the user's situation"
+        "situation": "Description of the user's situation",
+        "fan_out": true  // Optional, defaults to COMPARE_FAN_OUT
     }
     
     Response JSON format:
@@ -397,19 +668,23 @@ def compare():
             return jsonify({"error": "No situation provided"}), 400
 
         # Log the input data
-        print("Compare Request:")
-        print(json.dumps({"framework_names": framework_names, "situation": user_situation}, indent=4))
+        logs.debug_payload(logger, "compare.request", {"framework_names": framework_names, "situation": user_situation})
+        
+        # Evaluate each framework in parallel and synthesize the results
+        if data.get('fan_out', env_flag('COMPARE_FAN_OUT')):
+            comparison = comparison_agent.compare_frameworks_fan_out(framework_names, user_situation)
+            if "error" in comparison:
+                return jsonify({"error": comparison["error"]}), 400
+            return jsonify(comparison)
 
-        # Call the LLM directly to get the raw response
-        frameworks_list = ", ".join(framework_names)
-        response = comparison_agent.call_llm([
-            {'role': 'system', 'content': comparison_agent.get_system_prompt()},
-            {'role': 'user', 'content': f"Compare these frameworks for my situation: {frameworks_list}. My situation: {user_situation}"}
-        ])
+        # Serve comparisons already generated for the same request by any worker
+        cached = comparison_agent.get_cached_comparison(framework_names, user_situation)
+        if cached is not None:
+            return jsonify(cached)
         
-        # Log the raw response from the LLM
-        print("Raw LLM Response (Compare):")
-        print(json.dumps(response, indent=4))
+        # Call the LLM directly to get the raw response
+        response = comparison_agent.call_llm(comparison_agent.build_messages(framework_names, user_situation),
+                                             max_tokens=comparison_agent.output_budget(len(framework_names)))
         
         # Check for errors in the LLM response
         if "error" in response:
@@ -420,38 +695,292 @@ def compare():
             if 'choices' in response and len(response['choices']) > 0:
                 content = response['choices'][0]['message']['content']
                 
-                # Log the extracted content
-                print("Extracted Content (Compare):")
-                print(content)
-                
-                # Parse the JSON from the content
-                comparison = json.loads(content)
+                # Parse the JSON from the content, repairing fences and truncation and checking its shape
+                comparison = parse_llm_json(content, comparison_agent.model, "compare_frameworks")
                 
                 # Log the output after parsing
-                print("Output after parsing (Compare):")
-                print(json.dumps(comparison, indent=4))
+                logs.debug_payload(logger, "compare.result", comparison)
                 
+                metrics.record_returned_tokens(comparison_agent.model, response.get('usage'), comparison, comparison)
+                comparison_agent.cache_comparison(framework_names, user_situation, comparison)
                 return jsonify(comparison)
             else:
                 error_msg = "No valid choices in LLM response"
-                print(f"Error: {error_msg}")
+                metrics.count_parse_failure(comparison_agent.model)
+                logs.log_event(logger, logging.WARNING, "compare.failed", error=error_msg)
                 return jsonify({"error": error_msg}), 400
                 
         except json.JSONDecodeError as e:
             error_msg = f"Failed to parse JSON from LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
-            print("Content that failed to parse:")
-            print(content)
+            logs.log_event(logger, logging.WARNING, "compare.parse_failed", error=error_msg, content=content)
+            return jsonify({"error": error_msg}), 400
+        except SchemaError as e:
+            error_msg = f"LLM response did not have the expected format: {str(e)}"
+            logs.log_event(logger, logging.WARNING, "compare.schema_invalid", error=error_msg, content=content)
             return jsonify({"error": error_msg}), 400
         except Exception as e:
             error_msg = f"Error processing LLM response: {str(e)}"
-            print(f"Error: {error_msg}")
+            logs.log_event(logger, logging.WARNING, "compare.failed", error=error_msg)
             return jsonify({"error": error_msg}), 400
 
     except Exception as e:
         error_msg = f"Server error: {str(e)}"
-        print(f"Error: {error_msg}")
+        logs.log_event(logger, logging.ERROR, "compare.server_error", error=error_msg)
         return jsonify({"error": error_msg}), 500
 
+def sse_response(events):
+    """
+    Wrap an event generator in a text/event-stream response.
+    
+    Args:
+        events (generator): Generator of formatted Server-Sent Events
+        
+    Returns:
+        Response: A streaming response that is flushed to the client event by event
+    """
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop reverse proxies from buffering the stream
+    })
+
+def stream_json_object(agent, messages, on_result=None, schema=None, max_tokens=None):
+    """
+    Stream an agent's JSON object response as Server-Sent Events.
+    
+    A "delta" event is sent for every piece of generated text so the browser can show
+    progress, followed by a single "result" event with the parsed object (or an
+    "error" event) and a final "done" event.
+    
+    Args:
+        agent (BaseAgent): The agent whose model should be called
+        messages (list): The chat messages to send
+        on_result (callable): Optional callback receiving the parsed result, e.g. to cache it
+        schema (str): Name of the json_repair schema the result must match (default: None)
+        max_tokens (int): Token limit for the call (default: the agent's max_tokens)
+        
+    Yields:
+        str: Formatted Server-Sent Events
+    """
+    content = ""
+    try:
+        for chunk in agent.stream_llm(messages, max_tokens=max_tokens):
+            content += chunk
+            yield sse_event('delta', {"text": chunk})
+        
+        result = parse_llm_json(content, agent.model, schema)
+        if on_result is not None:
+            on_result(result)
+        yield sse_event('result', result)
+    except json.JSONDecodeError as e:
+        error_msg = f"Failed to parse JSON from LLM response: {str(e)}"
+        logs.log_event(logger, logging.WARNING, "stream.parse_failed", error=error_msg, content=content)
+        yield sse_event('error', {"error": error_msg})
+    except SchemaError as e:
+        error_msg = f"LLM response did not have the expected format: {str(e)}"
+        logs.log_event(logger, logging.WARNING, "stream.schema_invalid", error=error_msg, content=content)
+        yield sse_event('error', {"error": error_msg})
+    except Exception as e:
+        error_msg = f"Error processing LLM response: {str(e)}"
+        logs.log_event(logger, logging.WARNING, "stream.failed", error=error_msg)
+        yield sse_event('error', {"error": error_msg})
+    yield sse_event('done', {})
+
+@app.route('/parse/stream', methods=['POST'])
+def parse_stream():
+    """
+    Streaming variant of /parse.
+    
+    Takes the same request JSON as /parse and answers with Server-Sent Events. Each
+    framework is sent in its own "framework" event as soon as the model has finished
+    generating it, so the first card can be shown long before the whole list is done.
+    Generation stops once num_frameworks frameworks have been sent.
+    
+    Events:
+        framework: {"name": "...", "description": "...", "strengths": "..."}
+        error:     {"error": "Error message"}
+        done:      {}
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "No data received"}), 400
+    
+    user_input = data.get('response')
+    num_frameworks = data.get('num_frameworks', 2)  # Default to 2
+    quality = data.get('quality', 'auto')
+    
+    def generate():
+        # Serve suggestions cached for a near-identical situation, or confident catalog matches
+        local = suggester_agent.get_cached_suggestions(user_input, num_frameworks)
+        if local is None:
+            local = suggester_agent.get_retrieved_suggestions(user_input, num_frameworks, quality)
+        if local is not None:
+            for framework in local[:num_frameworks]:
+                yield sse_event('framework', framework)
+            prefetch_explanations(local[:num_frameworks])
+            yield sse_event('done', {})
+            return
+        
+        parser = JSONArrayItemParser()
+        frameworks = []
+        try:
+            for chunk in suggester_agent.stream_llm(suggester_agent.build_messages(user_input, num_frameworks),
+                                                    max_tokens=suggester_agent.output_budget(num_frameworks)):
+                for framework in parser.feed(chunk):
+                    frameworks.append(framework)
+                    if len(frameworks) <= num_frameworks:
+                        yield sse_event('framework', framework)
+                if parser.finished or len(frameworks) >= num_frameworks:
+                    break
+            
+            # Only a complete list is safe to reuse for larger num_frameworks values
+            if parser.finished:
+                suggester_agent.cache_suggestions(user_input, frameworks)
+            prefetch_explanations(frameworks[:num_frameworks])
+        except json.JSONDecodeError as e:
+            error_msg = f"Failed to parse JSON from LLM response: {str(e)}"
+            logs.log_event(logger, logging.WARNING, "parse_stream.parse_failed", error=error_msg)
+            yield sse_event('error', {"error": error_msg})
+        except Exception as e:
+            error_msg = f"Error processing LLM response: {str(e)}"
+            logs.log_event(logger, logging.WARNING, "parse_stream.failed", error=error_msg)
+            yield sse_event('error', {"error": error_msg})
+        yield sse_event('done', {})
+    
+    return sse_response(generate())
+
+@app.route('/explain/stream', methods=['POST'])
+def explain_stream():
+    """
+    Streaming variant of /explain.
+    
+    Takes the same request JSON as /explain and answers with Server-Sent Events:
+    "delta" events while the explanation is generated, then a "result" event with the
+    same object /explain returns. Catalog and cached explanations are sent as an immediate result.
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "No data received"}), 400
+    
+    framework_name = data.get('framework_name')
+    if not framework_name:
+        return jsonify({"error": "No framework name provided"}), 400
+    
+    detail = data.get('detail', 'full')
+    claim_prefetch(framework_name)
+    cached = explainer_agent.get_cached_explanation(framework_name, detail)
+    if cached is not None:
+        return sse_response(iter([sse_event('result', cached), sse_event('done', {})]))
+    
+    return sse_response(stream_json_object(
+        explainer_agent,
+        explainer_agent.build_messages(framework_name, detail),
+        on_result=lambda explanation: explainer_agent.cache_explanation(framework_name, explanation, detail),
+        schema="explain_framework",
+        max_tokens=explainer_agent.output_budget(detail)
+    ))
+
+@app.route('/apply/stream', methods=['POST'])
+def apply_stream():
+    """
+    Streaming variant of /apply.
+    
+    Takes the same request JSON as /apply and answers with Server-Sent Events:
+    "delta" events while the guide is generated, then a "result" event with the
+    same object /apply returns. Cached guides are sent as an immediate result.
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "No data received"}), 400
+    
+    framework_name = data.get('framework_name')
+    user_situation = data.get('situation')
+    
+    if not framework_name:
+        return jsonify({"error": "No framework name provided"}), 400
+    if not user_situation:
+        return jsonify({"error": "No situation provided"}), 400
+    
+    num_questions = data.get('num_questions', application_agent.DEFAULT_QUESTIONS)
+    cached = application_agent.get_cached_application(framework_name, user_situation, num_questions)
+    if cached is not None:
+        return sse_response(iter([sse_event('result', cached), sse_event('done', {})]))
+    
+    return sse_response(stream_json_object(
+        application_agent,
+        application_agent.build_messages(framework_name, user_situation, num_questions),
+        on_result=lambda application: application_agent.cache_application(framework_name, user_situation,
+                                                                           num_questions, application),
+        schema="apply_framework",
+        max_tokens=application_agent.output_budget(num_questions),
+    ))
+
+@app.route('/compare/stream', methods=['POST'])
+def compare_stream():
+    """
+    Streaming variant of /compare.
+    
+    Takes the same request JSON as /compare and answers with Server-Sent Events:
+    "delta" events while the comparison is generated, then a "result" event with the
+    same object /compare returns. Cached comparisons are sent as an immediate result.
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "No data received"}), 400
+    
+    framework_names = data.get('framework_names')
+    user_situation = data.get('situation')
+    
+    if not framework_names or not isinstance(framework_names, list):
+        return jsonify({"error": "No framework names provided or invalid format"}), 400
+    if not user_situation:
+        return jsonify({"error": "No situation provided"}), 400
+    
+    cached = comparison_agent.get_cached_comparison(framework_names, user_situation)
+    if cached is not None:
+        return sse_response(iter([sse_event('result', cached), sse_event('done', {})]))
+    
+    return sse_response(stream_json_object(
+        comparison_agent,
+        comparison_agent.build_messages(framework_names, user_situation),
+        on_result=lambda comparison: comparison_agent.cache_comparison(framework_names, user_situation, comparison),
+        schema="compare_frameworks",
+        max_tokens=comparison_agent.output_budget(len(framework_names)),
+    ))
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """
+    Endpoint to run many parse/explain/apply/compare jobs in one request.
+    
+    Request body: a JSON array of jobs, or JSONL with one job per line. Each job has a
+    "type" plus the same fields as the request JSON of the matching endpoint:
+    {"id": "a1", "type": "parse", "response": "...", "num_frameworks": 2}
+    
+    Response: JSONL (application/x-ndjson), one line per job in the order jobs finish:
+    {"index": 0, "id": "a1", "type": "parse", "status": "ok", "result": [...]}
+    {"index": 1, "id": "a2", "type": "explain", "status": "error", "error": "..."}
+    """
+    max_jobs = int(os.getenv('BATCH_MAX_JOBS', '1000'))
+    try:
+        jobs = parse_jobs(request.get_data(as_text=True))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid batch body: {str(e)}"}), 400
+    
+    if not jobs:
+        return jsonify({"error": "No jobs received"}), 400
+    if len(jobs) > max_jobs:
+        return jsonify({"error": f"Too many jobs: {len(jobs)} (limit {max_jobs})"}), 413
+    
+    logs.log_event(logger, logging.INFO, "batch.started", jobs=len(jobs))
+    
+    def generate():
+        for record in batch_runner.run(jobs):
+            yield json.dumps(record) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Everything above is built; in a preforking server the workers inherit this state
+lifecycle.mark_ready()
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,522 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import functools
+import contextvars
+import aiohttp
+from dotenv import load_dotenv
+from agents import FrameworkSuggesterAgent, FrameworkExplainerAgent, FrameworkApplicationAgent, FrameworkComparisonAgent
+from transport import DEFAULT_API_BASE, env_flag
+import metrics
+import logs
+from singleflight import get_shared_async_single_flight, request_key
+from json_repair import is_truncated
+from resilience import UpstreamError, remaining, parse_retry_after, RETRYABLE_STATUSES, CIRCUIT_OPEN_ERROR, DEADLINE_ERROR
+
+load_dotenv()  # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTransport:
+    """
+    Non-blocking HTTP transport for talking to the completions API from asyncio code.
+
+    Wraps one aiohttp.ClientSession with a keep-alive connection pool and a semaphore
+    that caps how many upstream calls may be in flight at once. A single event loop can
+    then keep hundreds of LLM calls outstanding without a thread per call.
+
+    The session is created lazily on first use, because aiohttp sessions are bound to
+    the event loop that is running when they are created.
+    """
+
+    def __init__(self, base_url=None, max_concurrency=None, keep_alive=None):
+        """
+        Initialize the transport.
+
+        Any argument left as None is read from the environment, falling back to a default.
+
+        Args:
+            base_url (str): Base URL of the API (env LLM_API_BASE, default: "https://api.openai.com/v1")
+            max_concurrency (int): Maximum upstream calls in flight (env LLM_MAX_CONCURRENCY, default: 256)
+            keep_alive (bool): Whether to reuse connections between requests (env LLM_KEEP_ALIVE, default: True)
+        """
+        if base_url is None:
+            base_url = os.getenv('LLM_API_BASE', DEFAULT_API_BASE)
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('LLM_MAX_CONCURRENCY', '256'))
+        if keep_alive is None:
+            keep_alive = env_flag('LLM_KEEP_ALIVE', True)
+
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+
+        self._session = None
+        self._semaphore = None
+        self.requests_sent = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _ensure_session(self):
+        """Create the session and semaphore inside the running event loop if needed."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, force_close=not self.keep_alive)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def post(self, path, headers, data, timeout=None, base_url=None):
+        """
+        Send a POST request with a JSON body, waiting for a free concurrency slot first.
+
+        Args:
+            path (str): Path relative to the base URL, e.g. "/chat/completions"
+            headers (dict): Request headers
+            data (dict): JSON-serializable request body
+            timeout (aiohttp.ClientTimeout): Timeouts for this request (default: the session's)
+            base_url (str): Base URL of the backend to send to (default: the transport's base URL)
+
+        Returns:
+            tuple: (status code, response body text, response headers)
+        """
+        self._ensure_session()
+        async with self._semaphore:
+            self.requests_sent += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                options = {'timeout': timeout} if timeout is not None else {}
+                async with self._session.post(f"{(base_url or self.base_url).rstrip('/')}/{path.lstrip('/')}",
+                                              headers=headers,
+                                              json=data,
+                                              **options) as response:
+                    return response.status, await response.text(), response.headers
+            finally:
+                self.in_flight -= 1
+
+    async def close(self):
+        """Close the session and every pooled connection."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def stats(self):
+        """
+        Report transport counters.
+
+        Returns:
+            dict: Requests sent, current and peak in-flight calls, plus the configuration
+        """
+        return {
+            'base_url': self.base_url,
+            'max_concurrency': self.max_concurrency,
+            'keep_alive': self.keep_alive,
+            'requests_sent': self.requests_sent,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+        }
+
+
+_shared_async_transport = None
+
+
+def get_shared_async_transport():
+    """
+    Return the process-wide async transport shared by all async agents, creating it on first use.
+
+    Returns:
+        AsyncTransport: The shared transport
+    """
+    global _shared_async_transport
+    if _shared_async_transport is None:
+        _shared_async_transport = AsyncTransport()
+    return _shared_async_transport
+
+
+class AsyncAgentMixin:
+    """
+    Turns one of the agents from agents.py into an asyncio agent.
+
+    The mixin replaces call_llm with a coroutine that goes through an AsyncTransport.
+    Prompts, message building, caching and response parsing are inherited unchanged
+    from the synchronous agent, so both variants return exactly the same shapes.
+    """
+
+    def __init__(self, *args, async_transport=None, **kwargs):
+        """
+        Initialize the agent.
+
+        Args:
+            *args: Positional arguments for the synchronous agent (model, max_tokens, ...)
+            async_transport (AsyncTransport): Transport to send requests through
+                                              (default: the process-wide shared async transport)
+            **kwargs: Keyword arguments for the synchronous agent
+        """
+        super().__init__(*args, **kwargs)
+        self.async_transport = async_transport or get_shared_async_transport()
+        self.async_single_flight = get_shared_async_single_flight()  # None when LLM_SINGLE_FLIGHT is off
+
+    async def call_llm(self, messages, max_tokens=None, route=None):
+        """
+        Call the language model with the given messages without blocking the event loop.
+
+        Identical requests already in flight on this event loop are coalesced into one
+        upstream call, and failures are retried within the request's deadline, like the
+        synchronous call_llm.
+
+        Args:
+            messages (list): A list of message objects with 'role' and 'content' keys
+                            following the chat completion format
+            max_tokens (int): Token limit for this call (default: the agent's max_tokens)
+            route (str): Route the model is picked by (default: the agent's ROUTE)
+
+        Returns:
+            dict: The JSON response from the language model API or an error object
+        """
+        route = route or self.ROUTE
+        headers, data = self.build_request(messages, max_tokens=max_tokens, model=self.pick_model(messages, route))
+
+        # Log the data being sent to the LLM
+        logs.debug_payload(logger, "llm.request", data)
+
+        if self.async_single_flight is None:
+            return await self.send_with_retries(headers, data, route)
+
+        result, shared = await self.async_single_flight.do(request_key(data),
+                                                           lambda: self.send_with_retries(headers, data, route),
+                                                           shareable=self.shareable)
+        if shared:
+            metrics.count_coalesced(data['model'])
+        return result
+
+    async def send_with_retries(self, headers, data, route=None):
+        """
+        Send a request, retrying retryable failures while the deadline and circuit breaker allow.
+
+        Args:
+            headers (dict): Request headers from build_request
+            data (dict): Request body from build_request
+            route (str): Route of the call, to record its latency against (default: None)
+
+        Returns:
+            dict: The JSON response from the language model API or an error object
+
+        Raises:
+            aiohttp.ClientError: If the last attempt failed without a response
+            asyncio.TimeoutError: If the last attempt timed out
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            left = remaining()
+            if left is not None and left <= 0:
+                return {"error": DEADLINE_ERROR}
+            if self.breaker is not None and not self.breaker.allow():
+                metrics.count_circuit_rejection(data['model'])
+                return {"error": CIRCUIT_OPEN_ERROR}
+
+            try:
+                result = await self.send_hedged(headers, data, route)
+            except UpstreamError as e:
+                error, reason, retry_after = e, str(e.status), e.retry_after
+            except asyncio.TimeoutError as e:
+                error, reason, retry_after = e, 'timeout', None
+            except aiohttp.ClientError as e:
+                error, reason, retry_after = e, 'connection', None
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()  # Cancelled, or failed in a way that says nothing about the API
+                raise
+            else:
+                if self.breaker is not None:
+                    self.breaker.record(failed=False)
+                return result
+
+            if self.breaker is not None:
+                self.breaker.record(failed=True)
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            if delay is None:
+                break
+            metrics.count_retry(data['model'], reason)
+            logs.log_event(logger, logging.WARNING, "llm.retry", model=data['model'], attempt=attempt,
+                           reason=reason, delay_ms=round(delay * 1000, 1))
+            await asyncio.sleep(delay)
+
+        if isinstance(error, UpstreamError):
+            return {"error": f"Failed to call LLM: {error.body}"}
+        left = remaining()
+        if left is not None and left <= 0:
+            return {"error": DEADLINE_ERROR}  # Timed out because the request ran out of time
+        raise error
+
+    async def send_hedged(self, headers, data, route=None):
+        """
+        Send a request, hedging it with a second one if it is slow and hedging is on.
+
+        The slower of two hedged requests is cancelled, which closes its connection.
+
+        Args:
+            headers (dict): Request headers from build_request
+            data (dict): Request body from build_request
+            route (str): Route of the call, to record its latency against (default: None)
+
+        Returns:
+            dict: The JSON response from the language model API or an error object
+        """
+        if self.hedger is None:
+            return await self.send_request(headers, data, route)
+        return await self.hedger.call_async(lambda: self.send_request(headers, data, route), data['model'])
+
+    async def send_request(self, headers, data, route=None):
+        """
+        Send one chat-completions request and record its latency, status and token usage.
+
+        Args:
+            headers (dict): Request headers from build_request
+            data (dict): Request body from build_request
+            route (str): Route of the call, to record its latency against (default: None)
+
+        Returns:
+            dict: The JSON response from the language model API or an error object
+
+        Raises:
+            UpstreamError: For a rate limit or server error that is worth retrying
+        """
+        model = data['model']
+        backend = self.backends.choose(model)
+        if backend is None:
+            return {"error": f"No LLM backend serves the model {model}"}
+        headers, body = backend.prepare(headers, data)
+
+        connect, read = self.timeouts.current()
+        left = remaining()
+        timeout = aiohttp.ClientTimeout(total=max(left, 0.001) if left is not None else None,
+                                        sock_connect=connect, sock_read=read)
+        start = time.perf_counter()
+        try:
+            status, text, response_headers = await self.async_transport.post('/chat/completions', headers, body,
+                                                                              timeout=timeout,
+                                                                              base_url=backend.base_url)
+        except Exception as e:
+            metrics.observe_upstream(model, time.perf_counter() - start, None)
+            self.backends.record(backend, None)
+            logs.log_event(logger, logging.WARNING, "llm.connection_failed", model=model, backend=backend.name,
+                           error=str(e))
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe_upstream(model, elapsed, status)
+        self.backends.record(backend, status)
+
+        if status == 200:
+            result = json.loads(text)
+            metrics.record_usage(model, result.get('usage'), data.get('max_tokens'))
+            if self.router is not None and route:
+                self.router.observe(route, model, elapsed)
+            logs.log_event(logger, logging.INFO, "llm.call", sample=True, model=model, backend=backend.name,
+                           duration_ms=round(elapsed * 1000, 1), usage=result.get('usage'))
+            logs.debug_payload(logger, "llm.response", result)
+            return result
+        else:
+            logs.log_event(logger, logging.WARNING, "llm.call_failed", model=model, backend=backend.name,
+                           status=status, duration_ms=round(elapsed * 1000, 1), body=text)
+            if status in RETRYABLE_STATUSES:
+                raise UpstreamError(status, text, parse_retry_after(response_headers.get('Retry-After')))
+            return {"error": f"Failed to call LLM: {text}"}
+
+
+async def run_blocking(function, *args, **kwargs):
+    """
+    Run a call that can block, such as a lookup in the shared cache backend, off the event loop.
+
+    SQLite and Redis backends wait on a lock, the disk or a network round trip, which on
+    the loop would stall every request this worker is serving. The call runs on the
+    loop's default executor in a copy of the caller's context, so its metrics keep the
+    request's endpoint label.
+
+    Args:
+        function (callable): The blocking function
+        *args, **kwargs: Arguments to call it with
+
+    Returns:
+        The function's return value
+    """
+    call = functools.partial(contextvars.copy_context().run, function, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(None, call)
+
+
+class AsyncFrameworkSuggesterAgent(AsyncAgentMixin, FrameworkSuggesterAgent):
+    """Asyncio counterpart of FrameworkSuggesterAgent."""
+
+    async def suggest_frameworks(self, user_input, num_frameworks=2, quality="auto"):
+        """
+        Suggest frameworks based on user input.
+
+        Args:
+            user_input (str): The user's description of their situation or decision-making challenge
+            num_frameworks (int): Number of frameworks wanted (default: 2)
+            quality (str): "llm" to skip local retrieval and always ask the model (default: "auto")
+
+        Returns:
+            list: At most num_frameworks framework objects, each containing 'name', 'description',
+                 and 'strengths', or a dict with an 'error' key if something went wrong
+        """
+        cached = await run_blocking(self.get_cached_suggestions, user_input, num_frameworks)
+        if cached is not None:
+            return cached[:num_frameworks]
+
+        retrieved = self.get_retrieved_suggestions(user_input, num_frameworks, quality)
+        if retrieved is not None:
+            return retrieved
+
+        response = await self.call_llm(self.build_messages(user_input, num_frameworks),
+                                       max_tokens=self.output_budget(num_frameworks))
+
+        frameworks = self.parse_json_content(response, "suggest_frameworks", limit=num_frameworks)
+        await run_blocking(self.cache_suggestions, user_input, frameworks)
+        return frameworks
+
+
+class AsyncFrameworkExplainerAgent(AsyncAgentMixin, FrameworkExplainerAgent):
+    """Asyncio counterpart of FrameworkExplainerAgent."""
+
+    async def explain_framework(self, framework_name, detail="full"):
+        """
+        Explain a specific framework in detail.
+
+        Args:
+            framework_name (str): The name of the framework to explain
+            detail (str): "brief" or "full" (default: "full")
+
+        Returns:
+            dict: A dictionary containing 'explanation', 'steps', 'examples', and 'limitations'
+                 or a dict with an 'error' key if something went wrong
+        """
+        cached = await run_blocking(self.get_cached_explanation, framework_name, detail)
+        if cached is not None:
+            return cached
+
+        explanation = await self.generate_explanation(framework_name, detail)
+        if "error" not in explanation:
+            await run_blocking(self.cache_explanation, framework_name, explanation, detail)
+        return explanation
+
+    async def generate_explanation(self, framework_name, detail="full"):
+        """
+        Generate a fresh explanation with the LLM, bypassing the catalog and the cache.
+
+        Args:
+            framework_name (str): The name of the framework to explain
+            detail (str): "brief" or "full" (default: "full")
+
+        Returns:
+            dict: The parsed explanation, or a dict with an 'error' key if something went wrong
+        """
+        response = await self.call_llm(self.build_messages(framework_name, detail),
+                                       max_tokens=self.output_budget(detail))
+        return self.parse_json_content(response, "explain_framework")
+
+
+class AsyncFrameworkApplicationAgent(AsyncAgentMixin, FrameworkApplicationAgent):
+    """Asyncio counterpart of FrameworkApplicationAgent."""
+
+    async def apply_framework(self, framework_name, user_situation, num_questions=FrameworkApplicationAgent.DEFAULT_QUESTIONS):
+        """
+        Help apply a framework to a specific situation.
+
+        Args:
+            framework_name (str): The name of the framework to apply
+            user_situation (str): The user's description of their situation
+            num_questions (int): Number of questions to ask for (default: 5)
+
+        Returns:
+            dict: A dictionary containing 'questions', 'template', and 'interpretation_guidance'
+                 or a dict with an 'error' key if something went wrong
+        """
+        cached = await run_blocking(self.get_cached_application, framework_name, user_situation, num_questions)
+        if cached is not None:
+            return cached
+
+        response = await self.call_llm(self.build_messages(framework_name, user_situation, num_questions),
+                                       max_tokens=self.output_budget(num_questions))
+
+        application = self.parse_json_content(response, "apply_framework")
+        await run_blocking(self.cache_application, framework_name, user_situation, num_questions, application)
+        return application
+
+
+class AsyncFrameworkComparisonAgent(AsyncAgentMixin, FrameworkComparisonAgent):
+    """Asyncio counterpart of FrameworkComparisonAgent."""
+
+    async def compare_frameworks(self, framework_names, user_situation):
+        """
+        Compare multiple frameworks for a specific situation.
+
+        Args:
+            framework_names (list): A list of framework names to compare
+            user_situation (str): The user's description of their situation
+
+        Returns:
+            dict: A dictionary containing 'comparison', 'pros_cons', and 'recommendation'
+                 or a dict with an 'error' key if something went wrong
+        """
+        cached = await run_blocking(self.get_cached_comparison, framework_names, user_situation)
+        if cached is not None:
+            return cached
+
+        response = await self.call_llm(self.build_messages(framework_names, user_situation),
+                                       max_tokens=self.output_budget(len(framework_names)))
+
+        comparison = self.parse_json_content(response, "compare_frameworks")
+        await run_blocking(self.cache_comparison, framework_names, user_situation, comparison)
+        return comparison
+
+    async def evaluate_framework(self, framework_name, user_situation):
+        """
+        Evaluate a single framework against the user's situation.
+
+        Args:
+            framework_name (str): The name of the framework to evaluate
+            user_situation (str): The user's description of their situation
+
+        Returns:
+            dict: A dictionary containing 'framework', 'key_features', 'pros', 'cons' and 'fit_score'
+                 or a dict with an 'error' key if something went wrong
+        """
+        messages = self.build_evaluation_messages(framework_name, user_situation)
+
+        response = await self.call_llm(messages, max_tokens=self.evaluation_max_tokens, route="compare_evaluate")
+
+        return self.parse_json_content(response, "evaluate_framework")
+
+    async def compare_frameworks_fan_out(self, framework_names, user_situation):
+        """
+        Compare multiple frameworks by evaluating each one concurrently and then synthesizing.
+
+        Args:
+            framework_names (list): A list of framework names to compare
+            user_situation (str): The user's description of their situation
+
+        Returns:
+            dict: A dictionary containing 'comparison', 'pros_cons', and 'recommendation'
+                 or a dict with an 'error' key if something went wrong
+        """
+        cached = await run_blocking(self.get_cached_comparison, framework_names, user_situation, fan_out=True)
+        if cached is not None:
+            return cached
+
+        results = await asyncio.gather(*(
+            self.evaluate_framework(framework_name, user_situation) for framework_name in framework_names
+        ))
+
+        evaluations, errors = self.collect_evaluations(framework_names, results)
+        if not evaluations:
+            return {"error": f"Failed to evaluate any of the frameworks: {', '.join(errors)}"}
+
+        response = await self.call_llm(self.build_synthesis_messages(evaluations, user_situation),
+                                       max_tokens=self.synthesis_max_tokens, route="compare_synthesis")
+
+        comparison = self.parse_json_content(response, "compare_frameworks_fan_out")
+        if not errors and not any(is_truncated(evaluation) for evaluation in evaluations):
+            await run_blocking(self.cache_comparison, framework_names, user_situation, comparison, fan_out=True)
+        return comparison
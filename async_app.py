@@ -0,0 +1,342 @@
+import os
+import time
+import uuid
+import logging
+import argparse
+from aiohttp import web
+from dotenv import load_dotenv
+from agents import FrameworkExplainerAgent
+from async_agents import (AsyncFrameworkSuggesterAgent, AsyncFrameworkExplainerAgent,
+                          AsyncFrameworkApplicationAgent, AsyncFrameworkComparisonAgent,
+                          get_shared_async_transport)
+from cache import ExplanationCache, ResultCache, SimilarityCache, get_shared_cache_backend
+from catalog import FrameworkCatalog, start_background_refresh, refresh_on_startup_enabled
+from retrieval import FrameworkRetriever
+from resilience import deadline, endpoint_deadline, remaining
+from transport import env_flag
+from lifecycle import get_shared_lifecycle
+from prefetch import AsyncExplainPrefetcher, prefetch_enabled
+import metrics
+import logs
+
+load_dotenv()  # Load environment variables from .env file
+
+# Structured logs are written by a background thread so handlers never block on stdout
+logs.configure_logging()
+logger = logging.getLogger(__name__)
+
+# Initialize agents
+# The async agents share one non-blocking transport, so a single process can keep
+# up to LLM_MAX_CONCURRENCY upstream calls in flight at the same time
+async_transport = get_shared_async_transport()
+suggestion_cache = SimilarityCache()
+cache_backend = get_shared_cache_backend()
+result_cache = ResultCache(cache_backend)
+explanation_cache = ExplanationCache(backend=cache_backend)
+framework_catalog = FrameworkCatalog()
+framework_retriever = FrameworkRetriever(framework_catalog) if env_flag('PARSE_RETRIEVAL', False) else None
+suggester_agent = AsyncFrameworkSuggesterAgent(cache=suggestion_cache, retriever=framework_retriever,
+                                               result_cache=result_cache, async_transport=async_transport)
+explainer_agent = AsyncFrameworkExplainerAgent(cache=explanation_cache, catalog=framework_catalog,
+                                               async_transport=async_transport)
+application_agent = AsyncFrameworkApplicationAgent(cache=result_cache, async_transport=async_transport)
+comparison_agent = AsyncFrameworkComparisonAgent(cache=result_cache, async_transport=async_transport)
+lifecycle = get_shared_lifecycle()
+explain_prefetcher = (AsyncExplainPrefetcher(explainer_agent, backend=cache_backend, lifecycle=lifecycle)
+                      if prefetch_enabled() else None)
+
+routes = web.RouteTableDef()
+
+
+async def read_json(request):
+    """
+    Read the JSON body of a request.
+
+    Args:
+        request (web.Request): The incoming request
+
+    Returns:
+        dict: The decoded body, or None if it is missing or not valid JSON
+    """
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def agent_response(result):
+    """
+    Turn an agent result into a response, mapping error dicts to HTTP 400 like app.py does.
+
+    Args:
+        result: The value returned by an async agent method
+
+    Returns:
+        web.Response: The JSON response
+    """
+    if isinstance(result, dict) and "error" in result:
+        return web.json_response({"error": result["error"]}, status=400)
+    return web.json_response(result)
+
+
+@routes.post('/parse')
+async def parse(request):
+    """Async counterpart of the /parse endpoint in app.py, with the same request and response JSON."""
+    data = await read_json(request)
+    if not data:
+        return web.json_response({"error": "No data received"}, status=400)
+
+    user_input = data.get('response')
+    num_frameworks = data.get('num_frameworks', 2)  # Default to 2
+
+    frameworks = await suggester_agent.suggest_frameworks(user_input, num_frameworks, data.get('quality', 'auto'))
+    if isinstance(frameworks, list):
+        frameworks = frameworks[:num_frameworks]
+        if explain_prefetcher is not None:
+            await explain_prefetcher.schedule(frameworks)
+    return agent_response(frameworks)
+
+
+@routes.post('/explain')
+async def explain(request):
+    """Async counterpart of the /explain endpoint in app.py, with the same request and response JSON."""
+    data = await read_json(request)
+    if not data:
+        return web.json_response({"error": "No data received"}, status=400)
+
+    framework_name = data.get('framework_name')
+    if not framework_name:
+        return web.json_response({"error": "No framework name provided"}, status=400)
+
+    # Wait for a prefetch of the framework still running, rather than generating it twice
+    if explain_prefetcher is not None and await explain_prefetcher.claim(framework_name):
+        await explain_prefetcher.wait(framework_name, remaining())
+    return agent_response(await explainer_agent.explain_framework(framework_name, data.get('detail', 'full')))
+
+
+@routes.post('/apply')
+async def apply(request):
+    """Async counterpart of the /apply endpoint in app.py, with the same request and response JSON."""
+    data = await read_json(request)
+    if not data:
+        return web.json_response({"error": "No data received"}, status=400)
+
+    framework_name = data.get('framework_name')
+    user_situation = data.get('situation')
+
+    if not framework_name:
+        return web.json_response({"error": "No framework name provided"}, status=400)
+    if not user_situation:
+        return web.json_response({"error": "No situation provided"}, status=400)
+
+    num_questions = data.get('num_questions', application_agent.DEFAULT_QUESTIONS)
+    return agent_response(await application_agent.apply_framework(framework_name, user_situation, num_questions))
+
+
+@routes.post('/compare')
+async def compare(request):
+    """Async counterpart of the /compare endpoint in app.py, with the same request and response JSON."""
+    data = await read_json(request)
+    if not data:
+        return web.json_response({"error": "No data received"}, status=400)
+
+    framework_names = data.get('framework_names')
+    user_situation = data.get('situation')
+
+    if not framework_names or not isinstance(framework_names, list):
+        return web.json_response({"error": "No framework names provided or invalid format"}, status=400)
+    if not user_situation:
+        return web.json_response({"error": "No situation provided"}, status=400)
+
+    # Evaluate each framework concurrently and synthesize the results
+    if data.get('fan_out', env_flag('COMPARE_FAN_OUT')):
+        return agent_response(await comparison_agent.compare_frameworks_fan_out(framework_names, user_situation))
+
+    return agent_response(await comparison_agent.compare_frameworks(framework_names, user_situation))
+
+
+def hedging_stats():
+    """
+    Collect the hedging statistics of every agent.
+
+    Returns:
+        dict: Stats per agent, or None if LLM_HEDGING is off
+    """
+    agents = {"suggester": suggester_agent, "explainer": explainer_agent,
+              "application": application_agent, "comparison": comparison_agent}
+    if all(agent.hedger is None for agent in agents.values()):
+        return None
+    return {name: agent.hedger.stats() for name, agent in agents.items() if agent.hedger}
+
+
+@routes.get('/healthz')
+async def healthz(request):
+    """Liveness check, like GET /healthz in app.py."""
+    return web.json_response({"status": "ok"})
+
+
+@routes.get('/readyz')
+async def readyz(request):
+    """Readiness check for the load balancer, like GET /readyz in app.py."""
+    state = lifecycle.stats()
+    if lifecycle.is_ready():
+        return web.json_response({"status": "ready", **state})
+    return web.json_response({"status": "draining" if state['draining'] else "starting", **state}, status=503)
+
+
+@routes.get('/stats')
+async def stats(request):
+    """Report runtime statistics, like GET /stats in app.py."""
+    return web.json_response({
+        "transport": async_transport.stats(),
+        "explain_cache": explanation_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "catalog": framework_catalog.stats(),
+        "parse_cache": suggestion_cache.stats(),
+        "retrieval": framework_retriever.stats() if framework_retriever else None,
+        "single_flight": explainer_agent.async_single_flight.stats() if explainer_agent.async_single_flight else None,
+        "hedging": hedging_stats(),
+        "circuit_breaker": explainer_agent.breaker.stats() if explainer_agent.breaker else None,
+        "routing": explainer_agent.router.stats() if explainer_agent.router else None,
+        "backends": explainer_agent.backends.stats(),
+        "prefetch": explain_prefetcher.stats() if explain_prefetcher else None,
+        "prompt_cache": metrics.prompt_cache_report(),
+        "process": lifecycle.stats()
+    })
+
+
+@routes.get('/metrics')
+async def prometheus_metrics(request):
+    """Expose metrics in the Prometheus text format, like GET /metrics in app.py."""
+    body, content_type = metrics.render()
+    return web.Response(body=body, headers={'Content-Type': content_type})
+
+
+# Model of the agent behind each route, used to label the handler latency histogram
+ROUTE_MODELS = {
+    '/parse': suggester_agent.model,
+    '/explain': explainer_agent.model,
+    '/apply': application_agent.model,
+    '/compare': comparison_agent.model,
+}
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """
+    Label the request's metrics and logs, record the handler time and log the request, like app.py.
+
+    Honors the X-Request-ID and X-Debug-Payloads request headers the same way app.py does,
+    and runs the handler under the route's deadline.
+    """
+    resource = request.match_info.route.resource
+    endpoint = resource.canonical if resource is not None else 'unmatched'
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    debug = env_flag('LOG_ALLOW_DEBUG_HEADER', True) and request.headers.get('X-Debug-Payloads') == '1'
+    log_tokens = logs.set_request_context(request_id, debug)
+    start = time.perf_counter()
+    status = 500
+    lifecycle.request_started()
+    try:
+        with metrics.endpoint_label(endpoint), deadline(endpoint_deadline(endpoint)):
+            response = await handler(request)
+        status = response.status
+        response.headers['X-Request-ID'] = request_id
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe_handler(endpoint, ROUTE_MODELS.get(endpoint, 'none'), elapsed)
+        logs.log_event(logger, logging.INFO, "request.finished", sample=True, method=request.method,
+                       endpoint=endpoint, status=status, duration_ms=round(elapsed * 1000, 1))
+        logs.reset_request_context(log_tokens)
+        lifecycle.request_finished()
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Allow cross-origin requests, matching CORS(app) in app.py."""
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
+
+@web.middleware
+async def error_middleware(request, handler):
+    """Return unexpected exceptions as a JSON 500, matching the routes in app.py."""
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        logs.log_event(logger, logging.ERROR, "request.server_error", error=error_msg)
+        return web.json_response({"error": error_msg}, status=500)
+
+
+async def close_transport(app):
+    """Close the upstream connection pool when the server shuts down."""
+    await async_transport.close()
+
+
+def start_process_services(refresh_catalog=True):
+    """
+    Start the background work of a serving process, like start_process_services in app.py.
+
+    The catalog refresh runs on a thread with a synchronous explainer, so it never blocks the event loop.
+
+    Args:
+        refresh_catalog (bool): Whether this process runs the startup catalog refresh (default: True)
+    """
+    if refresh_catalog and refresh_on_startup_enabled():
+        start_background_refresh(framework_catalog, FrameworkExplainerAgent(model=explainer_agent.model))
+
+
+def reset_after_fork():
+    """
+    Replace what a worker forked from the preloaded master cannot share with it, like app.py.
+
+    The upstream session is only opened on the worker's own event loop, so it needs no reset.
+    """
+    logs.reset_after_fork()
+    if cache_backend is not None:
+        cache_backend.reopen()
+    lifecycle.reset_after_fork()
+
+
+async def start_services(app):
+    """Start the process's background work, unless serve.py starts it in each worker after the fork."""
+    if not env_flag('SERVE_PRELOAD'):
+        start_process_services()
+
+
+def create_app():
+    """
+    Build the aiohttp application.
+
+    Returns:
+        web.Application: The application with all routes registered
+    """
+    app = web.Application(middlewares=[cors_middleware, metrics_middleware, error_middleware])
+    app.add_routes(routes)
+    app.on_startup.append(start_services)
+    app.on_cleanup.append(close_transport)
+    return app
+
+
+lifecycle.mark_ready()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the framework agents with asyncio route handlers.")
+    parser.add_argument('--host', default=os.getenv('ASYNC_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('ASYNC_PORT', '5001')))
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,271 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from transport import DEFAULT_API_BASE, env_flag
+from resilience import RETRYABLE_STATUSES
+import metrics
+
+load_dotenv()  # Load environment variables from .env file
+
+
+def parse_model_map(value):
+    """
+    Read a model map such as "gpt-4o-mini=llama-3.1-8b-instruct,gpt-4o".
+
+    Args:
+        value (str): Comma-separated entries, each "model=served-name" or just "model"
+
+    Returns:
+        dict: Model name used by the agents -> name the backend serves it under,
+              or None if the value is empty (the backend serves any model as-is)
+    """
+    if not value or not value.strip():
+        return None
+    models = {}
+    for entry in value.split(','):
+        name, _, served = entry.partition('=')
+        if name.strip():
+            models[name.strip()] = served.strip() or name.strip()
+    return models
+
+
+class Backend:
+    """
+    One OpenAI-compatible chat-completions server.
+
+    This can be the OpenAI API or a self-hosted inference server (vLLM, TGI, llama.cpp,
+    ...) that speaks the same protocol. A backend knows its base URL and API key, which
+    of the agents' models it serves and under which name, and whether it supports
+    streaming and JSON mode.
+    """
+
+    def __init__(self, name, base_url, api_key=None, models=None, weight=1, streaming=True, json_mode=True):
+        """
+        Initialize the backend.
+
+        Args:
+            name (str): Short name used in stats and logs
+            base_url (str): Base URL of the API, e.g. "http://10.0.0.5:8000/v1"
+            api_key (str): Bearer token sent with every request (default: None, no Authorization header)
+            models (dict): Model -> served model name (default: None, any model under its own name)
+            weight (float): Share of traffic relative to the other backends (default: 1)
+            streaming (bool): Whether the server can stream completions (default: True)
+            json_mode (bool): Whether the server accepts response_format json_object (default: True)
+        """
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.models = models
+        self.weight = weight
+        self.streaming = streaming
+        self.json_mode = json_mode
+
+    @classmethod
+    def from_env(cls, name):
+        """
+        Read a backend from LLM_BACKEND_<NAME>_* environment variables.
+
+        Args:
+            name (str): Backend name, as listed in LLM_BACKENDS
+
+        Returns:
+            Backend: The backend
+
+        Raises:
+            ValueError: If LLM_BACKEND_<NAME>_URL is not set
+        """
+        prefix = f"LLM_BACKEND_{name.upper()}_"
+        base_url = os.getenv(prefix + 'URL')
+        if not base_url:
+            raise ValueError(f"{prefix}URL must be set for backend '{name}'")
+        return cls(
+            name,
+            base_url,
+            api_key=os.getenv(prefix + 'API_KEY') or None,
+            models=parse_model_map(os.getenv(prefix + 'MODELS')),
+            weight=float(os.getenv(prefix + 'WEIGHT', '1')),
+            streaming=env_flag(prefix + 'STREAMING', True),
+            json_mode=env_flag(prefix + 'JSON_MODE', True),
+        )
+
+    def serves(self, model):
+        """
+        Check whether the backend can answer calls for a model.
+
+        Args:
+            model (str): Model name used by the agents
+
+        Returns:
+            bool: True if the model is in the backend's map, or the backend has no map
+        """
+        return self.models is None or model in self.models
+
+    def prepare(self, headers, data):
+        """
+        Adapt a request built by an agent to this backend.
+
+        Args:
+            headers (dict): Request headers from BaseAgent.build_request
+            data (dict): Request body from BaseAgent.build_request
+
+        Returns:
+            tuple: (headers, body) with the backend's credentials and model name, and
+                   without response_format if the backend has no JSON mode
+        """
+        headers = {key: value for key, value in headers.items() if key != 'Authorization'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        body = dict(data)
+        if self.models is not None:
+            body['model'] = self.models[data['model']]
+        if not self.json_mode:
+            body.pop('response_format', None)
+        return headers, body
+
+
+class BackendPool:
+    """
+    Spreads LLM calls over the backends that serve each model, in proportion to their weights.
+
+    Backends are picked by smooth weighted round-robin, so with weights 3 and 1 the
+    first backend gets three calls out of every four, interleaved rather than in bursts.
+    Each upstream attempt picks again, so a retry or a hedge usually goes to a different
+    server than the attempt before it.
+
+    A backend that fails `eject_after` times in a row (connection errors, timeouts,
+    rate limits and server errors) is skipped for `eject_seconds`, unless no other
+    backend serves the model.
+    """
+
+    def __init__(self, backends, eject_after=None, eject_seconds=None):
+        """
+        Initialize the pool.
+
+        Args:
+            backends (list): Backend objects
+            eject_after (int): Consecutive failures that take a backend out of rotation
+                               (env LLM_BACKEND_EJECT_AFTER, default: 3)
+            eject_seconds (float): Seconds an ejected backend is skipped (env LLM_BACKEND_EJECT_SECONDS, default: 10)
+        """
+        if eject_after is None:
+            eject_after = int(os.getenv('LLM_BACKEND_EJECT_AFTER', '3'))
+        if eject_seconds is None:
+            eject_seconds = float(os.getenv('LLM_BACKEND_EJECT_SECONDS', '10'))
+        self.backends = list(backends)
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+
+        self._lock = threading.Lock()
+        self._current = {backend.name: 0.0 for backend in self.backends}
+        self._failures = {backend.name: 0 for backend in self.backends}
+        self._ejected_until = {}
+        self._requests = {backend.name: 0 for backend in self.backends}
+        self._errors = {backend.name: 0 for backend in self.backends}
+
+    def choose(self, model, stream=False):
+        """
+        Pick the backend for one upstream attempt.
+
+        Args:
+            model (str): Model name used by the agents
+            stream (bool): Whether the call streams its response (default: False)
+
+        Returns:
+            Backend: The backend to send the attempt to, or None if no backend serves the model
+        """
+        now = time.monotonic()
+        with self._lock:
+            eligible = [backend for backend in self.backends
+                        if backend.serves(model) and (backend.streaming or not stream)]
+            healthy = [backend for backend in eligible if self._ejected_until.get(backend.name, 0) <= now]
+            candidates = healthy or eligible
+            if not candidates:
+                return None
+            total = sum(backend.weight for backend in candidates)
+            for backend in candidates:
+                self._current[backend.name] += backend.weight
+            chosen = max(candidates, key=lambda backend: self._current[backend.name])
+            self._current[chosen.name] -= total
+            self._requests[chosen.name] += 1
+            return chosen
+
+    def record(self, backend, status):
+        """
+        Record the outcome of an attempt sent to a backend.
+
+        Args:
+            backend (Backend): The backend the attempt went to
+            status: HTTP status code, or None if no response arrived
+        """
+        failed = status is None or status in RETRYABLE_STATUSES
+        with self._lock:
+            if failed:
+                self._errors[backend.name] += 1
+                self._failures[backend.name] += 1
+                if self._failures[backend.name] >= self.eject_after:
+                    self._ejected_until[backend.name] = time.monotonic() + self.eject_seconds
+                    self._failures[backend.name] = 0
+            else:
+                self._failures[backend.name] = 0
+        metrics.count_backend_request(backend.name, status)
+
+    def stats(self):
+        """
+        Report each backend's configuration and traffic.
+
+        Returns:
+            dict: Per backend: URL, weight, capabilities, models, requests, failed
+                  requests and whether it is currently ejected
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                backend.name: {
+                    'base_url': backend.base_url,
+                    'weight': backend.weight,
+                    'streaming': backend.streaming,
+                    'json_mode': backend.json_mode,
+                    'models': backend.models,
+                    'requests': self._requests[backend.name],
+                    'errors': self._errors[backend.name],
+                    'ejected': self._ejected_until.get(backend.name, 0) > now,
+                }
+                for backend in self.backends
+            }
+
+
+def load_backends():
+    """
+    Build the backend pool from the environment.
+
+    LLM_BACKENDS lists backend names (e.g. "local1,local2,openai"), each configured with
+    LLM_BACKEND_<NAME>_URL, _API_KEY, _MODELS, _WEIGHT, _STREAMING and _JSON_MODE. Without
+    LLM_BACKENDS there is a single "default" backend at LLM_API_BASE using OPENAI_API_KEY.
+
+    Returns:
+        BackendPool: The pool
+    """
+    names = [name.strip() for name in os.getenv('LLM_BACKENDS', '').split(',') if name.strip()]
+    if not names:
+        default = Backend('default', os.getenv('LLM_API_BASE', DEFAULT_API_BASE), api_key=os.getenv('OPENAI_API_KEY'))
+        return BackendPool([default])
+    return BackendPool([Backend.from_env(name) for name in names])
+
+
+_shared_backends = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_backends():
+    """
+    Return the process-wide backend pool, creating it on first use.
+
+    Returns:
+        BackendPool: The shared pool
+    """
+    global _shared_backends
+    with _shared_lock:
+        if _shared_backends is None:
+            _shared_backends = load_backends()
+        return _shared_backends
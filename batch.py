@@ -0,0 +1,394 @@
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from transport import env_flag
+
+load_dotenv()  # Load environment variables from .env file
+
+JOB_TYPES = ('parse', 'explain', 'apply', 'compare')
+
+# Field that carries the main input of each job type, used by the CLI's --input-field option
+PRIMARY_FIELDS = {
+    'parse': 'response',
+    'explain': 'framework_name',
+    'apply': 'situation',
+    'compare': 'situation',
+}
+
+
+def parse_jobs(body):
+    """
+    Split a batch request body into jobs.
+
+    The body may be a JSON array of job objects or JSONL with one job object per line.
+    A line that is not valid JSON becomes a job carrying an 'error' so that it is
+    reported in its own result instead of rejecting the whole batch.
+
+    Args:
+        body (str): The raw request body
+
+    Returns:
+        list: The job objects in order
+    """
+    text = body.strip()
+    if text.startswith('['):
+        jobs = json.loads(text)
+        if not isinstance(jobs, list):
+            raise ValueError("Batch body must be a JSON array or JSONL")
+        return jobs
+
+    jobs = []
+    for line in text.splitlines():
+        if line.strip():
+            jobs.append(parse_job_line(line))
+    return jobs
+
+
+def parse_job_line(line):
+    """
+    Decode one JSONL line into a job.
+
+    Args:
+        line (str): A line of JSONL
+
+    Returns:
+        dict: The job, or a dict with an 'error' key if the line is not a JSON object
+    """
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"error": f"Invalid JSON: {str(e)}"}
+    if not isinstance(job, dict):
+        return {"error": "Each job must be a JSON object"}
+    return job
+
+
+class BatchRunner:
+    """
+    Runs parse/explain/apply/compare jobs through the existing agents with bounded concurrency.
+
+    Each job is a JSON object with a 'type' and the same fields as the request JSON of the
+    matching endpoint, plus an optional 'id' that is echoed back:
+
+        {"id": "a1", "type": "parse", "response": "...", "num_frameworks": 2, "quality": "auto"}
+        {"id": "a2", "type": "explain", "framework_name": "SWOT Analysis"}
+        {"id": "a3", "type": "apply", "framework_name": "...", "situation": "..."}
+        {"id": "a4", "type": "compare", "framework_names": ["...", "..."], "situation": "..."}
+
+    Jobs are pulled lazily from the input, at most max_workers run at the same time, and
+    results are yielded as soon as each job finishes (not in input order). A failing job
+    produces a result with 'status': 'error' and never stops the rest of the batch.
+    """
+
+    def __init__(self, suggester_agent, explainer_agent, application_agent, comparison_agent, max_workers=None):
+        """
+        Initialize the runner.
+
+        Args:
+            suggester_agent (FrameworkSuggesterAgent): Agent for 'parse' jobs
+            explainer_agent (FrameworkExplainerAgent): Agent for 'explain' jobs
+            application_agent (FrameworkApplicationAgent): Agent for 'apply' jobs
+            comparison_agent (FrameworkComparisonAgent): Agent for 'compare' jobs
+            max_workers (int): Jobs run at the same time (env BATCH_MAX_WORKERS, default: 8)
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv('BATCH_MAX_WORKERS', '8'))
+        self.suggester_agent = suggester_agent
+        self.explainer_agent = explainer_agent
+        self.application_agent = application_agent
+        self.comparison_agent = comparison_agent
+        self.max_workers = max_workers
+
+    def execute(self, job):
+        """
+        Run a single job through the matching agent.
+
+        Args:
+            job (dict): The job object
+
+        Returns:
+            The agent's result, or a dict with an 'error' key if the job is invalid or failed
+        """
+        if "error" in job:
+            return {"error": job["error"]}
+
+        job_type = job.get('type')
+        if job_type == 'parse':
+            user_input = job.get('response')
+            if not user_input:
+                return {"error": "No situation provided"}
+            num_frameworks = job.get('num_frameworks', 2)
+            frameworks = self.suggester_agent.suggest_frameworks(user_input, num_frameworks, job.get('quality', 'auto'))
+            if isinstance(frameworks, list):
+                return frameworks[:num_frameworks]
+            return frameworks
+
+        if job_type == 'explain':
+            framework_name = job.get('framework_name')
+            if not framework_name:
+                return {"error": "No framework name provided"}
+            return self.explainer_agent.explain_framework(framework_name, job.get('detail', 'full'))
+
+        if job_type == 'apply':
+            framework_name = job.get('framework_name')
+            user_situation = job.get('situation')
+            if not framework_name:
+                return {"error": "No framework name provided"}
+            if not user_situation:
+                return {"error": "No situation provided"}
+            return self.application_agent.apply_framework(framework_name, user_situation,
+                                                          job.get('num_questions', self.application_agent.DEFAULT_QUESTIONS))
+
+        if job_type == 'compare':
+            framework_names = job.get('framework_names')
+            user_situation = job.get('situation')
+            if not framework_names or not isinstance(framework_names, list):
+                return {"error": "No framework names provided or invalid format"}
+            if not user_situation:
+                return {"error": "No situation provided"}
+            if job.get('fan_out', env_flag('COMPARE_FAN_OUT')):
+                return self.comparison_agent.compare_frameworks_fan_out(framework_names, user_situation)
+            return self.comparison_agent.compare_frameworks(framework_names, user_situation)
+
+        return {"error": f"Unknown job type: {job_type}. Expected one of {', '.join(JOB_TYPES)}"}
+
+    def run_job(self, index, job):
+        """
+        Run a single job and wrap its outcome in a result record.
+
+        Args:
+            index (int): Position of the job in the batch
+            job (dict): The job object
+
+        Returns:
+            dict: {"index", "id", "type", "status", "latency_ms", and "result" or "error"}
+        """
+        record = {"index": index, "id": job.get('id'), "type": job.get('type')}
+        start = time.perf_counter()
+        try:
+            result = self.execute(job)
+        except Exception as e:
+            result = {"error": f"Server error: {str(e)}"}
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        if isinstance(result, dict) and "error" in result:
+            record["status"] = "error"
+            record["error"] = result["error"]
+        else:
+            record["status"] = "ok"
+            record["result"] = result
+        return record
+
+    def run(self, jobs):
+        """
+        Run jobs with bounded concurrency, yielding results as they finish.
+
+        Jobs are read from the iterable only as worker slots free up, so a large or
+        streamed input is never held in memory all at once.
+
+        Args:
+            jobs (iterable): Job objects, possibly a lazy generator
+
+        Yields:
+            dict: One result record per job, in completion order
+        """
+        return self.run_indexed(enumerate(jobs))
+
+    def run_indexed(self, indexed_jobs):
+        """
+        Like run, but takes (index, job) pairs so callers can keep their own numbering.
+
+        Args:
+            indexed_jobs (iterable): (index, job) pairs, possibly a lazy generator
+
+        Yields:
+            dict: One result record per job, in completion order
+        """
+        job_iter = iter(indexed_jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch") as executor:
+            pending = set()
+
+            def submit_next():
+                for index, job in job_iter:
+                    if not isinstance(job, dict):
+                        job = {"error": "Each job must be a JSON object"}
+                    # Run in a copy of the caller's context so request-scoped labels (e.g. metrics) carry over
+                    pending.add(executor.submit(contextvars.copy_context().run, self.run_job, index, job))
+                    return True
+                return False
+
+            # Fill every worker slot, then top up one job per finished job
+            while len(pending) < self.max_workers and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    yield future.result()
+                    submit_next()
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Args:
+        values (list): The samples
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def load_checkpoint(output_path, retry_errors=False):
+    """
+    Find the jobs an earlier run already finished by reading its output file.
+
+    The output file is the checkpoint: every finished job has exactly one JSONL line
+    with its input line number. A line cut short by an interrupted run is truncated
+    away so that appending can continue cleanly.
+
+    Args:
+        output_path (str): Path of the JSONL results file
+        retry_errors (bool): Treat jobs that ended in an error as not done (default: False)
+
+    Returns:
+        set: Input line numbers that do not need to run again
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+
+    for line in data.decode('utf-8').splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if retry_errors and record.get('status') != 'ok':
+            done.discard(record.get('index'))
+        else:
+            done.add(record.get('index'))
+    return done
+
+
+def iter_input_jobs(input_path, done, default_type=None, input_field=None):
+    """
+    Stream jobs from a JSONL file one line at a time, skipping finished ones.
+
+    Args:
+        input_path (str): Path of the JSONL input file
+        done (set): Line numbers to skip
+        default_type (str): Job type for lines without a 'type' (default: None)
+        input_field (str): Field to copy into the job type's main input field when it is
+                           missing, e.g. "body" to use a request file's body as the situation
+
+    Yields:
+        tuple: (line number, job)
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for index, line in enumerate(f):
+            if index in done or not line.strip():
+                continue
+            job = parse_job_line(line)
+            if "error" not in job:
+                if default_type and not job.get('type'):
+                    job['type'] = default_type
+                primary = PRIMARY_FIELDS.get(job.get('type'))
+                if input_field and primary and not job.get(primary) and job.get(input_field):
+                    job[primary] = job[input_field]
+                if not job.get('id'):
+                    job['id'] = job.get('request_id')
+            yield index, job
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run parse/explain/apply/compare jobs from a JSONL file through the agents. "
+                    "Results are appended to the output file as jobs finish; rerun the same "
+                    "command to resume an interrupted run.")
+    parser.add_argument('input', help="JSONL file with one job per line")
+    parser.add_argument('-o', '--output', help="JSONL results file (default: <input>.results.jsonl)")
+    parser.add_argument('-w', '--workers', type=int, default=int(os.getenv('BATCH_MAX_WORKERS', '8')),
+                        help="jobs to run at the same time")
+    parser.add_argument('--type', choices=JOB_TYPES, help="job type for lines without a 'type' field")
+    parser.add_argument('--input-field', help="field to use as the main input when the job's own field is missing")
+    parser.add_argument('--retry-errors', action='store_true', help="rerun jobs that failed in an earlier run")
+    parser.add_argument('--verbose', action='store_true', help="log every LLM call, with full payloads")
+    args = parser.parse_args()
+
+    import logs
+    if args.verbose:
+        os.environ['LOG_DEBUG_PAYLOADS'] = 'true'
+    logs.configure_logging(level='DEBUG' if args.verbose else os.getenv('LOG_LEVEL', 'WARNING'))
+
+    from agents import FrameworkSuggesterAgent, FrameworkExplainerAgent, FrameworkApplicationAgent, FrameworkComparisonAgent
+    from cache import ExplanationCache, ResultCache, SimilarityCache
+    from catalog import FrameworkCatalog
+    from retrieval import FrameworkRetriever
+    from transport import PooledTransport
+
+    output_path = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+    done = load_checkpoint(output_path, args.retry_errors)
+    if done:
+        print(f"Resuming: {len(done)} jobs already in {output_path}", file=sys.stderr)
+
+    transport = PooledTransport(pool_maxsize=max(args.workers, 1) * 2)
+    catalog = FrameworkCatalog()
+    retriever = FrameworkRetriever(catalog) if env_flag('PARSE_RETRIEVAL', False) else None
+    result_cache = ResultCache()
+    runner = BatchRunner(
+        FrameworkSuggesterAgent(transport=transport, cache=SimilarityCache(), retriever=retriever, result_cache=result_cache),
+        FrameworkExplainerAgent(transport=transport, cache=ExplanationCache(), catalog=catalog),
+        FrameworkApplicationAgent(transport=transport, cache=result_cache),
+        FrameworkComparisonAgent(transport=transport, cache=result_cache),
+        max_workers=args.workers,
+    )
+
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    jobs = iter_input_jobs(args.input, done, args.type, args.input_field)
+    try:
+        with open(output_path, 'a', encoding='utf-8') as out, contextlib.closing(runner.run_indexed(jobs)) as records:
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                latencies.append(record["latency_ms"])
+                if record["status"] != "ok":
+                    errors += 1
+                print(f"\r{len(latencies)} done, {errors} errors", end='', file=sys.stderr)
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume.", file=sys.stderr)
+    finally:
+        transport.close()
+
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(f"Jobs: {len(latencies)} ({errors} errors) in {elapsed:.2f}s -> {output_path}", file=sys.stderr)
+    if latencies:
+        print(f"Throughput: {len(latencies) / elapsed:.2f} jobs/s", file=sys.stderr)
+        print(f"Latency: p50 {percentile(latencies, 50):.0f} ms, p95 {percentile(latencies, 95):.0f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
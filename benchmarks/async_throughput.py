@@ -0,0 +1,90 @@
+"""
+Concurrent-request throughput of the sync and async agent layers.
+
+Starts the local stub completions API, then pushes the same number of explain
+requests through FrameworkExplainerAgent on a thread pool and through
+AsyncFrameworkExplainerAgent on a single event loop, and prints requests/second
+for both. No API credits are used.
+
+Usage:
+    python benchmarks/async_throughput.py --requests 500 --concurrency 200 --latency 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import FrameworkExplainerAgent
+from async_agents import AsyncFrameworkExplainerAgent, AsyncTransport
+from transport import PooledTransport
+from benchmarks.stub_server import start_stub_server
+
+
+def run_sync(base_url, requests, threads):
+    """
+    Send the requests through the blocking agent on a thread pool.
+
+    Args:
+        base_url (str): Base URL of the stub API
+        requests (int): Number of requests to send
+        threads (int): Number of worker threads
+
+    Returns:
+        float: Elapsed wall-clock seconds
+    """
+    transport = PooledTransport(base_url=base_url, pool_maxsize=threads)
+    agent = FrameworkExplainerAgent(transport=transport)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(agent.explain_framework, ["SWOT Analysis"] * requests))
+    elapsed = time.perf_counter() - start
+    transport.close()
+    return elapsed
+
+
+async def run_async(base_url, requests, concurrency):
+    """
+    Send the requests through the async agent on the current event loop.
+
+    Args:
+        base_url (str): Base URL of the stub API
+        requests (int): Number of requests to send
+        concurrency (int): Maximum upstream calls in flight
+
+    Returns:
+        float: Elapsed wall-clock seconds
+    """
+    transport = AsyncTransport(base_url=base_url, max_concurrency=concurrency)
+    agent = AsyncFrameworkExplainerAgent(async_transport=transport)
+    start = time.perf_counter()
+    await asyncio.gather(*(agent.explain_framework("SWOT Analysis") for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await transport.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async agent throughput against a local stub API.")
+    parser.add_argument('--requests', type=int, default=500, help="requests to send per mode")
+    parser.add_argument('--concurrency', type=int, default=200, help="async in-flight limit")
+    parser.add_argument('--threads', type=int, default=16, help="sync worker threads, like a threaded WSGI worker")
+    parser.add_argument('--latency', type=float, default=0.5, help="stub response delay in seconds")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency)
+
+    sync_elapsed = run_sync(base_url, args.requests, args.threads)
+    async_elapsed = asyncio.run(run_async(base_url, args.requests, args.concurrency))
+    server.shutdown()
+
+    print(f"Stub latency: {args.latency:.3f}s, requests per mode: {args.requests}")
+    print(f"sync  ({args.threads} threads):      {args.requests / sync_elapsed:8.1f} req/s  ({sync_elapsed:.2f}s)")
+    print(f"async ({args.concurrency} in flight):   {args.requests / async_elapsed:8.1f} req/s  ({async_elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
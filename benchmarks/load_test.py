@@ -0,0 +1,302 @@
+"""
+Open-loop load test of the HTTP endpoints against the local stub completions API.
+
+Starts the stub server, launches the app as a separate process pointed at it
+(or uses an already running server via --url), and sends /parse, /explain,
+/apply and /compare requests at a fixed target rate. Requests are scheduled on
+the clock rather than after the previous one returns, and latency is measured
+from the scheduled send time, so a server that falls behind shows up as growing
+latency instead of a quietly lower request rate. No API credits are used.
+
+Reports throughput, p50/p95/p99 latency per endpoint and the server's resident
+memory, and can write the numbers as JSON to compare runs.
+
+Usage:
+    python benchmarks/load_test.py --server flask --rps 50 --duration 30 --latency 0.5
+    python benchmarks/load_test.py --server async --rps 200 --distribution lognormal --error-rate 0.01
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --rps 20 --endpoints parse,explain
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch import percentile
+from benchmarks.stub_server import start_stub_server, DISTRIBUTIONS
+
+# One request body per endpoint, shaped like the ones static/script.js sends
+PAYLOADS = {
+    'parse': {
+        "response": "I received a job offer at a startup with higher pay but less stability. "
+                    "How should I weigh it against my current role?",
+        "num_frameworks": 2
+    },
+    'explain': {"framework_name": "SWOT Analysis"},
+    'apply': {
+        "framework_name": "SWOT Analysis",
+        "situation": "Deciding whether to accept a startup job offer."
+    },
+    'compare': {
+        "framework_names": ["SWOT Analysis", "Decision Matrix"],
+        "situation": "Deciding whether to accept a startup job offer."
+    },
+}
+
+# How to launch each server mode; {port} is filled in with a free port
+SERVER_COMMANDS = {
+    'flask': [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', '{port}', '--no-reload'],
+    'async': [sys.executable, 'async_app.py', '--port', '{port}'],
+}
+
+
+def free_port():
+    """Return a TCP port that is free on localhost right now."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=30.0):
+    """
+    Wait until the server accepts connections.
+
+    Args:
+        url (str): Base URL of the server
+        process (subprocess.Popen): The server process, to notice early exits
+        timeout (float): Seconds to wait before giving up (default: 30.0)
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            requests.get(f"{url}/stats", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout:.0f}s")
+
+
+def rss_mb(pid):
+    """
+    Resident memory of a process, read from /proc.
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        float: Resident set size in MiB, or None where /proc is not available
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler:
+    """Samples a process's resident memory on a background thread and keeps the peak."""
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.start_mb = rss_mb(pid)
+        self.peak_mb = self.start_mb
+        self.end_mb = self.start_mb
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            value = rss_mb(self.pid)
+            if value is not None:
+                self.end_mb = value
+                self.peak_mb = max(self.peak_mb or 0, value)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class LoadGenerator:
+    """
+    Sends requests at a fixed rate and records each one's latency and outcome.
+
+    A dispatcher thread hands each request to a worker pool at its scheduled time.
+    If every worker is busy the request waits in the pool's queue, and that wait is
+    counted in its latency.
+    """
+
+    def __init__(self, url, endpoints, rps, duration, workers, timeout):
+        self.url = url.rstrip('/')
+        self.endpoints = endpoints
+        self.rps = rps
+        self.duration = duration
+        self.workers = workers
+        self.timeout = timeout
+        self.results = []  # (endpoint, latency seconds, ok, status)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _send(self, endpoint, scheduled):
+        status = None
+        try:
+            response = self._session().post(f"{self.url}/{endpoint}", json=PAYLOADS[endpoint], timeout=self.timeout)
+            status = response.status_code
+            ok = status == 200
+        except requests.RequestException:
+            ok = False
+        latency = time.perf_counter() - scheduled
+        with self._lock:
+            self.results.append((endpoint, latency, ok, status))
+
+    def run(self):
+        """
+        Send requests for the configured duration and wait for the stragglers.
+
+        Returns:
+            float: Seconds from the first send until the last response
+        """
+        total = int(self.rps * self.duration)
+        interval = 1.0 / self.rps
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i in range(total):
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._send, self.endpoints[i % len(self.endpoints)], scheduled)
+        return time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    """
+    Aggregate per-request results into throughput and latency percentiles.
+
+    Args:
+        results (list): (endpoint, latency seconds, ok, status) tuples
+        elapsed (float): Wall-clock seconds of the run
+
+    Returns:
+        dict: Stats per endpoint plus an "all" entry
+    """
+    groups = {}
+    for endpoint, latency, ok, status in results:
+        groups.setdefault(endpoint, []).append((latency, ok, status))
+    groups['all'] = [(latency, ok, status) for _, latency, ok, status in results]
+
+    summary = {}
+    for name, rows in groups.items():
+        latencies_ms = [latency * 1000 for latency, ok, _ in rows if ok]
+        errors = {}
+        for _, ok, status in rows:
+            if not ok:
+                key = str(status or 'connection')
+                errors[key] = errors.get(key, 0) + 1
+        summary[name] = {
+            'requests': len(rows),
+            'ok': len(latencies_ms),
+            'errors': errors,
+            'throughput_rps': round(len(latencies_ms) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies_ms, 50), 1),
+            'p95_ms': round(percentile(latencies_ms, 95), 1),
+            'p99_ms': round(percentile(latencies_ms, 99), 1),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the app's endpoints at a target rate against a local stub API.")
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='flask', help="server mode to launch")
+    parser.add_argument('--url', help="benchmark an already running server instead of launching one")
+    parser.add_argument('--endpoints', default='parse,explain,apply,compare', help="comma-separated endpoints, sent round-robin")
+    parser.add_argument('--rps', type=float, default=20.0, help="target requests per second")
+    parser.add_argument('--duration', type=float, default=15.0, help="seconds to send requests for")
+    parser.add_argument('--workers', type=int, default=256, help="maximum requests in flight")
+    parser.add_argument('--timeout', type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument('--latency', type=float, default=0.5, help="mean stub latency in seconds")
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='lognormal', help="stub latency distribution")
+    parser.add_argument('--spread', type=float, default=0.5, help="width of the stub latency distribution")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of stub responses that fail")
+    parser.add_argument('--error-status', type=int, default=500, help="HTTP status of injected stub failures")
+    parser.add_argument('--with-caches', action='store_true', help="keep the server's response caches and catalog enabled")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in endpoints if name not in PAYLOADS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    stub, base_url = start_stub_server(latency=args.latency, distribution=args.distribution, spread=args.spread,
+                                       error_rate=args.error_rate, error_status=args.error_status)
+
+    process = None
+    sampler = None
+    url = args.url
+    if not url:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, LLM_API_BASE=base_url)
+        if not args.with_caches:
+            # Expire cache entries and skip the catalog so every request reaches the stub and measures the full path
+            env.update(EXPLAIN_CACHE_TTL='0', RESULT_CACHE_TTL='0', CACHE_BACKEND='none', PARSE_CACHE_TTL='0', FRAMEWORK_CATALOG_PATH='')
+        command = [part.format(port=port) for part in SERVER_COMMANDS[args.server]]
+        process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_until_ready(url, process)
+        sampler = MemorySampler(process.pid)
+        sampler.start()
+
+    try:
+        generator = LoadGenerator(url, endpoints, args.rps, args.duration, args.workers, args.timeout)
+        elapsed = generator.run()
+    finally:
+        if sampler:
+            sampler.stop()
+        if process:
+            process.terminate()
+            process.wait()
+        stub.shutdown()
+
+    summary = summarize(generator.results, elapsed)
+    memory = {'start_mb': sampler.start_mb, 'peak_mb': sampler.peak_mb, 'end_mb': sampler.end_mb} if sampler else None
+
+    print(f"Server: {args.url or args.server}, target {args.rps:g} req/s for {args.duration:g}s, "
+          f"stub {args.distribution} latency mean {args.latency:g}s, error rate {args.error_rate:g}")
+    print(f"{'endpoint':<10} {'requests':>8} {'ok':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  errors")
+    for name, stats in summary.items():
+        errors = ', '.join(f"{status}: {count}" for status, count in stats['errors'].items()) or '-'
+        print(f"{name:<10} {stats['requests']:>8} {stats['ok']:>6} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}  {errors}")
+    if memory and memory['peak_mb'] is not None:
+        print(f"Server RSS: start {memory['start_mb']:.1f} MiB, peak {memory['peak_mb']:.1f} MiB, end {memory['end_mb']:.1f} MiB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'elapsed_s': round(elapsed, 3), 'endpoints': summary, 'memory': memory}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Local stand-in for a Redis server.
+
+Speaks the Redis protocol (RESP) for the commands the shared result cache uses:
+PING, AUTH, SELECT, GET, SET (with EX/PX/NX/XX), DEL, EXISTS, PTTL, TTL, DBSIZE
+and FLUSHDB. Keys expire like in Redis, and --maxkeys evicts the least recently
+used key once the store is full, like maxmemory with allkeys-lru. Point the app at
+it with CACHE_BACKEND=redis REDIS_URL=redis://127.0.0.1:<port>/0 to exercise the
+Redis cache backend without installing Redis.
+
+Usage:
+    python benchmarks/redis_stub.py --port 6390
+    python benchmarks/redis_stub.py --port 6390 --maxkeys 1000 --latency 0.002
+"""
+import time
+import argparse
+import threading
+import socketserver
+from collections import OrderedDict
+
+
+class Store:
+    """Thread-safe key/value store with per-key expiry and LRU eviction."""
+
+    def __init__(self, maxkeys=0):
+        """
+        Initialize the store.
+
+        Args:
+            maxkeys (int): Keys kept before the least recently used one is evicted (0 for no limit)
+        """
+        self.maxkeys = maxkeys
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        """Return the entry of a key, dropping it if it expired. Called with the lock held."""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        """Return the value of a key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, expires_at=None, nx=False, xx=False):
+        """Store a value, honouring NX/XX; returns False if the condition was not met."""
+        with self._lock:
+            exists = self._live(key) is not None
+            if (nx and exists) or (xx and not exists):
+                return False
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while self.maxkeys and len(self._data) > self.maxkeys:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, keys):
+        """Remove keys, returning how many existed."""
+        with self._lock:
+            return sum(1 for key in keys if self._live(key) is not None and self._data.pop(key, None) is not None)
+
+    def exists(self, keys):
+        """Count the keys that exist."""
+        with self._lock:
+            return sum(1 for key in keys if self._live(key) is not None)
+
+    def pttl(self, key):
+        """Return milliseconds until a key expires, -1 if it never does, -2 if it is missing."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return -2
+            if entry[1] is None:
+                return -1
+            return max(int((entry[1] - time.time()) * 1000), 0)
+
+    def size(self):
+        """Count the keys that have not expired."""
+        with self._lock:
+            now = time.time()
+            return sum(1 for _, expires_at in self._data.values() if expires_at is None or expires_at > now)
+
+    def flush(self):
+        """Remove every key."""
+        with self._lock:
+            self._data.clear()
+
+
+def encode(reply):
+    """Encode a reply: bytes as a bulk string, str as a status, int, list, None as nil, Exception as an error."""
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return b'-%s\r\n' % str(reply).encode('utf-8')
+    if isinstance(reply, bool):
+        return b':%d\r\n' % int(reply)
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode('utf-8')
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(encode(item) for item in reply)
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RedisHandler(socketserver.StreamRequestHandler):
+    """Serves the commands of one client connection until it disconnects."""
+
+    def read_command(self):
+        """Read one command (an array of bulk strings), or return None when the client disconnects."""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # Inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        """Answer commands in order, so pipelined commands get their replies in order too."""
+        while True:
+            try:
+                args = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            try:
+                reply = self.dispatch([args[0].decode().upper()] + args[1:])
+            except (ValueError, IndexError):
+                reply = Exception("ERR syntax error")
+            self.wfile.write(encode(reply))
+            self.wfile.flush()
+
+    def dispatch(self, args):
+        """Run one command and return its reply."""
+        store = self.server.store
+        command, rest = args[0], args[1:]
+        if command == 'PING':
+            return rest[0] if rest else 'PONG'
+        if command in ('AUTH', 'SELECT'):
+            return 'OK'
+        if command == 'GET':
+            return store.get(rest[0])
+        if command == 'SET':
+            expires_at, nx, xx = None, False, False
+            options = [option.upper() for option in rest[2:]]
+            for i, option in enumerate(options):
+                if option == b'EX':
+                    expires_at = time.time() + int(rest[2 + i + 1])
+                elif option == b'PX':
+                    expires_at = time.time() + int(rest[2 + i + 1]) / 1000
+                nx = nx or option == b'NX'
+                xx = xx or option == b'XX'
+            return 'OK' if store.set(rest[0], rest[1], expires_at, nx, xx) else None
+        if command == 'DEL':
+            return store.delete(rest)
+        if command == 'EXISTS':
+            return store.exists(rest)
+        if command == 'PTTL':
+            return store.pttl(rest[0])
+        if command == 'TTL':
+            ttl = store.pttl(rest[0])
+            return ttl if ttl < 0 else ttl // 1000
+        if command == 'DBSIZE':
+            return store.size()
+        if command == 'FLUSHDB':
+            store.flush()
+            return 'OK'
+        return Exception(f"ERR unknown command '{command}'")
+
+
+class RedisStubServer(socketserver.ThreadingTCPServer):
+    """Threaded server with one handler thread per client connection."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, maxkeys=0, latency=0.0):
+        """
+        Initialize the server.
+
+        Args:
+            address (tuple): (host, port) to listen on
+            maxkeys (int): Keys kept before LRU eviction, 0 for no limit (default: 0)
+            latency (float): Seconds added to every command (default: 0.0)
+        """
+        super().__init__(address, RedisHandler)
+        self.store = Store(maxkeys)
+        self.latency = latency
+
+
+
+def start_redis_stub(port=0, maxkeys=0, latency=0.0):
+    """
+    Start the Redis stand-in on a background thread.
+
+    Args:
+        port (int): Port to listen on, or 0 to pick a free one (default: 0)
+        maxkeys (int): Keys kept before LRU eviction, 0 for no limit (default: 0)
+        latency (float): Seconds added to every command (default: 0.0)
+
+    Returns:
+        tuple: (server, url) where url can be used as REDIS_URL
+    """
+    server = RedisStubServer(('127.0.0.1', port), maxkeys, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{server.server_address[1]}/0"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for Redis.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    parser.add_argument('--maxkeys', type=int, default=0, help="keys kept before LRU eviction (0 for no limit)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every command")
+    args = parser.parse_args()
+    server = RedisStubServer((args.host, args.port), args.maxkeys, args.latency)
+    print(f"Redis stand-in listening on {args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,305 @@
+"""
+Local stand-in for the chat-completions API.
+
+Answers POST /v1/chat/completions with a canned JSON payload matching whichever
+agent sent the request, after a delay drawn from a configurable latency
+distribution. A configurable fraction of requests fails with an HTTP error, and
+"stream": true requests are answered with server-sent chunks like the real API.
+Usage blocks report cached prompt tokens like the API's prompt cache would, for the
+leading messages already sent in an earlier request.
+Point the agents at it with LLM_API_BASE=http://127.0.0.1:<port>/v1 to exercise
+the app without API credits.
+
+Usage:
+    python benchmarks/stub_server.py --port 8900 --latency 0.5
+    python benchmarks/stub_server.py --latency 0.8 --distribution lognormal --spread 0.5 --error-rate 0.02
+"""
+import json
+import math
+import hashlib
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Canned responses, keyed on a phrase that only appears in that agent's task prompt
+CANNED_CONTENT = {
+    'suggest the most appropriate': [
+        {"name": "SWOT Analysis", "description": "A framework for identifying strengths, weaknesses, opportunities, and threats.", "strengths": "Helps in strategic planning."},
+        {"name": "Decision Matrix", "description": "A tool for evaluating and prioritizing options based on specific criteria.", "strengths": "Provides a clear comparison."},
+        {"name": "Cost-Benefit Analysis", "description": "A method for comparing the costs and benefits of different choices.", "strengths": "Helps in financial decision-making."}
+    ],
+    'explain the specified framework': {
+        "explanation": "SWOT Analysis maps internal strengths and weaknesses against external opportunities and threats.",
+        "steps": ["List strengths", "List weaknesses", "List opportunities", "List threats", "Derive strategies"],
+        "examples": ["Evaluating a job offer", "Planning a product launch"],
+        "limitations": ["Can be subjective", "Does not rank factors"]
+    },
+    'help the user apply': {
+        "questions": ["What are your strongest skills?", "What risks worry you most?"],
+        "template": "Strengths: ... Weaknesses: ... Opportunities: ... Threats: ...",
+        "interpretation_guidance": "Favour options that use strengths to capture opportunities."
+    },
+    'compare the specified': {
+        "comparison": "SWOT is exploratory while a Decision Matrix scores known options.",
+        "pros_cons": "SWOT: broad but unranked. Decision Matrix: precise but needs criteria.",
+        "recommendation": "Start with SWOT, then score the options with a Decision Matrix."
+    },
+    # Fan-out comparison: one evaluation per framework, then the synthesis call
+    'evaluate how well the specified': {
+        "framework": "SWOT Analysis",
+        "key_features": "Separates internal factors from external ones.",
+        "pros": "Quick to run and easy to explain.",
+        "cons": "Does not rank or weigh the factors it surfaces.",
+        "fit_score": 7
+    },
+    'Combine them into': {
+        "comparison": "SWOT is exploratory while a Decision Matrix scores known options.",
+        "pros_cons": "SWOT: broad but unranked. Decision Matrix: precise but needs criteria.",
+        "recommendation": "Start with SWOT, then score the options with a Decision Matrix."
+    },
+}
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+
+class LatencyModel:
+    """
+    Draws per-request delays from a distribution with a given mean.
+
+    - fixed: always the mean
+    - uniform: evenly spread over mean * (1 - spread) .. mean * (1 + spread)
+    - exponential: memoryless delays, a long but thin tail
+    - lognormal: the heavy right tail typical of LLM APIs; spread is the sigma of the
+      underlying normal, so 0.5 gives a p99 of roughly 2.5x the median
+    """
+
+    def __init__(self, mean=0.0, distribution='fixed', spread=0.5, seed=None):
+        """
+        Initialize the model.
+
+        Args:
+            mean (float): Mean delay in seconds (default: 0.0)
+            distribution (str): One of DISTRIBUTIONS (default: "fixed")
+            spread (float): Width of the uniform and lognormal distributions (default: 0.5)
+            seed (int): Seed for reproducible runs (default: None)
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.mean = mean
+        self.distribution = distribution
+        self.spread = spread
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """
+        Draw one delay.
+
+        Returns:
+            float: Seconds to wait
+        """
+        if self.mean <= 0 or self.distribution == 'fixed':
+            return max(self.mean, 0.0)
+        with self._lock:
+            if self.distribution == 'uniform':
+                return self._random.uniform(self.mean * (1 - self.spread), self.mean * (1 + self.spread))
+            if self.distribution == 'exponential':
+                return self._random.expovariate(1 / self.mean)
+            # Pick mu so that the distribution's mean (not its median) is self.mean
+            mu = math.log(self.mean) - self.spread ** 2 / 2
+            return self._random.lognormvariate(mu, self.spread)
+
+
+def canned_content(messages):
+    """
+    Pick the canned payload for the agent that sent the messages.
+
+    Args:
+        messages (list): The chat messages from the request body
+
+    Returns:
+        str: JSON text to use as the completion content
+    """
+    prompt = " ".join(message.get('content', '') for message in messages)
+    for phrase, payload in CANNED_CONTENT.items():
+        if phrase in prompt:
+            return json.dumps(payload)
+    return json.dumps({"error": "stub has no canned response for this prompt"})
+
+
+class PromptCache:
+    """
+    Imitates the API's prompt cache at message granularity.
+
+    The leading messages of a request that an earlier request started with too count
+    as cached, so a prompt whose first messages are byte-identical to a previous
+    one's reports those tokens as cached_tokens. Tokens are estimated at four
+    characters each.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def usage(self, messages):
+        """
+        Count the prompt tokens of a request and how many of them were cached.
+
+        Args:
+            messages (list): The chat messages from the request body
+
+        Returns:
+            tuple: (prompt_tokens, cached_tokens)
+        """
+        prefix = hashlib.sha256()
+        total_chars = cached_chars = 0
+        matched = True
+        with self._lock:
+            for message in messages:
+                text = f"{message.get('role')}\n{message.get('content') or ''}\n"
+                prefix.update(text.encode('utf-8'))
+                key = prefix.hexdigest()
+                total_chars += len(text)
+                matched = matched and key in self._seen
+                if matched:
+                    cached_chars += len(text)
+                self._seen.add(key)
+        return max(total_chars // 4, 1), cached_chars // 4
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler that answers like the chat-completions endpoint."""
+
+    protocol_version = "HTTP/1.1"  # Keep connections alive like the real API
+    latency = 0.0
+    latency_model = None
+    error_rate = 0.0
+    error_status = 500
+    stream_chunk_size = 16
+    prompt_cache = PromptCache()
+
+    def log_message(self, format, *args):
+        """Silence per-request logging."""
+
+    def do_HEAD(self):
+        """Answer pre-connect requests."""
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        """Answer a chat-completions request after a sampled delay, possibly with an injected error."""
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        content = canned_content(body.get('messages', []))
+        prompt_tokens, cached_tokens = self.prompt_cache.usage(body.get('messages', []))
+        time.sleep(self.latency_model.sample() if self.latency_model else self.latency)
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.send_json(self.error_status, {"error": {"message": "stub injected error", "type": "server_error"}})
+            return
+
+        if body.get('stream'):
+            self.send_stream(body.get('model'), content)
+            return
+
+        self.send_json(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": body.get('model'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        })
+
+    def send_json(self, status, payload):
+        """Send a JSON response with a Content-Length so the connection stays reusable."""
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, model, content):
+        """Send the content as chat.completion.chunk server-sent events using chunked encoding."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_chunk(data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        for start in range(0, len(content), self.stream_chunk_size):
+            event = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + self.stream_chunk_size]}, "finish_reason": None}]
+            }
+            write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+        write_chunk(b"data: [DONE]\n\n")
+        write_chunk(b"")
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server with a listen backlog deep enough for concurrency benchmarks."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_stub_server(port=0, latency=0.0, distribution='fixed', spread=0.5, error_rate=0.0, error_status=500, seed=None):
+    """
+    Start the stub server on a background thread.
+
+    Args:
+        port (int): Port to listen on, or 0 to pick a free one (default: 0)
+        latency (float): Mean seconds to wait before answering each request (default: 0.0)
+        distribution (str): Latency distribution, one of DISTRIBUTIONS (default: "fixed")
+        spread (float): Width of the uniform and lognormal distributions (default: 0.5)
+        error_rate (float): Fraction of requests answered with error_status (default: 0.0)
+        error_status (int): HTTP status used for injected errors, e.g. 429 or 500 (default: 500)
+        seed (int): Seed for reproducible latency draws (default: None)
+
+    Returns:
+        tuple: (server, base_url) where base_url can be used as LLM_API_BASE
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'latency': latency,
+        'latency_model': LatencyModel(latency, distribution, spread, seed),
+        'error_rate': error_rate,
+        'error_status': error_status,
+    })
+    server = StubServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the chat-completions API.")
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.5, help="mean seconds to wait before each response")
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='fixed', help="latency distribution")
+    parser.add_argument('--spread', type=float, default=0.5, help="width of the uniform/lognormal distribution")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument('--seed', type=int, help="seed for reproducible latency draws")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.distribution, args.spread,
+                                         args.error_rate, args.error_status, args.seed)
+    print(f"Stub completions API listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
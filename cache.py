@@ -0,0 +1,864 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from vectors import HashingVectorizer, l2_normalize
+
+load_dotenv()  # Load environment variables from .env file
+
+
+def normalize_framework_name(framework_name):
+    """
+    Normalize a framework name so trivial spelling differences share a cache entry.
+
+    "SWOT Analysis", "  swot analysis " and "SWOT Analysis framework" all normalize
+    to "swot analysis".
+
+    Args:
+        framework_name (str): The framework name as sent by the client
+
+    Returns:
+        str: The normalized name
+    """
+    name = re.sub(r'\s+', ' ', framework_name.strip().lower())
+    name = name.strip(' "\'.')
+    if name.endswith(' framework'):
+        name = name[:-len(' framework')]
+    return name
+
+
+def normalize_text(text):
+    """
+    Normalize free text for an exact-match cache key, collapsing runs of whitespace.
+
+    Args:
+        text (str): Text as sent by the client
+
+    Returns:
+        str: The text with surrounding whitespace stripped and inner whitespace collapsed
+    """
+    return re.sub(r'\s+', ' ', str(text)).strip()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache with least-recently-used eviction and a per-entry TTL.
+
+    Entries older than the TTL are treated as missing and dropped when they are next
+    looked up. Once the cache holds maxsize entries, adding a new one evicts the entry
+    that was used least recently.
+    """
+
+    def __init__(self, maxsize=256, ttl=None):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of entries to keep (default: 256)
+            ttl (float): Seconds an entry stays valid, or None to never expire (default: None)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Look up a key, marking it as recently used.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            The cached value, or None if the key is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at=None):
+        """
+        Store a value, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): The cache key
+            value: The value to store
+            expires_at (float): Absolute expiry time; defaults to now plus the cache TTL
+        """
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        """
+        Remove a key and return its value.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            The value, or None if the key was missing or expired
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return None
+        return entry[0]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Size, capacity, hits, misses, evictions and expirations
+        """
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class CacheBackend:
+    """
+    Interface of the shared tier of the result caches.
+
+    A backend stores values under string keys for all worker processes (and, for
+    network backends, all hosts) at once, so a result generated by one worker is a hit
+    in every other. Values are stored as JSON, never pickled: the store is shared
+    between hosts, and unpickling whatever another writer left there would let it run
+    code in every worker. An entry that cannot be decoded is counted as corrupt,
+    dropped and treated as a miss.
+
+    Every entry has its own TTL. Values whose serialized form is larger than
+    max_value_bytes are not stored, so one oversized result cannot push out many
+    small ones.
+    """
+
+    def __init__(self, ttl=None, max_value_bytes=None):
+        """
+        Initialize the counters shared by all backends.
+
+        Args:
+            ttl (float): Seconds an entry stays valid unless set() is given its own TTL, or None to never expire
+            max_value_bytes (int): Largest serialized value stored (env CACHE_MAX_VALUE_BYTES, default: 262144)
+        """
+        if max_value_bytes is None:
+            max_value_bytes = int(os.getenv('CACHE_MAX_VALUE_BYTES', str(256 * 1024)))
+        self.ttl = ttl
+        self.max_value_bytes = max_value_bytes
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.oversized = 0
+        self.corrupt = 0
+        self.errors = 0
+
+    def serialize(self, value):
+        """
+        Serialize a value as JSON, unless it is over the size limit.
+
+        Args:
+            value: A JSON-serializable value
+
+        Returns:
+            bytes: The serialized value, or None if it is too large to store
+        """
+        data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        if self.max_value_bytes and len(data) > self.max_value_bytes:
+            self.oversized += 1
+            return None
+        return data
+
+    def deserialize(self, key, data):
+        """
+        Decode a stored value, dropping the entry if it cannot be decoded.
+
+        Entries written in another format (e.g. by an older release) or damaged in the
+        store are deleted, so the next request regenerates them instead of failing.
+
+        Args:
+            key (str): The cache key the value was stored under
+            data (bytes): The stored value
+
+        Returns:
+            The value, or None if the entry was corrupt (counted as a miss)
+        """
+        try:
+            return json.loads(data)
+        except ValueError:
+            self.corrupt += 1
+            self.misses += 1
+            self.delete(key)
+            return None
+
+    def expiry(self, ttl=None):
+        """
+        Work out the absolute expiry time of an entry written now.
+
+        Args:
+            ttl (float): Seconds the entry stays valid (default: None, the backend's TTL)
+
+        Returns:
+            float: The expiry time, or None if the entry never expires
+        """
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() + ttl if ttl is not None else None
+
+    def get(self, key):
+        """
+        Look up a key.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            tuple: (value, expires_at), or None if the key is missing or expired
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value.
+
+        Args:
+            key (str): The cache key
+            value: A JSON-serializable value
+            ttl (float): Seconds the entry stays valid (default: None, the backend's TTL)
+
+        Returns:
+            float: The absolute expiry time of the entry, or None if it never expires
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """
+        Remove a key if it is present.
+
+        The removal is atomic, so when several workers delete the same key only one of
+        them sees True; callers can use it to claim an entry exactly once.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            bool: True if this call removed the key (an expired entry does not count)
+        """
+        raise NotImplementedError
+
+    def reopen(self):
+        """Replace connections inherited from the parent in a process forked after the backend was created."""
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Size, hits, misses, expirations, values too large to store, corrupt entries and backend errors
+        """
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'oversized': self.oversized,
+            'corrupt': self.corrupt,
+            'errors': self.errors,
+        }
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache backend in a local SQLite file, for worker processes on one host.
+
+    The database runs in WAL mode, so readers in every worker proceed while another
+    worker writes, and entries survive restarts with the TTL they were written with.
+    Every TRIM_EVERY writes, if the table holds more than max_entries rows, expired
+    entries and then the oldest ones are deleted.
+    """
+
+    TRIM_EVERY = 64  # Writes between checks of the table size
+
+    def __init__(self, path, ttl=None, max_entries=None, max_value_bytes=None):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): Path of the SQLite database file
+            ttl (float): Seconds an entry stays valid, or None to never expire (default: None)
+            max_entries (int): Rows kept in the table (env CACHE_MAX_ENTRIES, default: 100000)
+            max_value_bytes (int): Largest serialized value stored (env CACHE_MAX_VALUE_BYTES, default: 262144)
+        """
+        super().__init__(ttl, max_value_bytes)
+        if max_entries is None:
+            max_entries = int(os.getenv('CACHE_MAX_ENTRIES', '100000'))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, stored_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)')
+        self._conn.commit()
+
+    def _connect(self):
+        """Open a connection that waits for other workers' writes instead of failing on a locked database."""
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def get(self, key):
+        """
+        Look up a key.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            tuple: (value, expires_at), or None if the key is missing or expired
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            data, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._conn.commit()
+                self.expirations += 1
+                self.misses += 1
+                return None
+        value = self.deserialize(key, data)
+        if value is None:
+            return None
+        self.hits += 1
+        return value, expires_at
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value.
+
+        Args:
+            key (str): The cache key
+            value: A JSON-serializable value
+            ttl (float): Seconds the entry stays valid (default: None, the cache TTL)
+
+        Returns:
+            float: The absolute expiry time of the entry, or None if it never expires
+        """
+        expires_at = self.expiry(ttl)
+        data = self.serialize(value)
+        if data is None:
+            return expires_at
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)',
+                (key, data, expires_at, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                self._trim()
+            self._conn.commit()
+        return expires_at
+
+    def _trim(self):
+        """Delete expired entries, then the oldest ones, once the table is over max_entries. Called with the lock held."""
+        excess = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+        excess = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY stored_at LIMIT ?)', (excess,)
+            )
+            self.evictions += excess
+
+    def delete(self, key):
+        """
+        Remove a key if it is present.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            bool: True if this call removed the key; an expired entry is removed but does not count
+        """
+        with self._lock:
+            removed = self._conn.execute(
+                'DELETE FROM entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)', (key, time.time())
+            ).rowcount
+            if not removed:
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._conn.commit()
+        return removed > 0
+
+    def reopen(self):
+        """
+        Open a fresh connection to the database in a process forked after the cache was created.
+
+        SQLite connections must not be used across a fork. The inherited connection is
+        abandoned rather than closed, since closing it could release locks the parent holds.
+        """
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Backend, path, size, hits, misses, expirations, evictions and values too large to store
+        """
+        return {'backend': 'sqlite', 'path': self.path, **super().stats(), 'evictions': self.evictions}
+
+
+class ResultCache:
+    """
+    Two-tier cache for agent results.
+
+    Lookups try this process's in-memory LRU tier first, which returns the stored
+    object without any deserialization, and fall back to the shared backend, promoting
+    its hits into memory with the expiry they were stored with. Results are stored in
+    both tiers, so a result generated by one worker serves every other worker and
+    survives restarts.
+
+    Keys combine the kind of result, the model and the prompt version with a hash of
+    the request's inputs (see make_key), so results never cross prompt changes and
+    long situations do not make long keys.
+    """
+
+    def __init__(self, backend=None, maxsize=None, ttl=None):
+        """
+        Initialize both cache tiers.
+
+        Args:
+            backend (CacheBackend): Shared tier (default: get_shared_cache_backend(), which may be None)
+            maxsize (int): Entries held in memory (env RESULT_CACHE_SIZE, default: 256)
+            ttl (float): Seconds a result stays valid (env RESULT_CACHE_TTL, default: 86400)
+        """
+        if maxsize is None:
+            maxsize = int(os.getenv('RESULT_CACHE_SIZE', '256'))
+        if ttl is None:
+            ttl = float(os.getenv('RESULT_CACHE_TTL', str(24 * 3600)))
+        if backend is None:
+            backend = get_shared_cache_backend()
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.backend = backend
+
+    @staticmethod
+    def make_key(kind, model, prompt_version, *inputs):
+        """
+        Build the cache key for a result.
+
+        Args:
+            kind (str): Kind of result, e.g. "apply"
+            model (str): The model that generates the result
+            prompt_version (str): Version of the agent's system prompt
+            *inputs: The normalized, JSON-serializable request inputs the result depends on
+
+        Returns:
+            str: The cache key
+        """
+        digest = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+        return f"{kind}|{model}|{prompt_version}|{digest}"
+
+    def lookup(self, key):
+        """
+        Look up a key in both tiers.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        value = self.memory.get(key)
+        if value is not None or self.backend is None:
+            return value
+
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        self.memory.set(key, value, expires_at=expires_at)
+        return value
+
+    def store(self, key, value, ttl=None):
+        """
+        Store a value in both tiers.
+
+        Args:
+            key (str): The cache key
+            value: The value to store
+            ttl (float): Seconds the value stays valid (default: None, the cache TTL)
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if self.backend is not None:
+            expires_at = self.backend.set(key, value, ttl=ttl)
+        else:
+            expires_at = time.time() + ttl
+        self.memory.set(key, value, expires_at=expires_at)
+
+    def stats(self):
+        """
+        Report hit, miss and eviction counters for both tiers.
+
+        Returns:
+            dict: Counters for the memory and shared tiers
+        """
+        return {
+            'memory': self.memory.stats(),
+            'shared': self.backend.stats() if self.backend is not None else None,
+        }
+
+
+class ExplanationCache(ResultCache):
+    """
+    Two-tier cache for framework explanations.
+
+    An explanation only depends on the framework name, the model and the system prompt,
+    so it is cached under the normalized framework name, the model and the prompt
+    version. Repeat explanations therefore come back without an LLM round trip, from
+    any worker and even after a restart.
+    """
+
+    def __init__(self, maxsize=None, ttl=None, backend=None):
+        """
+        Initialize both cache tiers.
+
+        Any argument left as None is read from the environment, falling back to a default.
+
+        Args:
+            maxsize (int): Entries held in memory (env EXPLAIN_CACHE_SIZE, default: 256)
+            ttl (float): Seconds an explanation stays valid (env EXPLAIN_CACHE_TTL, default: 604800)
+            backend (CacheBackend): Shared tier (default: get_shared_cache_backend(), which may be None)
+        """
+        if maxsize is None:
+            maxsize = int(os.getenv('EXPLAIN_CACHE_SIZE', '256'))
+        if ttl is None:
+            ttl = float(os.getenv('EXPLAIN_CACHE_TTL', str(7 * 24 * 3600)))
+        super().__init__(backend=backend, maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def make_key(framework_name, model, prompt_version):
+        """
+        Build the cache key for an explanation.
+
+        Args:
+            framework_name (str): The framework name as sent by the client
+            model (str): The model that generates the explanation
+            prompt_version (str): Version of the explainer's system prompt
+
+        Returns:
+            str: The cache key
+        """
+        return f"explain|{model}|{prompt_version}|{normalize_framework_name(framework_name)}"
+
+    def get(self, framework_name, model, prompt_version):
+        """
+        Look up a cached explanation.
+
+        Args:
+            framework_name (str): The framework name as sent by the client
+            model (str): The model that generates the explanation
+            prompt_version (str): Version of the explainer's system prompt
+
+        Returns:
+            dict: The cached explanation, or None on a miss
+        """
+        return self.lookup(self.make_key(framework_name, model, prompt_version))
+
+    def set(self, framework_name, model, prompt_version, explanation):
+        """
+        Store an explanation in both tiers.
+
+        Args:
+            framework_name (str): The framework name as sent by the client
+            model (str): The model that generated the explanation
+            prompt_version (str): Version of the explainer's system prompt
+            explanation (dict): The parsed explanation
+        """
+        self.store(self.make_key(framework_name, model, prompt_version), explanation)
+
+
+def load_cache_backend():
+    """
+    Build the shared cache tier from the environment.
+
+    CACHE_BACKEND picks the implementation: "sqlite" (default) stores entries in the
+    CACHE_PATH file, shared by the workers of one host; "redis" stores them on the
+    server at REDIS_URL, shared by every host; "none" keeps results in each process's
+    memory only.
+
+    Returns:
+        CacheBackend: The backend, or None if the shared tier is turned off
+    """
+    kind = os.getenv('CACHE_BACKEND', 'sqlite').strip().lower()
+    if kind == 'redis':
+        from redis_cache import RedisCache
+        return RedisCache(os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0'))
+    if kind == 'sqlite':
+        path = os.getenv('CACHE_PATH', os.path.join('.cache', 'results.sqlite3'))
+        return SQLiteCache(path) if path else None
+    if kind == 'none':
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND '{kind}', expected sqlite, redis or none")
+
+
+_shared_backend = None
+_shared_backend_loaded = False
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache_backend():
+    """
+    Return the process-wide shared cache tier, creating it on first use.
+
+    Returns:
+        CacheBackend: The shared backend, or None if CACHE_BACKEND is "none"
+    """
+    global _shared_backend, _shared_backend_loaded
+    with _shared_lock:
+        if not _shared_backend_loaded:
+            _shared_backend = load_cache_backend()
+            _shared_backend_loaded = True
+        return _shared_backend
+
+
+class SimilarityCache:
+    """
+    Near-duplicate cache keyed on free-text situations.
+
+    Users describe the same situation in slightly different words, so exact-match keys
+    rarely hit. This cache stores a TF-IDF vector for every situation it has seen in a
+    fixed-size NumPy matrix and answers a lookup with a single vectorized cosine pass
+    over that matrix. When the best match scores at or above the threshold, its cached
+    value is served instead of calling the LLM.
+
+    Memory is bounded by capacity rows of n_features float32 values. When the cache is
+    full, expired entries are reused first, then the least recently used one. Storing a
+    situation that is already cached (same namespace and terms) overwrites its row
+    instead of adding another, so repeats cannot crowd out other entries. Rows are
+    weighted with the IDF at the time they were inserted, while queries use the current
+    IDF, which keeps lookups to one matrix-vector product. Entries are partitioned by a
+    namespace (e.g. model and prompt version) so results never cross prompt changes.
+    Everything runs locally without network access.
+    """
+
+    def __init__(self, capacity=None, threshold=None, ttl=None, n_features=4096):
+        """
+        Initialize the cache.
+
+        Any argument left as None is read from the environment, falling back to a default.
+
+        Args:
+            capacity (int): Maximum number of situations held (env PARSE_CACHE_SIZE, default: 512)
+            threshold (float): Minimum cosine similarity for a hit (env PARSE_CACHE_THRESHOLD, default: 0.8)
+            ttl (float): Seconds an entry stays valid (env PARSE_CACHE_TTL, default: 86400)
+            n_features (int): Width of the hashed feature vectors (default: 4096)
+        """
+        if capacity is None:
+            capacity = int(os.getenv('PARSE_CACHE_SIZE', '512'))
+        if threshold is None:
+            threshold = float(os.getenv('PARSE_CACHE_THRESHOLD', '0.8'))
+        if ttl is None:
+            ttl = float(os.getenv('PARSE_CACHE_TTL', str(24 * 3600)))
+
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.vectorizer = HashingVectorizer(n_features=n_features)
+
+        self._matrix = np.zeros((capacity, n_features), dtype=np.float32)
+        self._term_presence = np.zeros((capacity, n_features), dtype=bool)
+        self._doc_freq = np.zeros(n_features, dtype=np.float32)
+        self._expires_at = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._namespace_ids = np.full(capacity, -1, dtype=np.int32)
+        self._values = [None] * capacity
+        self._namespaces = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def _namespace_id(self, namespace):
+        """Map a namespace string to a small integer, registering it if needed."""
+        if namespace not in self._namespaces:
+            self._namespaces[namespace] = len(self._namespaces)
+        return self._namespaces[namespace]
+
+    def _idf(self):
+        """Compute the current inverse document frequency of every feature."""
+        return np.log((1.0 + self._size) / (1.0 + self._doc_freq)) + 1.0
+
+    def get(self, text, namespace=""):
+        """
+        Find a cached value for a situation similar enough to the given one.
+
+        Args:
+            text (str): The situation to look up
+            namespace (str): Partition to search, e.g. model and prompt version
+
+        Returns:
+            tuple: (value, similarity) for the best match, or None on a miss
+        """
+        query = self.vectorizer.transform_one(text)
+        with self._lock:
+            self.lookups += 1
+            namespace_id = self._namespaces.get(namespace)
+            if self._size == 0 or namespace_id is None or not query.any():
+                return None
+
+            query = l2_normalize(query * self._idf())
+            scores = self._matrix[:self._size] @ query
+
+            # Rule out other namespaces and expired entries in the same vectorized pass
+            now = time.time()
+            valid = (self._namespace_ids[:self._size] == namespace_id) & (self._expires_at[:self._size] > now)
+            scores = np.where(valid, scores, -1.0)
+
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            return self._values[best], similarity
+
+    # Similarity at which a stored row counts as the same situation; rows of identical
+    # text differ only by the IDF drift between their inserts
+    DUPLICATE_SIMILARITY = 0.99
+
+    def _find_duplicate(self, row, presence, namespace_id):
+        """Return the row already holding this situation in the namespace, or None. Called with the lock held."""
+        if self._size == 0:
+            return None
+        scores = np.where(self._namespace_ids[:self._size] == namespace_id, self._matrix[:self._size] @ row, -1.0)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.DUPLICATE_SIMILARITY and np.array_equal(self._term_presence[best], presence):
+            return best
+        return None
+
+    def _free_slot(self, now):
+        """Pick the row to write a new entry into, evicting one if the cache is full."""
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+            return slot
+
+        expired = np.flatnonzero(self._expires_at <= now)
+        if len(expired):
+            slot = int(expired[0])
+        else:
+            slot = int(np.argmin(self._last_used))
+            self.evictions += 1
+
+        # Forget the old entry's terms before the slot is reused
+        self._doc_freq -= self._term_presence[slot]
+        return slot
+
+    def set(self, text, value, namespace=""):
+        """
+        Store a value for a situation, replacing the entry of the same situation if there is one.
+
+        Args:
+            text (str): The situation the value was generated for
+            value: The value to cache, e.g. a list of suggested frameworks
+            namespace (str): Partition to store the entry in, e.g. model and prompt version
+        """
+        tf = self.vectorizer.transform_one(text)
+        if not tf.any():
+            return
+        presence = tf > 0
+        with self._lock:
+            now = time.time()
+            namespace_id = self._namespace_id(namespace)
+            slot = self._find_duplicate(l2_normalize(tf * self._idf()), presence, namespace_id)
+            if slot is None:
+                slot = self._free_slot(now)
+            else:
+                self._doc_freq -= self._term_presence[slot]
+            self._term_presence[slot] = presence
+            self._doc_freq += presence
+            self._matrix[slot] = l2_normalize(tf * self._idf())
+            self._expires_at[slot] = now + self.ttl
+            self._last_used[slot] = now
+            self._namespace_ids[slot] = namespace_id
+            self._values[slot] = value
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Size, capacity, threshold, lookups, hits, misses, hit rate and evictions
+        """
+        return {
+            'size': self._size,
+            'capacity': self.capacity,
+            'threshold': self.threshold,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'misses': self.lookups - self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,441 @@
+"""
+Local catalog of framework explanations.
+
+The frameworks users ask about most often (SWOT Analysis, Decision Matrix,
+Cost-Benefit Analysis, ...) are kept in a versioned JSON file so /explain can
+answer them without calling the LLM. Entries are either curated by hand or
+generated in bulk by the warm-up job below, which runs the explainer agent
+offline and writes the results back to the file.
+
+Usage:
+    python catalog.py warm "Kepner-Tregoe Matrix" "RACI Matrix"
+    python catalog.py warm --file names.txt --workers 8
+    python catalog.py warm --refresh --max-age-days 30
+    python catalog.py list
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from cache import normalize_framework_name
+from transport import env_flag
+from json_repair import is_truncated
+import logs
+
+load_dotenv()  # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+# Schema version of the catalog file; bump it when the entry format changes.
+# Version 2 added the 'description' and 'strengths' fields used by local retrieval.
+CATALOG_VERSION = 2
+
+# Fields of an entry that make up the /explain response
+EXPLANATION_FIELDS = ('explanation', 'steps', 'examples', 'limitations')
+
+# Fields of an entry that make up a /parse suggestion, next to its name
+SUGGESTION_FIELDS = ('description', 'strengths')
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'frameworks.json')
+
+
+def utc_now():
+    """Return the current time as an ISO 8601 string in UTC."""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class FrameworkCatalog:
+    """
+    Versioned on-disk catalog of framework explanations.
+
+    Every entry has a canonical name, a list of aliases, the four fields /explain
+    returns and, optionally, the description and strengths /parse returns. It also
+    records where it came from ("curated" or "generated"), the model and prompt
+    version it was generated with, and when it was last updated. Lookups match the
+    canonical name or any alias after normalize_framework_name, so "swot", "SWOT Analysis"
+    and "SWOT analysis framework" all find the same entry. The whole catalog is held in
+    memory; lookups never touch the network.
+
+    Another process may rewrite the file, e.g. the server worker that runs the startup
+    refresh. At most every reload_interval seconds a lookup checks the file's
+    modification time, and reloads it if it changed, so every worker serves the new
+    explanations without a restart.
+    """
+
+    def __init__(self, path=None, reload_interval=None):
+        """
+        Load the catalog file.
+
+        Args:
+            path (str): JSON file holding the catalog; an empty string disables the catalog
+                        (env FRAMEWORK_CATALOG_PATH, default: "data/frameworks.json")
+            reload_interval (float): Seconds between checks of the file for changes made by other
+                                     processes, or 0 to never check (env CATALOG_RELOAD_INTERVAL, default: 5)
+        """
+        if path is None:
+            path = os.getenv('FRAMEWORK_CATALOG_PATH', DEFAULT_CATALOG_PATH)
+        if reload_interval is None:
+            reload_interval = float(os.getenv('CATALOG_RELOAD_INTERVAL', '5'))
+        self.path = path
+        self.reload_interval = reload_interval
+        self._mtime = None  # Modification time of the file as last loaded or saved
+        self._checked_at = time.monotonic()
+        self._entries = {}  # normalized canonical name -> entry
+        self._index = {}  # normalized name or alias -> normalized canonical name
+        self._lock = threading.Lock()
+        self.revision = 0  # Incremented on every change, so derived indexes know when to rebuild
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        """
+        (Re)load the catalog from disk.
+
+        A missing file leaves the catalog empty. Files from older schema versions are
+        read as they are; a file written by a newer version is ignored rather than misread.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        self._mtime = mtime
+
+        version = data.get('version')
+        if not isinstance(version, int) or version > CATALOG_VERSION:
+            logs.log_event(logger, logging.WARNING, "catalog.version_mismatch",
+                           path=self.path, version=version, expected=CATALOG_VERSION)
+            return
+
+        entries = {}
+        index = {}
+        for entry in data.get('frameworks', []):
+            key = normalize_framework_name(entry['name'])
+            entries[key] = entry
+            for name in [entry['name']] + entry.get('aliases', []):
+                index.setdefault(normalize_framework_name(name), key)
+        with self._lock:
+            self._entries = entries
+            self._index = index
+            self.revision += 1
+
+    def reload_if_changed(self):
+        """
+        Reload the catalog if another process rewrote its file since it was last loaded.
+
+        The file is checked at most every reload_interval seconds; in between this returns
+        straight away. A file that cannot be read keeps the current entries.
+
+        Returns:
+            bool: True if the catalog was reloaded
+        """
+        if not self.path or self.reload_interval <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+        try:
+            if os.stat(self.path).st_mtime_ns == self._mtime:
+                return False
+            self.load()
+        except (OSError, ValueError) as e:
+            logs.log_event(logger, logging.WARNING, "catalog.reload_failed", path=self.path, error=str(e))
+            return False
+        logs.log_event(logger, logging.INFO, "catalog.reloaded", path=self.path, size=len(self._entries))
+        return True
+
+    def entry(self, framework_name):
+        """
+        Look up the full catalog entry for a framework.
+
+        Args:
+            framework_name (str): The framework name or one of its aliases
+
+        Returns:
+            dict: The entry, or None if the framework is not in the catalog
+        """
+        self.reload_if_changed()
+        key = self._index.get(normalize_framework_name(framework_name))
+        return self._entries.get(key) if key is not None else None
+
+    def get(self, framework_name):
+        """
+        Look up the explanation of a framework.
+
+        Args:
+            framework_name (str): The framework name or one of its aliases
+
+        Returns:
+            dict: 'explanation', 'steps', 'examples' and 'limitations', or None on a miss
+        """
+        entry = self.entry(framework_name)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {field: entry[field] for field in EXPLANATION_FIELDS}
+
+    def entries(self):
+        """
+        List all entries.
+
+        Returns:
+            list: The entry dicts in catalog order; treat them as read-only
+        """
+        self.reload_if_changed()
+        return list(self._entries.values())
+
+    def names(self):
+        """
+        List the canonical names of all entries.
+
+        Returns:
+            list: Framework names in catalog order
+        """
+        self.reload_if_changed()
+        return [entry['name'] for entry in self._entries.values()]
+
+    def upsert(self, framework_name, explanation, source='generated', model=None, prompt_version=None):
+        """
+        Add or replace the explanation of a framework in memory; call save() to persist it.
+
+        Replacing an entry keeps its other fields, such as the canonical name, aliases and description.
+
+        Args:
+            framework_name (str): The framework name or one of its aliases
+            explanation (dict): The four explanation fields
+            source (str): "curated" or "generated" (default: "generated")
+            model (str): Model that generated the explanation, if any
+            prompt_version (str): Explainer prompt version it was generated with, if any
+        """
+        with self._lock:
+            key = self._index.get(normalize_framework_name(framework_name))
+            previous = self._entries.get(key) if key is not None else None
+            entry = dict(previous) if previous else {'name': framework_name.strip(), 'aliases': []}
+            entry.update({field: explanation[field] for field in EXPLANATION_FIELDS})
+            entry['source'] = source
+            if model is not None:
+                entry['model'] = model
+            if prompt_version is not None:
+                entry['prompt_version'] = prompt_version
+            entry['updated_at'] = utc_now()
+
+            if key is None:
+                key = normalize_framework_name(framework_name)
+                self._index[key] = key
+            # Swap in new dicts so concurrent lookups never see a half-updated catalog
+            entries = dict(self._entries)
+            entries[key] = entry
+            self._entries = entries
+            self.revision += 1
+
+    def save(self):
+        """Write the catalog back to disk atomically, so readers never see a partial file."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {'version': CATALOG_VERSION, 'frameworks': list(self._entries.values())}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns  # This process already has what it wrote
+
+    def stale(self, prompt_version, max_age_days=None):
+        """
+        List generated entries that should be regenerated.
+
+        Curated entries are never stale. A generated entry is stale if it was made with
+        a different prompt version, or is older than max_age_days.
+
+        Args:
+            prompt_version (str): The explainer's current prompt version
+            max_age_days (float): Maximum age of an entry, or None for no age limit
+
+        Returns:
+            list: Canonical names of the stale entries
+        """
+        cutoff = None
+        if max_age_days is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+
+        names = []
+        for entry in self._entries.values():
+            if entry.get('source') == 'curated':
+                continue
+            if entry.get('prompt_version') != prompt_version:
+                names.append(entry['name'])
+            elif cutoff is not None and datetime.fromisoformat(entry['updated_at']) < cutoff:
+                names.append(entry['name'])
+        return names
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, framework_name):
+        return self.entry(framework_name) is not None
+
+    def stats(self):
+        """
+        Report catalog counters.
+
+        Returns:
+            dict: Path, number of entries, hits and misses
+        """
+        return {
+            'path': self.path,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def warm_catalog(catalog, explainer, names=(), refresh=False, max_age_days=None, max_workers=4):
+    """
+    Generate explanations for frameworks missing from the catalog and save them.
+
+    Args:
+        catalog (FrameworkCatalog): The catalog to fill
+        explainer (FrameworkExplainerAgent): Agent that generates the explanations
+        names (iterable): Framework names to add if they are not in the catalog yet
+        refresh (bool): Also regenerate stale generated entries (default: False)
+        max_age_days (float): Age after which a generated entry is stale when refreshing (default: None)
+        max_workers (int): Explanations generated concurrently (default: 4)
+
+    Returns:
+        dict: Names that were generated, failed (name -> error) and skipped
+    """
+    targets = []
+    skipped = []
+    for name in names:
+        if name in catalog:
+            skipped.append(name)
+        elif name not in targets:
+            targets.append(name)
+    if refresh:
+        targets.extend(name for name in catalog.stale(explainer.PROMPT_VERSION, max_age_days) if name not in targets)
+
+    generated = []
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(explainer.generate_explanation, name): name for name in targets}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                explanation = future.result()
+            except Exception as e:
+                explanation = {"error": str(e)}
+            if is_truncated(explanation):
+                explanation = {"error": "Explanation was cut off"}  # Catalog entries are served for good
+            if "error" in explanation:
+                failed[name] = explanation["error"]
+                logs.log_event(logger, logging.WARNING, "catalog.warm_failed", framework=name, error=explanation["error"])
+                continue
+            catalog.upsert(name, explanation, model=explainer.model, prompt_version=explainer.PROMPT_VERSION)
+            generated.append(name)
+            logs.log_event(logger, logging.INFO, "catalog.warmed", framework=name)
+
+    if generated:
+        catalog.save()
+    return {'generated': generated, 'failed': failed, 'skipped': skipped}
+
+
+def start_background_refresh(catalog, explainer, max_age_days=None):
+    """
+    Regenerate stale catalog entries on a daemon thread, without delaying startup.
+
+    Requests keep being served from the current entries while the refresh runs.
+
+    Args:
+        catalog (FrameworkCatalog): The catalog to refresh
+        explainer (FrameworkExplainerAgent): Agent that generates the explanations
+        max_age_days (float): Age after which a generated entry is stale
+                              (env CATALOG_MAX_AGE_DAYS, default: 30)
+
+    Returns:
+        threading.Thread: The started thread
+    """
+    if max_age_days is None:
+        max_age_days = float(os.getenv('CATALOG_MAX_AGE_DAYS', '30'))
+
+    def refresh():
+        try:
+            summary = warm_catalog(catalog, explainer, refresh=True, max_age_days=max_age_days)
+            logs.log_event(logger, logging.INFO, "catalog.refreshed",
+                           generated=len(summary['generated']), failed=len(summary['failed']))
+        except Exception as e:
+            logs.log_event(logger, logging.ERROR, "catalog.refresh_failed", error=str(e))
+
+    thread = threading.Thread(target=refresh, name='catalog-refresh', daemon=True)
+    thread.start()
+    return thread
+
+
+def refresh_on_startup_enabled():
+    """
+    Whether servers should refresh stale catalog entries in the background when they start.
+
+    Returns:
+        bool: The CATALOG_REFRESH_ON_STARTUP setting (default: False)
+    """
+    return env_flag('CATALOG_REFRESH_ON_STARTUP')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local framework catalog served by /explain.")
+    parser.add_argument('--path', help="catalog file (default: FRAMEWORK_CATALOG_PATH or data/frameworks.json)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    warm = commands.add_parser('warm', help="generate explanations for frameworks missing from the catalog")
+    warm.add_argument('names', nargs='*', help="framework names to add")
+    warm.add_argument('--file', help="text file with one framework name per line")
+    warm.add_argument('--refresh', action='store_true', help="also regenerate stale generated entries")
+    warm.add_argument('--max-age-days', type=float, help="with --refresh, regenerate entries older than this")
+    warm.add_argument('-w', '--workers', type=int, default=4, help="explanations generated concurrently")
+
+    commands.add_parser('list', help="list the frameworks in the catalog")
+    args = parser.parse_args()
+
+    logs.configure_logging(level=os.getenv('LOG_LEVEL', 'WARNING'))
+    catalog = FrameworkCatalog(args.path)
+
+    if args.command == 'list':
+        for name in catalog.names():
+            entry = catalog.entry(name)
+            print(f"{name}\t{entry.get('source', '')}\t{entry.get('updated_at', '')}")
+        return
+
+    names = list(args.names)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            names.extend(line.strip() for line in f if line.strip())
+    if not names and not args.refresh:
+        parser.error("give framework names, --file or --refresh")
+
+    from agents import FrameworkExplainerAgent
+    explainer = FrameworkExplainerAgent()
+    summary = warm_catalog(catalog, explainer, names, refresh=args.refresh,
+                           max_age_days=args.max_age_days, max_workers=args.workers)
+
+    print(f"Generated {len(summary['generated'])}, failed {len(summary['failed'])}, "
+          f"already in catalog {len(summary['skipped'])} ({len(catalog)} entries in {catalog.path})", file=sys.stderr)
+    for name, error in summary['failed'].items():
+        print(f"  failed: {name}: {error}", file=sys.stderr)
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
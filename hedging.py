@@ -0,0 +1,340 @@
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from transport import env_flag
+import metrics
+
+load_dotenv()  # Load environment variables from .env file
+
+
+class LatencyTracker:
+    """
+    Sliding window of recently observed call latencies.
+
+    Only the last `window` samples are kept, so percentiles follow the API as it
+    speeds up or slows down instead of being anchored to old traffic.
+    """
+
+    def __init__(self, window=500):
+        """
+        Initialize the tracker.
+
+        Args:
+            window (int): Number of most recent latencies to keep (default: 500)
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        Record one latency.
+
+        Args:
+            seconds (float): Time the call took
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        """
+        Return a percentile of the latencies in the window.
+
+        Args:
+            p (float): Percentile between 0 and 100
+
+        Returns:
+            float: The latency in seconds, or None if nothing was observed yet
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+
+class Hedger:
+    """
+    Sends a second, identical request when the first one is slower than usual.
+
+    The primary request is started straight away. If it has not finished after the
+    hedge delay (the configured percentile of this agent's recent latencies), a hedge
+    request is started as well, the first of the two to finish is returned and the
+    other is cancelled. A percentile of 95 means roughly one call in twenty is hedged,
+    and only the slow tail pays for the extra request.
+
+    Hedges are capped by a budget: the number of hedges may never exceed `budget`
+    times the number of calls, so a latency spike across the whole API cannot
+    double the traffic sent to it. No call is hedged until `min_samples` latencies
+    have been observed.
+
+    Calls that raise do not win the race: if one request fails while the other is
+    still running, the other one's result is used.
+    """
+
+    def __init__(self, percentile=None, budget=None, min_samples=None, window=None, min_delay=None):
+        """
+        Initialize the hedger.
+
+        Any argument left as None is read from the environment, falling back to a default.
+
+        Args:
+            percentile (float): Latency percentile after which a hedge is sent
+                                (env LLM_HEDGE_PERCENTILE, default: 95)
+            budget (float): Maximum hedges as a fraction of calls (env LLM_HEDGE_BUDGET, default: 0.05)
+            min_samples (int): Latencies to observe before hedging starts (env LLM_HEDGE_MIN_SAMPLES, default: 20)
+            window (int): Recent latencies the percentile is computed over (env LLM_HEDGE_WINDOW, default: 500)
+            min_delay (float): Shortest hedge delay in seconds (env LLM_HEDGE_MIN_DELAY, default: 0.05)
+        """
+        if percentile is None:
+            percentile = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+        if budget is None:
+            budget = float(os.getenv('LLM_HEDGE_BUDGET', '0.05'))
+        if min_samples is None:
+            min_samples = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+        if window is None:
+            window = int(os.getenv('LLM_HEDGE_WINDOW', '500'))
+        if min_delay is None:
+            min_delay = float(os.getenv('LLM_HEDGE_MIN_DELAY', '0.05'))
+
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = LatencyTracker(window)
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def delay(self):
+        """
+        Return how long to wait for the primary request before hedging.
+
+        Returns:
+            float: Seconds, or None while too few latencies have been observed
+        """
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def _start_call(self):
+        """Count a call and return its hedge delay."""
+        with self._lock:
+            self.calls += 1
+        return self.delay()
+
+    def _allow_hedge(self):
+        """Take a hedge from the budget, or return False if the budget is used up."""
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.calls:
+                self.budget_denied += 1
+                return False
+            self.hedged += 1
+            return True
+
+    def _record_winner(self, model, hedge_won):
+        """Count which request of a hedged call finished first."""
+        with self._lock:
+            if hedge_won:
+                self.hedge_wins += 1
+        metrics.count_hedge(model, 'hedge_won' if hedge_won else 'primary_won')
+
+    def call(self, fn, model, executor=None):
+        """
+        Run fn, hedging it on the hedge pool if it is slow.
+
+        The primary request never waits for a pool thread: it starts straight away on a
+        thread of its own, so the hedge delay measures the request and not a queue, and
+        a busy pool can only hold up hedges. The calling thread waits for whichever
+        request finishes first, so it can return as soon as the hedge wins.
+
+        Python threads cannot be interrupted, so cancelling the loser only stops it if
+        it has not started yet. A loser that is already waiting on the API runs to the
+        end in the background, its response is discarded and its connection goes back
+        into the pool.
+
+        Args:
+            fn (callable): Function taking no arguments that sends one request
+            model (str): Model of the call, used as a metrics label
+            executor (ThreadPoolExecutor): Pool hedge requests run on (default: the shared hedge pool)
+
+        Returns:
+            The result of whichever request finished first without raising
+        """
+        delay = self._start_call()
+        if delay is None:
+            return self._timed(fn)
+
+        context = contextvars.copy_context()
+        primary = _start_thread(context.copy().run, self._timed, fn)
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._allow_hedge():
+            return primary.result()
+
+        executor = executor or get_shared_hedge_executor()
+        hedge = executor.submit(context.copy().run, fn)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: f.exception() is not None):
+                if future.exception() is None or not pending:
+                    for other in pending:
+                        other.cancel()
+                    self._record_winner(model, future is hedge)
+                    return future.result()
+
+    async def call_async(self, fn, model):
+        """
+        Await fn(), hedging it if it is slow.
+
+        The loser is cancelled as a task, which closes its upstream connection. A cancelled
+        primary still contributes the time it had been running to the latency window, so
+        the slow tail stays visible to the percentile.
+
+        Args:
+            fn (callable): Coroutine function taking no arguments that sends one request
+            model (str): Model of the call, used as a metrics label
+
+        Returns:
+            The result of whichever request finished first without raising
+        """
+        delay = self._start_call()
+        if delay is None:
+            return await self._timed_async(fn)
+
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self._timed_async(fn))
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done or not self._allow_hedge():
+            return await primary
+
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t.exception() is not None):
+                    if task.exception() is None or not pending:
+                        if task is hedge and not primary.done():
+                            # The primary is about to be cancelled; its latency so far is a lower bound
+                            self.latencies.observe(time.perf_counter() - start)
+                        self._record_winner(model, task is hedge)
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _timed(self, fn):
+        """Run fn and record its latency unless it failed."""
+        start = time.perf_counter()
+        result = fn()
+        if not _is_error(result):
+            self.latencies.observe(time.perf_counter() - start)
+        return result
+
+    async def _timed_async(self, fn):
+        """Await fn() and record its latency unless it failed."""
+        start = time.perf_counter()
+        result = await fn()
+        if not _is_error(result):
+            self.latencies.observe(time.perf_counter() - start)
+        return result
+
+    def stats(self):
+        """
+        Report hedging counters and the latency percentiles they are based on.
+
+        Returns:
+            dict: Calls, hedges, wins, budget refusals, hedge rate and recent p50/p95/p99 in milliseconds
+        """
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        with self._lock:
+            counters = {
+                'calls': self.calls,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'primary_wins': self.hedged - self.hedge_wins,
+                'budget_denied': self.budget_denied,
+                'hedge_rate': self.hedged / self.calls if self.calls else 0.0,
+            }
+        counters.update({
+            'delay_ms': ms(self.delay()),
+            'p50_ms': ms(self.latencies.percentile(50)),
+            'p95_ms': ms(self.latencies.percentile(95)),
+            'p99_ms': ms(self.latencies.percentile(99)),
+        })
+        return counters
+
+
+def _start_thread(fn, *args):
+    """
+    Run fn(*args) on a new daemon thread.
+
+    Returns:
+        Future: Resolved with its result or exception
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="hedge-primary", daemon=True).start()
+    return future
+
+
+def _is_error(result):
+    """Check for the error object agents return instead of a completion."""
+    return isinstance(result, dict) and 'error' in result
+
+
+_shared_executor = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_hedge_executor():
+    """
+    Return the process-wide thread pool that hedge requests from the threaded agents run on.
+
+    Returns:
+        ThreadPoolExecutor: The shared pool (env LLM_HEDGE_WORKERS workers, default: 64)
+    """
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            workers = int(os.getenv('LLM_HEDGE_WORKERS', '64'))
+            _shared_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-hedge")
+        return _shared_executor
+
+
+def hedging_enabled():
+    """
+    Check whether agents should hedge their LLM calls.
+
+    Returns:
+        bool: The LLM_HEDGING flag (default: False)
+    """
+    return env_flag('LLM_HEDGING', False)
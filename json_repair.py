@@ -0,0 +1,342 @@
+import re
+import json
+import logging
+import metrics
+import logs
+
+logger = logging.getLogger(__name__)
+
+# A ```json ... ``` block; the closing fence may be missing if the output was cut off
+FENCE_PATTERN = re.compile(r'```[A-Za-z0-9_-]*[ \t]*\n?(.*?)(?:```|$)', re.DOTALL)
+
+CLOSERS = {'{': '}', '[': ']'}
+
+# Expected shape of every agent response, keyed by the label passed to parse_json_content.
+# Arrays list the fields of each item. A field type of None accepts any value.
+SCHEMAS = {
+    'suggest_frameworks': (list, {'name': str, 'description': str, 'strengths': (str, list)}),
+    'explain_framework': (dict, {'explanation': str, 'steps': list, 'examples': list, 'limitations': list}),
+    'apply_framework': (dict, {'questions': list, 'template': None, 'interpretation_guidance': None}),
+    'compare_frameworks': (dict, {'comparison': None, 'pros_cons': None, 'recommendation': None}),
+    'compare_frameworks_fan_out': (dict, {'comparison': None, 'pros_cons': None, 'recommendation': None}),
+    'evaluate_framework': (dict, {'key_features': None, 'pros': list, 'cons': list, 'fit_score': (int, float, str)}),
+}
+
+
+class SchemaError(ValueError):
+    """Raised when a completion is valid JSON but not the shape the endpoint returns."""
+
+
+class TruncatedList(list):
+    """An array recovered from cut-off output; see is_truncated."""
+
+
+class TruncatedDict(dict):
+    """An object recovered from cut-off output; see is_truncated."""
+
+
+def mark_truncated(value):
+    """
+    Flag a value as recovered from cut-off output.
+
+    The flagged value still serializes like a plain list or dict, so it can be returned
+    to the client as usual.
+
+    Args:
+        value: The parsed value
+
+    Returns:
+        The value as a TruncatedList or TruncatedDict; other types are returned unchanged
+    """
+    if isinstance(value, list):
+        return TruncatedList(value)
+    if isinstance(value, dict):
+        return TruncatedDict(value)
+    return value
+
+
+def is_truncated(value):
+    """
+    Check whether a parsed value was recovered from cut-off output.
+
+    Such values passed validation but may be missing items or fields the model never
+    got to write, so they are returned but never cached.
+
+    Args:
+        value: A value returned by parse_llm_json
+
+    Returns:
+        bool: True if the completion had to be repaired for truncation
+    """
+    return isinstance(value, (TruncatedList, TruncatedDict))
+
+
+def strip_code_fences(text):
+    """
+    Return the contents of the first Markdown code block, or the text unchanged if there is none.
+
+    Args:
+        text (str): The completion content
+
+    Returns:
+        str: The text inside the fence
+    """
+    match = FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+
+def _structure(text, start=0):
+    """
+    Walk JSON text from an opening bracket, tracking strings and nesting.
+
+    Args:
+        text (str): The text to walk
+        start (int): Index of the opening bracket
+
+    Returns:
+        tuple: (end, stack, in_string, cuts) where end is the index just past the
+               matching closing bracket (None if the text ends first), stack holds the
+               brackets still open, and cuts are the indexes the text can be cut back
+               to while staying at an element boundary
+    """
+    stack = []
+    cuts = []
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(char)
+            cuts.append(i + 1)
+        elif char in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                return i + 1, stack, False, cuts
+        elif char == ',':
+            cuts.append(i)
+    return None, stack, in_string, cuts
+
+
+def remove_trailing_commas(text):
+    """
+    Drop commas that directly precede a closing bracket, outside of strings.
+
+    Args:
+        text (str): JSON text
+
+    Returns:
+        str: The text without trailing commas
+    """
+    out = []
+    in_string = False
+    escaped = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ',':
+            rest = text[i + 1:].lstrip()
+            if rest[:1] in ('}', ']'):
+                continue
+        out.append(char)
+    return ''.join(out)
+
+
+def close_truncated(fragment):
+    """
+    Parse JSON that was cut off mid-generation by closing whatever is still open.
+
+    An unfinished string is closed and kept. If the result still does not parse (e.g.
+    the text stops after a key or inside a number), the last incomplete element is
+    dropped and closing is tried again.
+
+    Args:
+        fragment (str): JSON text starting at its opening bracket
+
+    Returns:
+        The parsed value
+
+    Raises:
+        json.JSONDecodeError: If nothing parseable is left
+    """
+    candidate = fragment
+    while True:
+        _, stack, in_string, cuts = _structure(candidate)
+        attempt = candidate + ('"' if in_string else '')
+        attempt += ''.join(CLOSERS[bracket] for bracket in reversed(stack))
+        try:
+            return json.loads(remove_trailing_commas(attempt))
+        except json.JSONDecodeError:
+            cuts = [cut for cut in cuts if cut < len(candidate)]
+            if not cuts:
+                raise
+            candidate = candidate[:cuts[-1]]
+
+
+def extract_json(text):
+    """
+    Parse the JSON value in a completion, repairing the usual ways models get it wrong.
+
+    Clean JSON is parsed directly. Otherwise Markdown fences are stripped, the outermost
+    object or array is cut out of any surrounding prose, trailing commas are removed and
+    output that stops before its closing brackets is closed.
+
+    Args:
+        text (str): The completion content
+
+    Returns:
+        tuple: (value, repairs) where repairs names each fix that was needed:
+               "fence", "extracted", "trailing_comma" or "truncated"
+
+    Raises:
+        json.JSONDecodeError: If no JSON value can be recovered
+    """
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError as e:
+        error = e
+
+    repairs = []
+    body = text.strip()
+    unfenced = strip_code_fences(body)
+    if unfenced != body:
+        repairs.append('fence')
+        body = unfenced.strip()
+
+    starts = [i for i in (body.find('{'), body.find('[')) if i >= 0]
+    if not starts:
+        raise error
+    start = min(starts)
+
+    end, _, _, _ = _structure(body, start)
+    if end is None:
+        if body[:start].strip():
+            repairs.append('extracted')
+        try:
+            return close_truncated(body[start:]), repairs + ['truncated']
+        except json.JSONDecodeError:
+            raise error
+
+    if body[:start].strip() or body[end:].strip():
+        repairs.append('extracted')
+    candidate = body[start:end]
+    try:
+        return json.loads(candidate), repairs
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(remove_trailing_commas(candidate)), repairs + ['trailing_comma']
+    except json.JSONDecodeError:
+        raise error
+
+
+def _check_item(item, fields, where):
+    """Raise SchemaError if an object lacks a required field or has one of the wrong type."""
+    if not isinstance(item, dict):
+        raise SchemaError(f"{where}expected an object, got {type(item).__name__}")
+    missing = [field for field in fields if field not in item]
+    if missing:
+        raise SchemaError(f"{where}missing {', '.join(missing)}")
+    for field, expected in fields.items():
+        if expected is not None and not isinstance(item[field], expected):
+            raise SchemaError(f"{where}'{field}' has type {type(item[field]).__name__}")
+
+
+def validate(value, schema, truncated=False):
+    """
+    Check a parsed completion against the expected shape of an endpoint's response.
+
+    An array wrapped in an object with a single key (e.g. {"frameworks": [...]}, which
+    JSON mode encourages) is unwrapped. For truncated output, an incomplete last item
+    of an array is dropped rather than failing the whole response.
+
+    Args:
+        value: The parsed completion
+        schema (str): Key into SCHEMAS; unknown keys accept any value
+        truncated (bool): Whether the value was recovered from cut-off output (default: False)
+
+    Returns:
+        tuple: (value, repairs) with "unwrapped" in repairs if the array was unwrapped
+
+    Raises:
+        SchemaError: If the value does not have the expected type or required fields
+    """
+    if schema not in SCHEMAS:
+        return value, []
+    container, fields = SCHEMAS[schema]
+
+    repairs = []
+    if container is list and isinstance(value, dict):
+        lists = [item for item in value.values() if isinstance(item, list)]
+        if len(value) == 1 and len(lists) == 1:
+            value = lists[0]
+            repairs.append('unwrapped')
+
+    if not isinstance(value, container):
+        raise SchemaError(f"expected a JSON {'array' if container is list else 'object'}, got {type(value).__name__}")
+
+    if container is dict:
+        _check_item(value, fields, "")
+        return value, repairs
+
+    if truncated and value:
+        try:
+            _check_item(value[-1], fields, "")
+        except SchemaError:
+            value = value[:-1]
+    if not value:
+        raise SchemaError("expected a non-empty array")
+    for position, item in enumerate(value):
+        _check_item(item, fields, f"item {position}: ")
+    return value, repairs
+
+
+def parse_llm_json(content, model, schema=None):
+    """
+    Parse and validate a completion, recording parse time, repairs and failures.
+
+    Args:
+        content (str): The completion content
+        model (str): Model that produced the content
+        schema (str): Key into SCHEMAS to validate against (default: None, no validation)
+
+    Returns:
+        The parsed (and possibly repaired) value, flagged with mark_truncated if the
+        completion was cut off
+
+    Raises:
+        json.JSONDecodeError: If no JSON value can be recovered
+        SchemaError: If the value does not match the schema
+    """
+    with metrics.time_parse(model):
+        value, repairs = extract_json(content)
+        if schema is not None:
+            try:
+                value, unwrapped = validate(value, schema, truncated='truncated' in repairs)
+            except SchemaError:
+                metrics.count_schema_violation(model, schema)
+                raise
+            repairs += unwrapped
+    for repair in repairs:
+        metrics.count_repair(model, repair)
+    if repairs:
+        logs.log_event(logger, logging.INFO, "llm.json_repaired", sample=True, model=model, schema=schema, repairs=repairs)
+    if 'truncated' in repairs:
+        value = mark_truncated(value)
+    return value
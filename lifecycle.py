@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+
+
+class Lifecycle:
+    """
+    Readiness, draining and in-flight request tracking for one server process.
+
+    A process is ready once its agents, caches, catalog and indexes are built. When it
+    is asked to shut down it starts draining: it stops being ready, so the load
+    balancer's /readyz checks take it out of rotation, while the requests it already
+    accepted (and the LLM calls behind them) are allowed to finish.
+    """
+
+    def __init__(self):
+        """Initialize the state of a process that is still starting up."""
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.ready = False
+        self.draining = False
+        self.in_flight = 0
+        self.started_at = time.time()
+
+    def mark_ready(self):
+        """Record that the process can serve traffic."""
+        with self._lock:
+            self.ready = True
+
+    def start_draining(self):
+        """Stop reporting ready; requests already in flight keep running."""
+        with self._lock:
+            self.draining = True
+
+    def is_ready(self):
+        """
+        Check whether the process should receive new traffic.
+
+        Returns:
+            bool: True once started and until it starts draining
+        """
+        with self._lock:
+            return self.ready and not self.draining
+
+    def request_started(self):
+        """Count a request the process has accepted."""
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self):
+        """Count a finished request, waking wait_idle once none are left."""
+        with self._lock:
+            self.in_flight -= 1
+            if self.in_flight <= 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout):
+        """
+        Wait until no requests are in flight.
+
+        Args:
+            timeout (float): Longest time to wait in seconds
+
+        Returns:
+            bool: True if every request finished, False if the timeout passed first
+        """
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self.in_flight > 0:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._idle.wait(left)
+            return True
+
+    def reset_after_fork(self):
+        """Start the request counters afresh in a worker forked from a preloaded master."""
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.draining = False
+        self.in_flight = 0
+        self.started_at = time.time()
+
+    def stats(self):
+        """
+        Report the lifecycle state.
+
+        Returns:
+            dict: Process id, readiness, whether it is draining, requests in flight and uptime
+        """
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'ready': self.ready,
+                'draining': self.draining,
+                'in_flight': self.in_flight,
+                'uptime_s': round(time.time() - self.started_at, 1),
+            }
+
+
+_shared_lifecycle = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_lifecycle():
+    """
+    Return the lifecycle state of this process, creating it on first use.
+
+    Returns:
+        Lifecycle: The shared state
+    """
+    global _shared_lifecycle
+    with _shared_lock:
+        if _shared_lifecycle is None:
+            _shared_lifecycle = Lifecycle()
+        return _shared_lifecycle
@@ -0,0 +1,307 @@
+import os
+import re
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+from transport import env_flag
+
+load_dotenv()  # Load environment variables from .env file
+
+# Keys whose values are never written to the logs, compared case-insensitively
+REDACT_KEYS = {'authorization', 'api_key', 'openai_api_key', 'password', 'secret', 'access_token', 'refresh_token'}
+
+# Credentials that can appear inside free text, e.g. in an upstream error body
+REDACT_PATTERN = re.compile(r'(Bearer\s+)[A-Za-z0-9._\-]+|sk-[A-Za-z0-9_\-]{8,}')
+
+# Attributes every LogRecord has; anything else on a record was added by us
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+# Per-request state picked up by every log record emitted while handling the request
+_request_id = contextvars.ContextVar('log_request_id', default=None)
+_request_debug = contextvars.ContextVar('log_request_debug', default=False)
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def set_request_context(request_id, debug=False):
+    """
+    Tag log records emitted in the current context with a request id, and optionally
+    enable full payload dumps for this request only.
+
+    Args:
+        request_id (str): Identifier to attach to every record of the request
+        debug (bool): Whether debug_payload should log for this request (default: False)
+
+    Returns:
+        tuple: Tokens to pass to reset_request_context
+    """
+    return _request_id.set(request_id), _request_debug.set(debug)
+
+
+def reset_request_context(tokens):
+    """
+    Restore the request context that was active before set_request_context.
+
+    Args:
+        tokens (tuple): Tokens returned by set_request_context
+    """
+    id_token, debug_token = tokens
+    _request_id.reset(id_token)
+    _request_debug.reset(debug_token)
+
+
+def payload_debug_enabled():
+    """
+    Whether full payloads should be logged right now.
+
+    Payload dumps are off unless the current request asked for them, or LOG_DEBUG_PAYLOADS
+    is set to turn them on for every request.
+
+    Returns:
+        bool: True if debug_payload will emit a record
+    """
+    return _request_debug.get() or env_flag('LOG_DEBUG_PAYLOADS')
+
+
+def log_event(logger, level, event, sample=False, **fields):
+    """
+    Log a structured event.
+
+    Nothing is formatted or serialized on the calling thread: the record carries the
+    fields as-is and the background writer turns them into a line.
+
+    Args:
+        logger (logging.Logger): The logger to emit on
+        level (int): Logging level, e.g. logging.INFO
+        event (str): Short dotted event name, e.g. "llm.call"
+        sample (bool): Subject the record to LOG_SAMPLE_RATE, for high-volume events (default: False)
+        **fields: Structured fields to attach to the event
+    """
+    if logger.isEnabledFor(level):
+        # Build the record directly: Logger.log would also walk the stack to find the caller
+        logger.handle(logger.makeRecord(logger.name, level, '(event)', 0, event, None, None,
+                                        extra={'fields': fields, 'sample': sample}))
+
+
+def debug_payload(logger, event, payload, **fields):
+    """
+    Log a full payload (request, raw completion, parsed output, ...) when payload debugging is on.
+
+    The record is emitted at DEBUG level even if the logger's level is higher, because
+    turning on payload debugging for a request is the explicit opt-in. The payload is
+    redacted and truncated by the background writer.
+
+    Args:
+        logger (logging.Logger): The logger to emit on
+        event (str): Short dotted event name, e.g. "apply.llm_response"
+        payload: Any JSON-serializable value
+        **fields: Extra structured fields
+    """
+    if not payload_debug_enabled():
+        return
+    record = logger.makeRecord(logger.name, logging.DEBUG, '(payload)', 0, event, None, None,
+                               extra={'fields': dict(fields, payload=payload), 'sample': False})
+    logger.handle(record)
+
+
+def redact(value):
+    """
+    Replace credentials in a value with "[REDACTED]".
+
+    Args:
+        value: A string, or a dict/list structure of them
+
+    Returns:
+        A copy of the value with secret keys and token-like strings redacted
+    """
+    if isinstance(value, dict):
+        return {key: '[REDACTED]' if str(key).lower() in REDACT_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return REDACT_PATTERN.sub(lambda match: (match.group(1) or '') + '[REDACTED]', value)
+    return value
+
+
+def truncate(value, limit):
+    """
+    Shorten long strings inside a value, noting how much was cut.
+
+    Args:
+        value: A string, or a dict/list structure of them
+        limit (int): Maximum characters kept per string
+
+    Returns:
+        A copy of the value with long strings cut to limit characters
+    """
+    if isinstance(value, dict):
+        return {key: truncate(item, limit) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [truncate(item, limit) for item in value]
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more chars]"
+    return value
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request id from the emitting thread's context onto the record."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the records that opted into sampling; warnings and errors always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1.0 or not getattr(record, 'sample', False) or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves all formatting to the listener thread.
+
+    The standard QueueHandler formats the message on the calling thread; here the
+    record is enqueued as-is so that logging on the request path only costs a
+    record allocation and a queue put.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line, with its structured fields redacted and truncated."""
+
+    def __init__(self, max_field_chars=2000):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def fields(self, record):
+        fields = dict(getattr(record, 'fields', None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in ('fields', 'sample', 'request_id'):
+                fields.setdefault(key, value)
+        return truncate(redact(fields), self.max_field_chars)
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        entry.update(self.fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(JSONFormatter):
+    """Formats a record as a readable line: time, level, logger, event and key=value fields."""
+
+    def format(self, record):
+        created = datetime.fromtimestamp(record.created).strftime('%H:%M:%S.%f')[:-3]
+        parts = [created, f"{record.levelname:<7}", record.name, record.getMessage()]
+        if getattr(record, 'request_id', None):
+            parts.append(f"request_id={record.request_id}")
+        for key, value in self.fields(record).items():
+            text = value if isinstance(value, str) else json.dumps(value, default=str)
+            parts.append(f"{key}={text}")
+        line = ' '.join(parts)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level=None, fmt=None, sample_rate=None, max_field_chars=None, stream=None):
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Safe to call more than once; only the first call takes effect. Any argument left
+    as None is read from the environment, falling back to a default.
+
+    Args:
+        level (str): Minimum level (env LOG_LEVEL, default: "INFO")
+        fmt (str): "json" or "text" (env LOG_FORMAT, default: "json")
+        sample_rate (float): Fraction of sampled events kept (env LOG_SAMPLE_RATE, default: 1.0)
+        max_field_chars (int): Longest string written per field (env LOG_MAX_FIELD_CHARS, default: 2000)
+        stream: Where log lines are written (default: sys.stderr)
+
+    Returns:
+        QueueListener: The running background writer
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+
+        if level is None:
+            level = os.getenv('LOG_LEVEL', 'INFO')
+        if fmt is None:
+            fmt = os.getenv('LOG_FORMAT', 'json')
+        if sample_rate is None:
+            sample_rate = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+        if max_field_chars is None:
+            max_field_chars = int(os.getenv('LOG_MAX_FIELD_CHARS', '2000'))
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(TextFormatter(max_field_chars) if fmt == 'text' else JSONFormatter(max_field_chars))
+
+        handler = DeferredQueueHandler(queue.SimpleQueue())
+        handler.addFilter(ContextFilter())
+        handler.addFilter(SamplingFilter(sample_rate))
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(level.upper())
+
+        _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)  # Flush queued records on shutdown
+        return _listener
+
+
+def reset_after_fork():
+    """
+    Restart the background writer in a process forked after logging was configured.
+
+    The writer thread does not survive a fork, so the child's records would pile up
+    unwritten. The child gets its own queue, so records the parent had queued but not
+    yet written are not written twice.
+    """
+    global _listener, _listener_lock
+    _listener_lock = threading.Lock()
+    if _listener is None:
+        return
+    handler = next(h for h in logging.getLogger().handlers if isinstance(h, DeferredQueueHandler))
+    handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Write out every queued record and stop the background writer."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,434 @@
+import os
+import time
+import json
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+
+# Latency buckets in seconds, sized for LLM calls that take from tens of milliseconds to a minute
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+# Share of a call's max_tokens that the completion used; 1.0 means the output was cut off
+BUDGET_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+# Parsing a completion takes microseconds to milliseconds
+PARSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+UPSTREAM_LATENCY = Histogram(
+    'llm_upstream_latency_seconds',
+    'Time spent waiting for the completions API',
+    ['endpoint', 'model'],
+    buckets=LATENCY_BUCKETS,
+)
+PARSE_LATENCY = Histogram(
+    'llm_parse_seconds',
+    'Time spent parsing JSON out of completion content',
+    ['endpoint', 'model'],
+    buckets=PARSE_BUCKETS,
+)
+HANDLER_LATENCY = Histogram(
+    'http_handler_seconds',
+    'Total time spent handling a request, including streaming the response body',
+    ['endpoint', 'model'],
+    buckets=LATENCY_BUCKETS,
+)
+TOKENS = Counter(
+    'llm_tokens_total',
+    'Tokens reported in the usage block of completion responses',
+    ['endpoint', 'model', 'kind'],
+)
+RETURNED_TOKENS = Counter(
+    'llm_returned_tokens_total',
+    'Completion tokens whose content was returned to the client, estimated from the share of the parsed output kept',
+    ['endpoint', 'model'],
+)
+BUDGET_USED = Histogram(
+    'llm_token_budget_used_ratio',
+    'Completion tokens of a call divided by the max_tokens it was sent with',
+    ['endpoint', 'model'],
+    buckets=BUDGET_BUCKETS,
+)
+PARSE_FAILURES = Counter(
+    'llm_parse_failures_total',
+    'Completions whose content could not be parsed as JSON',
+    ['endpoint', 'model'],
+)
+PARSE_REPAIRS = Counter(
+    'llm_parse_repairs_total',
+    'Completions that only parsed after a repair, by repair ("fence", "extracted", "trailing_comma", "truncated", "unwrapped")',
+    ['endpoint', 'model', 'repair'],
+)
+SCHEMA_VIOLATIONS = Counter(
+    'llm_schema_violations_total',
+    'Completions that parsed as JSON but did not have the shape the endpoint returns',
+    ['endpoint', 'model', 'schema'],
+)
+UPSTREAM_ERRORS = Counter(
+    'llm_upstream_errors_total',
+    'Failed calls to the completions API by HTTP status code ("connection" when no response arrived)',
+    ['endpoint', 'model', 'code'],
+)
+COALESCED = Counter(
+    'llm_coalesced_requests_total',
+    'LLM calls answered by sharing an identical request that was already in flight',
+    ['endpoint', 'model'],
+)
+HEDGES = Counter(
+    'llm_hedged_requests_total',
+    'LLM calls that sent a hedge request, by which request finished first ("primary_won", "hedge_won")',
+    ['endpoint', 'model', 'outcome'],
+)
+RETRIES = Counter(
+    'llm_retries_total',
+    'LLM calls retried after a failed attempt, by reason (HTTP status, "timeout" or "connection")',
+    ['endpoint', 'model', 'reason'],
+)
+CIRCUIT_REJECTIONS = Counter(
+    'llm_circuit_rejections_total',
+    'LLM calls refused without contacting the API because the circuit breaker was open',
+    ['endpoint', 'model'],
+)
+ROUTED = Counter(
+    'llm_routed_calls_total',
+    'LLM calls by route and why their model was picked ("primary", "long_input", "slo_fallback")',
+    ['endpoint', 'model', 'route', 'reason'],
+)
+PROMPT_CACHE_CALLS = Counter(
+    'llm_prompt_cache_calls_total',
+    'Completions by whether part of their prompt was served from the API\'s prompt cache ("hit", "miss", "unreported")',
+    ['endpoint', 'model', 'outcome'],
+)
+PREFETCHES = Counter(
+    'explain_prefetches_total',
+    'Explanations prefetched after /parse, by outcome ("generated", "failed", "skipped_cached", "skipped_busy", "skipped_unavailable")',
+    ['outcome'],
+)
+PREFETCH_HITS = Counter(
+    'explain_prefetch_hits_total',
+    '/explain requests for a framework that was prefetched within PREFETCH_HIT_WINDOW seconds',
+)
+BACKEND_REQUESTS = Counter(
+    'llm_backend_requests_total',
+    'Upstream attempts by backend and HTTP status code ("connection" when no response arrived)',
+    ['endpoint', 'backend', 'code'],
+)
+
+# Endpoint label for metrics recorded while handling the current request. Agents read
+# it so upstream and parse timings land under the route that caused them.
+_endpoint = contextvars.ContextVar('metrics_endpoint', default='none')
+
+
+def current_endpoint():
+    """
+    Return the endpoint label of the request being handled.
+
+    Returns:
+        str: The label, or "none" outside of a request
+    """
+    return _endpoint.get()
+
+
+def set_endpoint(endpoint):
+    """
+    Set the endpoint label for the current context.
+
+    Args:
+        endpoint (str): The label, usually the route rule such as "/apply"
+
+    Returns:
+        contextvars.Token: Token to pass to reset_endpoint
+    """
+    return _endpoint.set(endpoint)
+
+
+def reset_endpoint(token):
+    """
+    Restore the endpoint label that was active before set_endpoint.
+
+    Args:
+        token (contextvars.Token): Token returned by set_endpoint
+    """
+    _endpoint.reset(token)
+
+
+@contextmanager
+def endpoint_label(endpoint):
+    """
+    Label metrics recorded inside the block with the given endpoint.
+
+    Args:
+        endpoint (str): The label
+    """
+    token = set_endpoint(endpoint)
+    try:
+        yield
+    finally:
+        reset_endpoint(token)
+
+
+def observe_upstream(model, seconds, status):
+    """
+    Record one call to the completions API.
+
+    Args:
+        model (str): Model the call was made with
+        seconds (float): Time until the response (or failure) arrived
+        status: HTTP status code, or None if no response arrived
+    """
+    endpoint = current_endpoint()
+    UPSTREAM_LATENCY.labels(endpoint, model).observe(seconds)
+    if status != 200:
+        UPSTREAM_ERRORS.labels(endpoint, model, str(status) if status is not None else 'connection').inc()
+
+
+def record_usage(model, usage, max_tokens=None):
+    """
+    Count the tokens from a completion's usage block.
+
+    Args:
+        model (str): Model the call was made with
+        usage (dict): The 'usage' object of the completion response, or None
+        max_tokens (int): Token limit the call was sent with, to record how much of it was used
+    """
+    if not usage:
+        return
+    endpoint = current_endpoint()
+    TOKENS.labels(endpoint, model, 'prompt').inc(usage.get('prompt_tokens') or 0)
+    TOKENS.labels(endpoint, model, 'completion').inc(usage.get('completion_tokens') or 0)
+    if max_tokens:
+        BUDGET_USED.labels(endpoint, model).observe((usage.get('completion_tokens') or 0) / max_tokens)
+    cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    if cached:
+        TOKENS.labels(endpoint, model, 'cached').inc(cached)
+    if cached is None:
+        outcome = 'unreported'  # The backend does not report prompt caching
+    else:
+        outcome = 'hit' if cached else 'miss'
+    PROMPT_CACHE_CALLS.labels(endpoint, model, outcome).inc()
+
+
+def record_returned_tokens(model, usage, generated, returned):
+    """
+    Count the completion tokens that made it into the response sent to the client.
+
+    When only part of the parsed output is returned (e.g. the first frameworks of a
+    longer list), the completion tokens are split by the share of the JSON kept.
+    Compare with llm_tokens_total{kind="completion"} to see how much generation is wasted.
+
+    Args:
+        model (str): Model the call was made with
+        usage (dict): The 'usage' object of the completion response, or None
+        generated: The parsed output
+        returned: The part of it returned to the client
+    """
+    completion_tokens = (usage or {}).get('completion_tokens')
+    if not completion_tokens:
+        return
+    share = 1.0
+    if returned is not generated:
+        total = len(json.dumps(generated))
+        share = len(json.dumps(returned)) / total if total else 1.0
+    RETURNED_TOKENS.labels(current_endpoint(), model).inc(completion_tokens * min(share, 1.0))
+
+
+@contextmanager
+def time_parse(model):
+    """
+    Time the JSON parsing done inside the block and count it as a failure if it raises ValueError.
+
+    json.JSONDecodeError is a ValueError, so wrapping json.loads(content) is enough.
+
+    Args:
+        model (str): Model that produced the content
+    """
+    endpoint = current_endpoint()
+    start = time.perf_counter()
+    try:
+        yield
+    except ValueError:
+        PARSE_FAILURES.labels(endpoint, model).inc()
+        raise
+    finally:
+        PARSE_LATENCY.labels(endpoint, model).observe(time.perf_counter() - start)
+
+
+def count_parse_failure(model):
+    """
+    Count a completion that could not be used, for failures that are not raised as exceptions.
+
+    Args:
+        model (str): Model that produced the content
+    """
+    PARSE_FAILURES.labels(current_endpoint(), model).inc()
+
+
+def count_repair(model, repair):
+    """
+    Count a completion that needed a repair before it could be parsed.
+
+    Args:
+        model (str): Model that produced the content
+        repair (str): Name of the repair, e.g. "fence" or "truncated"
+    """
+    PARSE_REPAIRS.labels(current_endpoint(), model, repair).inc()
+
+
+def count_schema_violation(model, schema):
+    """
+    Count a completion that did not match the expected response shape.
+
+    Args:
+        model (str): Model that produced the content
+        schema (str): Name of the schema it was checked against
+    """
+    SCHEMA_VIOLATIONS.labels(current_endpoint(), model, schema).inc()
+
+
+def count_coalesced(model):
+    """
+    Count an LLM call that was answered by an identical in-flight request instead of its own.
+
+    Args:
+        model (str): Model of the coalesced call
+    """
+    COALESCED.labels(current_endpoint(), model).inc()
+
+
+def count_hedge(model, outcome):
+    """
+    Count an LLM call that was hedged with a second request.
+
+    Args:
+        model (str): Model of the call
+        outcome (str): "primary_won" or "hedge_won"
+    """
+    HEDGES.labels(current_endpoint(), model, outcome).inc()
+
+
+def count_retry(model, reason):
+    """
+    Count a retried LLM call.
+
+    Args:
+        model (str): Model of the call
+        reason (str): HTTP status of the failed attempt, "timeout" or "connection"
+    """
+    RETRIES.labels(current_endpoint(), model, reason).inc()
+
+
+def count_circuit_rejection(model):
+    """
+    Count an LLM call refused by the open circuit breaker.
+
+    Args:
+        model (str): Model of the call
+    """
+    CIRCUIT_REJECTIONS.labels(current_endpoint(), model).inc()
+
+
+def count_route(model, route, reason):
+    """
+    Count an LLM call routed to a model.
+
+    Args:
+        model (str): Model the call is sent to
+        route (str): Route of the call, e.g. "compare_synthesis"
+        reason (str): "primary", "long_input" or "slo_fallback"
+    """
+    ROUTED.labels(current_endpoint(), model, route, reason).inc()
+
+
+def count_backend_request(backend, status):
+    """
+    Count an upstream attempt sent to a backend.
+
+    Args:
+        backend (str): Name of the backend
+        status: HTTP status code, or None if no response arrived
+    """
+    BACKEND_REQUESTS.labels(current_endpoint(), backend, str(status) if status is not None else 'connection').inc()
+
+
+def count_prefetch(outcome):
+    """
+    Count a framework whose explanation was or was not prefetched.
+
+    Args:
+        outcome (str): "generated", "failed" or "skipped_<reason>"
+    """
+    PREFETCHES.labels(outcome).inc()
+
+
+def count_prefetch_hit():
+    """Count an /explain request that a prefetch anticipated."""
+    PREFETCH_HITS.inc()
+
+
+def observe_handler(endpoint, model, seconds):
+    """
+    Record the total time spent on one request.
+
+    Args:
+        endpoint (str): The route rule, e.g. "/apply"
+        model (str): Model of the agent behind the route, or "none"
+        seconds (float): Time from the start of the request until the response was finished
+    """
+    HANDLER_LATENCY.labels(endpoint, model).observe(seconds)
+
+
+def _sum_by_endpoint(counter, label):
+    """Sum a counter's samples in this process by endpoint and the value of another label."""
+    totals = {}
+    for metric in counter.collect():
+        for sample in metric.samples:
+            if not sample.name.endswith('_total'):
+                continue
+            key = (sample.labels['endpoint'], sample.labels[label])
+            totals[key] = totals.get(key, 0) + sample.value
+    return totals
+
+
+def prompt_cache_report():
+    """
+    Report how much of each endpoint's prompts was served from the API's prompt cache.
+
+    Counts are those of this process. For the whole server, divide
+    llm_tokens_total{kind="cached"} by llm_tokens_total{kind="prompt"} in Prometheus.
+
+    Returns:
+        dict: Per endpoint, the calls, calls with a prompt cache hit, prompt tokens,
+              cached prompt tokens and the share of prompt tokens that were cached
+    """
+    tokens = _sum_by_endpoint(TOKENS, 'kind')
+    calls = _sum_by_endpoint(PROMPT_CACHE_CALLS, 'outcome')
+    report = {}
+    for endpoint in sorted({endpoint for endpoint, _ in calls}):
+        prompt_tokens = tokens.get((endpoint, 'prompt'), 0)
+        cached_tokens = tokens.get((endpoint, 'cached'), 0)
+        report[endpoint] = {
+            'calls': int(sum(count for (name, _), count in calls.items() if name == endpoint)),
+            'hit_calls': int(calls.get((endpoint, 'hit'), 0)),
+            'unreported_calls': int(calls.get((endpoint, 'unreported'), 0)),
+            'prompt_tokens': int(prompt_tokens),
+            'cached_tokens': int(cached_tokens),
+            'cached_ratio': round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+        }
+    return report
+
+
+def render():
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (serve.py sets it for multi-worker servers),
+    every worker writes its samples there and the values of all workers are combined,
+    so a scrape that reaches any one worker sees the totals of the whole server.
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,376 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from transport import env_flag
+from cache import LRUCache, ResultCache, normalize_framework_name, get_shared_cache_backend
+from resilience import deadline, endpoint_deadline
+import metrics
+import logs
+
+load_dotenv()  # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+# Endpoint label of prefetch calls, so their latency and tokens are not counted as /explain traffic
+PREFETCH_ENDPOINT = 'prefetch'
+
+
+def prefetch_enabled():
+    """
+    Check whether explanations of suggested frameworks should be prefetched.
+
+    Returns:
+        bool: The EXPLAIN_PREFETCH flag (default: False)
+    """
+    return env_flag('EXPLAIN_PREFETCH', False)
+
+
+class ExplainPrefetcher:
+    """
+    Speculatively generates explanations of the frameworks /parse just suggested.
+
+    Most users ask for an explanation of one of the suggestions within seconds, so
+    once /parse has answered, the suggested frameworks are explained in the background
+    and stored in the explanation cache; the click is then a cache hit instead of a
+    full LLM round trip.
+
+    Prefetching never competes with requests: it runs on its own small thread pool,
+    at most max_concurrent prefetches run at once (names beyond that are dropped, not
+    queued), frameworks the catalog or cache can already explain are skipped, and
+    nothing is prefetched while the circuit breaker is open or the process is draining.
+
+    Every prefetched framework leaves a marker in the shared cache for `window`
+    seconds. An /explain request that finds the marker claims it and counts as a hit,
+    whichever worker serves it; prefetches never claimed were wasted calls. A request
+    that arrives while its prefetch is still running in the same process waits for it
+    (see wait) instead of generating the explanation a second time.
+    """
+
+    def __init__(self, explainer, max_concurrent=None, max_names=None, window=None, backend=None,
+                 lifecycle=None, detail="full"):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            explainer (FrameworkExplainerAgent): Agent that generates and caches the explanations
+            max_concurrent (int): Prefetches running at once (env PREFETCH_MAX_CONCURRENT, default: 2)
+            max_names (int): Frameworks prefetched per /parse response (env PREFETCH_MAX_NAMES, default: 3)
+            window (float): Seconds after a prefetch in which an /explain counts as a hit
+                            (env PREFETCH_HIT_WINDOW, default: 600)
+            backend (CacheBackend): Where hit markers are kept, so every worker can claim them
+                                    (default: get_shared_cache_backend(); this process's memory if that is None)
+            lifecycle (Lifecycle): State of the process, to stop prefetching while it drains (default: None)
+            detail (str): Level of detail prefetched, the one the UI asks for (default: "full")
+        """
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv('PREFETCH_MAX_CONCURRENT', '2'))
+        if max_names is None:
+            max_names = int(os.getenv('PREFETCH_MAX_NAMES', '3'))
+        if window is None:
+            window = float(os.getenv('PREFETCH_HIT_WINDOW', '600'))
+        if backend is None:
+            backend = get_shared_cache_backend()
+        self.explainer = explainer
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self.max_names = max_names
+        self.window = window
+        self.lifecycle = lifecycle
+        self.detail = detail
+        self.backend = backend
+        self._markers = LRUCache(maxsize=4096, ttl=window) if backend is None else None
+        self._running = 0
+        self._lock = threading.Lock()
+        self._executor = None  # Created on first use, so a preloaded master never starts its threads
+        self._in_flight = {}  # Marker key -> threading.Event set when the prefetch finishes
+        self.scheduled = 0
+        self.generated = 0
+        self.failed = 0
+        self.hits = 0
+        self.skipped = {'cached': 0, 'busy': 0, 'unavailable': 0}
+
+    def marker_key(self, framework_name):
+        """
+        Build the key of a framework's hit marker.
+
+        Args:
+            framework_name (str): The name of the framework
+
+        Returns:
+            str: The key, specific to the explainer's model and prompt version
+        """
+        return ResultCache.make_key("prefetch", self.explainer.model, self.explainer.cache_version(self.detail),
+                                    normalize_framework_name(framework_name))
+
+    def _mark(self, key):
+        """Leave a hit marker that expires after `window` seconds."""
+        if self.backend is not None:
+            self.backend.set(key, time.time(), ttl=self.window)
+        else:
+            self._markers.set(key, time.time())
+
+    def _take_marker(self, key):
+        """Remove a hit marker, returning whether it was there; of concurrent callers only one gets True."""
+        if self.backend is None:
+            return self._markers.pop(key) is not None
+        return self.backend.delete(key)
+
+    def candidates(self, frameworks):
+        """
+        Pick the framework names of a /parse response to prefetch.
+
+        Args:
+            frameworks (list): The suggested frameworks, as dicts with a 'name' key or as names
+
+        Returns:
+            list: At most max_names distinct names, in the order they were suggested
+        """
+        if not isinstance(frameworks, list):
+            return []
+        names = []
+        seen = set()
+        for framework in frameworks:
+            name = framework.get('name') if isinstance(framework, dict) else framework
+            if not isinstance(name, str) or not name.strip():
+                continue
+            normalized = normalize_framework_name(name)
+            if normalized not in seen:
+                seen.add(normalized)
+                names.append(name)
+        return names[:self.max_names]
+
+    def _skip(self, reason):
+        """Count a framework that was not prefetched."""
+        with self._lock:
+            self.skipped[reason] += 1
+        metrics.count_prefetch(f"skipped_{reason}")
+
+    def _available(self):
+        """Check whether the process may spend LLM calls on prefetching right now."""
+        if self.lifecycle is not None and self.lifecycle.draining:
+            return False
+        breaker = self.explainer.breaker
+        return breaker is None or not breaker.is_open()
+
+    def _start(self, name):
+        """
+        Reserve a slot and mark a framework as prefetched.
+
+        Returns:
+            bool: True if the prefetch may run, False if it was skipped
+        """
+        if self.explainer.get_cached_explanation(name, self.detail) is not None:
+            self._skip('cached')
+            return False
+        if not self._available():
+            self._skip('unavailable')
+            return False
+        with self._lock:
+            if self._running >= self.max_concurrent:
+                busy = True
+            else:
+                busy = False
+                self._running += 1
+                self.scheduled += 1
+        if busy:
+            self._skip('busy')
+            return False
+        # Marked before it runs, so a click while the prefetch is still in flight counts too
+        self._mark(self.marker_key(name))
+        return True
+
+    def _finish(self, name, explanation):
+        """Release the slot of a finished prefetch and count its outcome."""
+        failed = not isinstance(explanation, dict) or "error" in explanation
+        with self._lock:
+            self._running = max(self._running - 1, 0)
+            if failed:
+                self.failed += 1
+            else:
+                self.generated += 1
+        metrics.count_prefetch("failed" if failed else "generated")
+        if failed:
+            self._take_marker(self.marker_key(name))  # A click on it is not a hit
+            error = explanation.get('error') if isinstance(explanation, dict) else str(explanation)
+            logs.log_event(logger, logging.INFO, "prefetch.failed", framework=name, error=error)
+
+    def _prefetch(self, name, done):
+        """Generate and cache the explanation of one framework on a prefetch thread."""
+        explanation = None
+        try:
+            with metrics.endpoint_label(PREFETCH_ENDPOINT), deadline(endpoint_deadline('/explain')):
+                explanation = self.explainer.explain_framework(name, self.detail)
+        except Exception as e:
+            explanation = {"error": str(e)}
+        finally:
+            self._finish(name, explanation)
+            with self._lock:
+                self._in_flight.pop(self.marker_key(name), None)
+            done.set()
+
+    def _submit(self, name):
+        """Run a prefetch on the prefetch thread pool."""
+        done = threading.Event()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                                    thread_name_prefix="explain-prefetch")
+            executor = self._executor
+            self._in_flight[self.marker_key(name)] = done
+        executor.submit(self._prefetch, name, done)
+
+    def schedule(self, frameworks):
+        """
+        Start prefetching explanations of the frameworks a /parse request returned.
+
+        Returns straight away; the explanations are generated in the background.
+
+        Args:
+            frameworks (list): The suggested frameworks, as returned to the client
+
+        Returns:
+            int: Number of prefetches started
+        """
+        started = 0
+        for name in self.candidates(frameworks):
+            if self._start(name):
+                self._submit(name)
+                started += 1
+        return started
+
+    def claim(self, framework_name):
+        """
+        Record an /explain request, counting it as a hit if the framework was prefetched.
+
+        Each prefetch is counted as a hit at most once.
+
+        Args:
+            framework_name (str): The framework the client asked to explain
+
+        Returns:
+            bool: True if the framework was prefetched in the last `window` seconds
+        """
+        if not framework_name or not self._take_marker(self.marker_key(framework_name)):
+            return False
+        with self._lock:
+            self.hits += 1
+        metrics.count_prefetch_hit()
+        return True
+
+    def wait(self, framework_name, timeout=None):
+        """
+        Wait for a prefetch of the framework that is still running in this process.
+
+        Args:
+            framework_name (str): The framework the client asked to explain
+            timeout (float): Longest time to wait in seconds, or None to wait until it ends
+
+        Returns:
+            bool: True if no prefetch of it is running any more
+        """
+        with self._lock:
+            done = self._in_flight.get(self.marker_key(framework_name))
+        return done is None or done.wait(timeout)
+
+    def stats(self):
+        """
+        Report prefetch counters.
+
+        Returns:
+            dict: Prefetches started, running, generated and failed, frameworks skipped by
+                  reason, hits, and the share of generated explanations that were used
+        """
+        with self._lock:
+            return {
+                'scheduled': self.scheduled,
+                'running': self._running,
+                'generated': self.generated,
+                'failed': self.failed,
+                'skipped': dict(self.skipped),
+                'hits': self.hits,
+                'hit_rate': round(min(self.hits / self.generated, 1.0), 3) if self.generated else 0.0,
+            }
+
+
+class AsyncExplainPrefetcher(ExplainPrefetcher):
+    """
+    Asyncio counterpart of ExplainPrefetcher for async_app.py.
+
+    Prefetches run as tasks on the event loop instead of on a thread pool, with the
+    same budget, markers and counters. schedule(), claim() and wait() are coroutines,
+    and the cache lookups and marker writes behind them run on the loop's default
+    executor, since a SQLite or Redis backend would block the loop.
+    """
+
+    @staticmethod
+    async def _run_blocking(function, *args):
+        """Run a call that may block on the cache backend on the default executor, in the caller's context."""
+        return await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, function, *args)
+
+    async def _prefetch_async(self, name):
+        """Generate and cache the explanation of one framework in a task."""
+        explanation = None
+        try:
+            with metrics.endpoint_label(PREFETCH_ENDPOINT), deadline(endpoint_deadline('/explain')):
+                explanation = await self.explainer.explain_framework(name, self.detail)
+        except Exception as e:
+            explanation = {"error": str(e)}
+        finally:
+            await self._run_blocking(self._finish, name, explanation)
+
+    def _submit(self, name):
+        """Run a prefetch as a task on the running event loop; schedule() must be called on the loop."""
+        key = self.marker_key(name)
+        task = asyncio.get_running_loop().create_task(self._prefetch_async(name))
+        self._in_flight[key] = task  # Also keeps the task from being garbage-collected
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    async def schedule(self, frameworks):
+        """
+        Start prefetching explanations of the frameworks a /parse request returned.
+
+        Returns once the prefetches are started; the explanations are generated in tasks.
+
+        Args:
+            frameworks (list): The suggested frameworks, as returned to the client
+
+        Returns:
+            int: Number of prefetches started
+        """
+        names = await self._run_blocking(lambda: [name for name in self.candidates(frameworks) if self._start(name)])
+        for name in names:
+            self._submit(name)
+        return len(names)
+
+    async def claim(self, framework_name):
+        """
+        Record an /explain request, counting it as a hit if the framework was prefetched.
+
+        Args:
+            framework_name (str): The framework the client asked to explain
+
+        Returns:
+            bool: True if the framework was prefetched in the last `window` seconds
+        """
+        return await self._run_blocking(super().claim, framework_name)
+
+    async def wait(self, framework_name, timeout=None):
+        """
+        Wait for a prefetch of the framework that is still running in this process.
+
+        Args:
+            framework_name (str): The framework the client asked to explain
+            timeout (float): Longest time to wait in seconds, or None to wait until it ends
+
+        Returns:
+            bool: True if no prefetch of it is running any more
+        """
+        task = self._in_flight.get(self.marker_key(framework_name))
+        if task is None:
+            return True
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        return bool(done)
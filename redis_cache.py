@@ -0,0 +1,347 @@
+import os
+import time
+import socket
+import logging
+import threading
+from urllib.parse import urlparse, unquote
+from dotenv import load_dotenv
+from cache import CacheBackend
+import logs
+
+load_dotenv()  # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+
+class RedisError(Exception):
+    """An error reply from the Redis server."""
+
+
+def encode_command(args):
+    """
+    Encode a command in the Redis serialization protocol (RESP).
+
+    Args:
+        args (tuple): Command name and arguments, as str, bytes or numbers
+
+    Returns:
+        bytes: The command as an array of bulk strings
+    """
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """
+    Read one reply from a Redis connection.
+
+    Args:
+        stream: Buffered binary file wrapping the connection's socket
+
+    Returns:
+        The reply: bytes for bulk strings, str for status replies, int, list, None
+        for nil, or a RedisError instance for error replies
+
+    Raises:
+        ConnectionError: If the server closed the connection
+    """
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError("Connection closed by the Redis server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode('utf-8')
+    if kind == b'-':
+        return RedisError(rest.decode('utf-8'))
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed by the Redis server")
+        return data[:-2]
+    if kind == b'*':
+        length = int(rest)
+        return None if length < 0 else [read_reply(stream) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply from the Redis server: {line[:40]!r}")
+
+
+class RedisClient:
+    """
+    Minimal thread-safe Redis client over the standard library's sockets.
+
+    Speaks just enough RESP for a cache: it sends commands, optionally several in one
+    round trip, and reads their replies. Connections are kept open in a small pool and
+    each one is used by a single thread at a time.
+    """
+
+    def __init__(self, url, socket_timeout=None, max_idle=None):
+        """
+        Initialize the client. Connections are opened on first use.
+
+        Args:
+            url (str): Server URL, "redis://[[user]:password@]host[:port][/db]"
+            socket_timeout (float): Seconds to wait for the server (env REDIS_SOCKET_TIMEOUT, default: 0.25)
+            max_idle (int): Idle connections kept open (env REDIS_POOL_SIZE, default: 16)
+        """
+        if socket_timeout is None:
+            socket_timeout = float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.25'))
+        if max_idle is None:
+            max_idle = int(os.getenv('REDIS_POOL_SIZE', '16'))
+        parsed = urlparse(url)
+        if parsed.scheme != 'redis':
+            raise ValueError(f"Unsupported Redis URL '{url}', expected redis://host:port/db")
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.socket_timeout = socket_timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """
+        Open a connection, authenticating and selecting the database if the URL asks for it.
+
+        Returns:
+            tuple: (socket, buffered reader)
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=self.socket_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile('rb'))
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.username, self.password) if self.username else ('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            for reply in self._send(conn, setup):
+                if isinstance(reply, RedisError):
+                    sock.close()
+                    raise reply
+        return conn
+
+    @staticmethod
+    def _send(conn, commands):
+        """Write commands on a connection and read one reply per command."""
+        sock, stream = conn
+        sock.sendall(b''.join(encode_command(command) for command in commands))
+        return [read_reply(stream) for _ in commands]
+
+    def pipeline(self, commands):
+        """
+        Send several commands in one round trip.
+
+        Args:
+            commands (list): Commands, each a tuple of name and arguments
+
+        Returns:
+            list: One reply per command; error replies are RedisError instances
+
+        Raises:
+            OSError: If the server cannot be reached or the connection fails
+        """
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            replies = self._send(conn, commands)
+        except BaseException:
+            conn[0].close()
+            raise
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn[0].close()
+        return replies
+
+    def execute(self, *command):
+        """
+        Send one command.
+
+        Args:
+            *command: Command name and arguments, e.g. "GET", "key"
+
+        Returns:
+            The reply
+
+        Raises:
+            RedisError: If the server answers with an error
+            OSError: If the server cannot be reached or the connection fails
+        """
+        reply = self.pipeline([command])[0]
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    def reset(self):
+        """
+        Forget pooled connections in a process forked after they were opened.
+
+        They are abandoned rather than closed, so the parent's connections stay usable.
+        """
+        self._idle = []
+        self._lock = threading.Lock()
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache backend on a Redis server (or anything speaking its protocol), shared by every host.
+
+    Entries are stored with SET ... PX, so Redis expires them itself; bound the
+    server's memory with its maxmemory and an allkeys-lru eviction policy. Values are
+    stored as JSON (see CacheBackend), so a value another client wrote can at worst be
+    a wrong or corrupt result, never code run by the workers.
+
+    The cache must never fail a request: when Redis is unreachable, lookups are misses
+    and writes are dropped, and the server is not contacted again for retry_after
+    seconds, so an outage costs one timeout rather than one per request.
+    """
+
+    def __init__(self, url, ttl=None, prefix=None, max_value_bytes=None, retry_after=None, client=None):
+        """
+        Initialize the cache.
+
+        Args:
+            url (str): Server URL, e.g. "redis://127.0.0.1:6379/0"
+            ttl (float): Seconds an entry stays valid unless set() is given its own TTL, or None to never expire
+            prefix (str): Prepended to every key (env REDIS_KEY_PREFIX, default: "framework:")
+            max_value_bytes (int): Largest serialized value stored (env CACHE_MAX_VALUE_BYTES, default: 262144)
+            retry_after (float): Seconds to skip Redis after an error (env REDIS_RETRY_AFTER, default: 1)
+            client (RedisClient): Client to use (default: a new client for url)
+        """
+        super().__init__(ttl, max_value_bytes)
+        if prefix is None:
+            prefix = os.getenv('REDIS_KEY_PREFIX', 'framework:')
+        if retry_after is None:
+            retry_after = float(os.getenv('REDIS_RETRY_AFTER', '1'))
+        self.url = url
+        self.prefix = prefix
+        self.retry_after = retry_after
+        self.client = client or RedisClient(url)
+        self._unavailable_until = 0.0
+
+    def _available(self):
+        """Check whether Redis may be contacted, i.e. no error happened in the last retry_after seconds."""
+        return time.monotonic() >= self._unavailable_until
+
+    def _failed(self, operation, error):
+        """Count and log a Redis error and stop contacting the server for retry_after seconds."""
+        self.errors += 1
+        self._unavailable_until = time.monotonic() + self.retry_after
+        logs.log_event(logger, logging.WARNING, "cache.redis_error", operation=operation,
+                       error=str(error), retry_after_s=self.retry_after)
+
+    def get(self, key):
+        """
+        Look up a key.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            tuple: (value, expires_at), or None if the key is missing, expired or Redis is unavailable
+        """
+        if not self._available():
+            self.misses += 1
+            return None
+        name = self.prefix + key
+        try:
+            value, ttl_ms = self.client.pipeline([('GET', name), ('PTTL', name)])
+            if isinstance(value, RedisError):
+                raise value
+        except (OSError, RedisError) as e:
+            self._failed('get', e)
+            self.misses += 1
+            return None
+        if value is None:
+            self.misses += 1
+            return None
+        value = self.deserialize(key, value)
+        if value is None:
+            return None
+        self.hits += 1
+        expires_at = time.time() + ttl_ms / 1000 if isinstance(ttl_ms, int) and ttl_ms >= 0 else None
+        return value, expires_at
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value.
+
+        Args:
+            key (str): The cache key
+            value: A JSON-serializable value
+            ttl (float): Seconds the entry stays valid (default: None, the cache TTL)
+
+        Returns:
+            float: The absolute expiry time of the entry, or None if it never expires
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self.expiry(ttl)
+        if (ttl is not None and ttl <= 0) or not self._available():
+            return expires_at
+        data = self.serialize(value)
+        if data is None:
+            return expires_at
+        command = ('SET', self.prefix + key, data)
+        if ttl is not None:
+            command += ('PX', max(int(ttl * 1000), 1))
+        try:
+            self.client.execute(*command)
+        except (OSError, RedisError) as e:
+            self._failed('set', e)
+        return expires_at
+
+    def delete(self, key):
+        """
+        Remove a key if it is present.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            bool: True if this call removed the key, False if it was missing or Redis is unavailable
+        """
+        if not self._available():
+            return False
+        try:
+            return self.client.execute('DEL', self.prefix + key) > 0
+        except (OSError, RedisError) as e:
+            self._failed('delete', e)
+            return False
+
+    def reopen(self):
+        """Drop pooled connections in a process forked after they were opened."""
+        self.client.reset()
+
+    def __len__(self):
+        """Number of keys in the Redis database, including keys other applications stored there."""
+        if not self._available():
+            return 0
+        try:
+            return self.client.execute('DBSIZE')
+        except (OSError, RedisError) as e:
+            self._failed('dbsize', e)
+            return 0
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Backend, server, size, hits, misses, expirations, values too large to store and errors
+        """
+        client = self.client
+        return {'backend': 'redis', 'server': f"{client.host}:{client.port}/{client.db}", **super().stats()}
@@ -0,0 +1,408 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from transport import env_flag
+
+load_dotenv()  # Load environment variables from .env file
+
+# Upstream statuses worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+# Seconds each route may spend on upstream calls. Streams cover a whole generation.
+# Routes not listed here (e.g. /batch, whose jobs run longer) have no deadline.
+DEFAULT_DEADLINES = {
+    '/parse': 30,
+    '/parse/stream': 60,
+    '/explain': 45,
+    '/explain/stream': 90,
+    '/apply': 60,
+    '/apply/stream': 120,
+    '/compare': 90,
+    '/compare/stream': 120,
+}
+
+CIRCUIT_OPEN_ERROR = "The language model service is temporarily unavailable, please try again shortly"
+DEADLINE_ERROR = "The request took too long and was stopped"
+
+
+class UpstreamError(Exception):
+    """Raised by an agent for a retryable HTTP status from the completions API."""
+
+    def __init__(self, status, body, retry_after=None):
+        """
+        Initialize the error.
+
+        Args:
+            status (int): HTTP status code
+            body (str): Response body
+            retry_after (float): Seconds from the Retry-After header, if any
+        """
+        super().__init__(f"HTTP {status}: {body}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the current request has no time left for another upstream call."""
+
+
+# Absolute time.monotonic() deadline of the request being handled, or None for no deadline.
+# Worker threads that run with a copy of the request's context (fan-out, hedging) inherit it.
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+def endpoint_deadline(endpoint):
+    """
+    Return the time budget of a route.
+
+    REQUEST_DEADLINE_<ROUTE> overrides the default for one route, with the route
+    upper-cased and slashes turned into underscores (e.g. REQUEST_DEADLINE_PARSE_STREAM).
+
+    Args:
+        endpoint (str): The route rule, e.g. "/parse"
+
+    Returns:
+        float: Seconds, or None if the route has no deadline
+    """
+    name = endpoint.strip('/').replace('/', '_').upper()
+    value = os.getenv(f'REQUEST_DEADLINE_{name}') if name else None
+    if value is not None:
+        return float(value) if float(value) > 0 else None
+    return DEFAULT_DEADLINES.get(endpoint)
+
+
+def set_deadline(seconds):
+    """
+    Start the deadline of the current context.
+
+    Args:
+        seconds (float): Time budget from now, or None for no deadline
+
+    Returns:
+        contextvars.Token: Token to pass to reset_deadline
+    """
+    return _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+
+
+def reset_deadline(token):
+    """
+    Restore the deadline that was active before set_deadline.
+
+    Args:
+        token (contextvars.Token): Token returned by set_deadline
+    """
+    _deadline.reset(token)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Run the block under a deadline.
+
+    Args:
+        seconds (float): Time budget from now, or None for no deadline
+    """
+    token = set_deadline(seconds)
+    try:
+        yield
+    finally:
+        reset_deadline(token)
+
+
+def remaining():
+    """
+    Return the time left before the current deadline.
+
+    Returns:
+        float: Seconds (zero or negative once it has passed), or None without a deadline
+    """
+    current = _deadline.get()
+    return current - time.monotonic() if current is not None else None
+
+
+def check_deadline():
+    """
+    Raise DeadlineExceeded if the current deadline has passed.
+
+    Raises:
+        DeadlineExceeded: If no time is left
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(DEADLINE_ERROR)
+
+
+class Timeouts:
+    """
+    Connect and read timeouts for upstream calls, shortened to fit the current deadline.
+    """
+
+    def __init__(self, connect=None, read=None):
+        """
+        Initialize the timeouts.
+
+        Args:
+            connect (float): Seconds to establish a connection (env LLM_CONNECT_TIMEOUT, default: 5)
+            read (float): Seconds to wait for response data (env LLM_READ_TIMEOUT, default: 60)
+        """
+        if connect is None:
+            connect = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+        if read is None:
+            read = float(os.getenv('LLM_READ_TIMEOUT', '60'))
+        self.connect = connect
+        self.read = read
+
+    def current(self):
+        """
+        Return the timeouts for a call made now.
+
+        Returns:
+            tuple: (connect, read) in seconds, neither longer than the time left
+        """
+        left = remaining()
+        if left is None:
+            return self.connect, self.read
+        left = max(left, 0.001)  # Callers check the deadline first; never pass a zero timeout
+        return min(self.connect, left), min(self.read, left)
+
+
+class RetryPolicy:
+    """
+    Bounded retries with exponential backoff and full jitter.
+
+    The wait before retry n is a random time between zero and min(cap, base * 2**(n-1)),
+    so clients that failed together do not retry together. A Retry-After header from
+    the API is honored when it asks for a longer wait. No retry is made if the wait
+    would not fit in the time left before the deadline.
+    """
+
+    def __init__(self, max_attempts=None, base=None, cap=None):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts (int): Attempts per call, including the first (env LLM_MAX_ATTEMPTS, default: 3)
+            base (float): Backoff of the first retry in seconds (env LLM_RETRY_BASE, default: 0.25)
+            cap (float): Longest backoff in seconds (env LLM_RETRY_CAP, default: 4)
+        """
+        if max_attempts is None:
+            max_attempts = int(os.getenv('LLM_MAX_ATTEMPTS', '3'))
+        if base is None:
+            base = float(os.getenv('LLM_RETRY_BASE', '0.25'))
+        if cap is None:
+            cap = float(os.getenv('LLM_RETRY_CAP', '4'))
+        self.max_attempts = max(1, max_attempts)
+        self.base = base
+        self.cap = cap
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Return how long to wait before retrying, or None if the call should not be retried.
+
+        Args:
+            attempt (int): Number of the attempt that just failed, starting at 1
+            retry_after (float): Wait requested by the API, if any
+
+        Returns:
+            float: Seconds to sleep, or None to give up
+        """
+        if attempt >= self.max_attempts:
+            return None
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        left = remaining()
+        if left is not None and delay >= left:
+            return None
+        return delay
+
+
+def parse_retry_after(value):
+    """
+    Read a Retry-After header given in seconds.
+
+    Args:
+        value (str): The header value, or None
+
+    Returns:
+        float: Seconds, or None if missing or given as an HTTP date
+    """
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """
+    Stops calling the completions API while most recent calls to it are failing.
+
+    Outcomes of the calls made in the last `window` seconds are kept. Once at least
+    `min_calls` were made and the share of failures (retryable statuses, timeouts and
+    connection errors) reaches `threshold`, the circuit opens and calls are rejected
+    straight away instead of tying up a worker until they time out. After `cooldown`
+    seconds the circuit is half-open: one probe call is let through, and its outcome
+    closes the circuit again or re-opens it for another cooldown.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=None, min_calls=None, window=None, cooldown=None):
+        """
+        Initialize the breaker.
+
+        Args:
+            threshold (float): Failure rate that opens the circuit (env LLM_BREAKER_THRESHOLD, default: 0.5)
+            min_calls (int): Calls in the window before the rate is trusted (env LLM_BREAKER_MIN_CALLS, default: 10)
+            window (float): Seconds of outcomes considered (env LLM_BREAKER_WINDOW, default: 30)
+            cooldown (float): Seconds the circuit stays open (env LLM_BREAKER_COOLDOWN, default: 15)
+        """
+        if threshold is None:
+            threshold = float(os.getenv('LLM_BREAKER_THRESHOLD', '0.5'))
+        if min_calls is None:
+            min_calls = int(os.getenv('LLM_BREAKER_MIN_CALLS', '10'))
+        if window is None:
+            window = float(os.getenv('LLM_BREAKER_WINDOW', '30'))
+        if cooldown is None:
+            cooldown = float(os.getenv('LLM_BREAKER_COOLDOWN', '15'))
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (time, failed) of recent calls
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.state = self.CLOSED
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _trim(self, now):
+        """Forget outcomes older than the window."""
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def allow(self):
+        """
+        Check whether a call may be made now.
+
+        Returns:
+            bool: False if the circuit is open (the rejection is counted)
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def is_open(self):
+        """
+        Check whether calls are currently being rejected, without claiming a probe.
+
+        Returns:
+            bool: True while the circuit is open and cooling down
+        """
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self._opened_at < self.cooldown
+
+    def record(self, failed):
+        """
+        Record the outcome of a call that allow() let through.
+
+        Args:
+            failed (bool): Whether the call failed in a way that points at the API
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                return
+
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            self._trim(now)
+            if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and self._failures / len(self._outcomes) >= self.threshold):
+                self._open(now)
+
+    def release(self):
+        """
+        Give back a call that allow() let through but that ended without an outcome.
+
+        A call cancelled by its client, or one that failed for a reason that says nothing
+        about the API (a malformed response, a bug), must still free the half-open probe,
+        or the circuit would stay half-open and reject every call from then on.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def _open(self, now):
+        """Open the circuit for one cooldown."""
+        self.state = self.OPEN
+        self._opened_at = now
+        self.times_opened += 1
+
+    def stats(self):
+        """
+        Report the breaker state and counters.
+
+        Returns:
+            dict: State, failure rate over the window, times opened and calls rejected
+        """
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'window_calls': calls,
+                'failure_rate': self._failures / calls if calls else 0.0,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+            }
+
+
+_shared_breaker = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_breaker():
+    """
+    Return the process-wide circuit breaker for the completions API.
+
+    All agents call the same API, so they share one breaker: an incident seen by one
+    agent stops the others from queueing up behind it too.
+
+    Returns:
+        CircuitBreaker: The shared breaker, or None if LLM_CIRCUIT_BREAKER is turned off
+    """
+    global _shared_breaker
+    if not env_flag('LLM_CIRCUIT_BREAKER', True):
+        return None
+    with _shared_lock:
+        if _shared_breaker is None:
+            _shared_breaker = CircuitBreaker()
+        return _shared_breaker
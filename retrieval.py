@@ -0,0 +1,248 @@
+import os
+import threading
+from collections import Counter
+import numpy as np
+from dotenv import load_dotenv
+from catalog import SUGGESTION_FIELDS
+from vectors import HashingVectorizer, tokenize
+
+load_dotenv()  # Load environment variables from .env file
+
+# Suffixes stripped by stem(), longest first
+SUFFIXES = ('ing', 'ies', 'ed', 'es', 's')
+
+
+def stem(word):
+    """
+    Strip a common inflection so "deadlines" matches "deadline" and "failing" matches "fail".
+
+    Deliberately crude: it only has to map a situation and a catalog entry onto the
+    same terms, not produce real word stems.
+
+    Args:
+        word (str): A lowercase token
+
+    Returns:
+        str: The token without its inflection
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + ('y' if suffix == 'ies' else '')
+    return word
+
+
+class FrameworkRetriever:
+    """
+    Local search over the framework catalog for the /parse fast path.
+
+    Every catalog entry with a description is split into short passages (name and
+    aliases, description, strengths, each example and each keyword phrase), and each
+    passage becomes one TF-IDF row of a NumPy matrix. A situation is scored against
+    all passages with a single matrix-vector product, and a framework scores as well
+    as its best passage. The best frameworks are returned in the same shape the
+    suggester agent produces; when the match is weak or ambiguous the retriever
+    declines and the caller falls back to the LLM.
+
+    The catalog is small and fixed, so terms map to columns through an explicit
+    vocabulary rather than the hashing trick, which would let unrelated words collide
+    with short passages. Terms of the situation that the catalog never uses still
+    count towards its vector length, so a situation that is mostly about something
+    else scores low. The index is rebuilt lazily whenever the catalog's revision
+    changes, so warm-ups and refreshes are picked up without a restart.
+    """
+
+    def __init__(self, catalog, min_score=None, min_margin=None):
+        """
+        Initialize the retriever.
+
+        Situations that clearly describe one framework score 0.4 and more against the
+        built-in catalog, while open-ended situations and unrelated questions stay below
+        0.3, so the defaults only answer the former locally.
+
+        Args:
+            catalog (FrameworkCatalog): The catalog to search
+            min_score (float): Cosine similarity every returned framework must reach
+                               (env PARSE_RETRIEVAL_MIN_SCORE, default: 0.35)
+            min_margin (float): Lead the last returned framework must have over the best one
+                                left out (env PARSE_RETRIEVAL_MIN_MARGIN, default: 0.15)
+        """
+        if min_score is None:
+            min_score = float(os.getenv('PARSE_RETRIEVAL_MIN_SCORE', '0.35'))
+        if min_margin is None:
+            min_margin = float(os.getenv('PARSE_RETRIEVAL_MIN_MARGIN', '0.15'))
+        self.catalog = catalog
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.vectorizer = HashingVectorizer()  # Only used for its n-gram extraction
+        self._lock = threading.Lock()
+        self._revision = None
+        self._index = None
+
+        self.lookups = 0
+        self.hits = 0
+
+    @staticmethod
+    def passages(entry):
+        """
+        Split a catalog entry into the passages that are indexed for it.
+
+        Args:
+            entry (dict): The catalog entry
+
+        Returns:
+            list: Name and aliases, description, strengths, examples and keywords
+        """
+        passages = [' '.join([entry['name']] + entry.get('aliases', []))]
+        passages += [entry.get('description', ''), entry.get('strengths', '')]
+        return passages + entry.get('examples', []) + entry.get('keywords', [])
+
+    def terms(self, text):
+        """
+        Extract the stemmed unigrams and bigrams of a text.
+
+        Args:
+            text (str): The text to process
+
+        Returns:
+            list: The terms in order
+        """
+        return self.vectorizer.features(' '.join(stem(word) for word in tokenize(text)))
+
+    def _build(self):
+        """Build the passage matrix for the catalog as it is now."""
+        entries = [entry for entry in self.catalog.entries() if entry.get('description')]
+        passages = []
+        owners = []
+        vocabulary = {}
+        for i, entry in enumerate(entries):
+            for passage in self.passages(entry):
+                terms = Counter(self.terms(passage))
+                if terms:
+                    for term in terms:
+                        vocabulary.setdefault(term, len(vocabulary))
+                    passages.append(terms)
+                    owners.append(i)
+
+        tf = np.zeros((len(passages), len(vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(passages):
+            for term, count in terms.items():
+                tf[row, vocabulary[term]] = 1.0 + np.log(count)
+        doc_freq = (tf > 0).sum(axis=0)
+        idf = (np.log((1.0 + len(passages)) / (1.0 + doc_freq)) + 1.0).astype(np.float32)
+
+        matrix = tf * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return {
+            'entries': entries,
+            'owners': np.array(owners, dtype=np.intp),
+            'vocabulary': vocabulary,
+            'idf': idf,
+            'unknown_idf': float(np.log(1.0 + len(passages)) + 1.0),  # IDF of a term no passage has
+            'matrix': matrix / norms,
+        }
+
+    def _current_index(self):
+        """Return the index, rebuilding it first if the catalog changed."""
+        self.catalog.reload_if_changed()
+        with self._lock:
+            if self._revision != self.catalog.revision:
+                revision = self.catalog.revision
+                self._index = self._build()
+                self._revision = revision
+            return self._index
+
+    def search(self, text, k):
+        """
+        Rank catalog frameworks by similarity to a situation.
+
+        Args:
+            text (str): The user's description of their situation
+            k (int): Number of frameworks to return
+
+        Returns:
+            list: Up to k (entry, score) tuples, best first
+        """
+        index = self._current_index()
+        entries = index['entries']
+        if not entries or k <= 0:
+            return []
+
+        query = np.zeros(len(index['vocabulary']), dtype=np.float32)
+        unknown = 0.0
+        for term, count in Counter(self.terms(text)).items():
+            weight = 1.0 + np.log(count)
+            column = index['vocabulary'].get(term)
+            if column is None:
+                unknown += (weight * index['unknown_idf']) ** 2
+            else:
+                query[column] = weight
+        query *= index['idf']
+        norm = np.sqrt(float(query @ query) + unknown)
+        if norm == 0:
+            return []
+
+        scores = np.zeros(len(entries), dtype=np.float32)
+        np.maximum.at(scores, index['owners'], index['matrix'] @ (query / norm))
+        k = min(k, len(entries))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(entries[i], float(scores[i])) for i in top]
+
+    def suggest(self, text, num_frameworks, min_score=None, min_margin=None):
+        """
+        Suggest frameworks from the catalog if the match is confident enough.
+
+        A match is confident when every returned framework reaches min_score and the
+        last of them leads the best framework left out by at least min_margin, so a
+        situation several frameworks fit about equally well goes to the LLM.
+
+        Args:
+            text (str): The user's description of their situation
+            num_frameworks (int): Number of frameworks wanted
+            min_score (float): Threshold for this call (default: the retriever's min_score)
+            min_margin (float): Margin for this call (default: the retriever's min_margin)
+
+        Returns:
+            list: num_frameworks objects with 'name', 'description' and 'strengths',
+                  or None if the match is not confident
+        """
+        if min_score is None:
+            min_score = self.min_score
+        if min_margin is None:
+            min_margin = self.min_margin
+        results = self.search(text, num_frameworks + 1) if text and num_frameworks > 0 else []
+        confident = len(results) >= num_frameworks > 0 and all(score >= min_score for _, score in results[:num_frameworks])
+        if confident and len(results) > num_frameworks:
+            confident = results[num_frameworks - 1][1] - results[num_frameworks][1] >= min_margin
+        results = results[:num_frameworks]
+        with self._lock:
+            self.lookups += 1
+            if confident:
+                self.hits += 1
+        if not confident:
+            return None
+
+        suggestions = []
+        for entry, _ in results:
+            suggestion = {'name': entry['name']}
+            suggestion.update({field: entry.get(field, '') for field in SUGGESTION_FIELDS})
+            suggestions.append(suggestion)
+        return suggestions
+
+    def stats(self):
+        """
+        Report retrieval counters.
+
+        Returns:
+            dict: Indexed frameworks, thresholds, lookups, hits, fallbacks and hit rate
+        """
+        return {
+            'indexed': len(self._index['entries']) if self._index else 0,
+            'min_score': self.min_score,
+            'min_margin': self.min_margin,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'fallbacks': self.lookups - self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+        }
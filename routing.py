@@ -0,0 +1,267 @@
+import os
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+from transport import env_flag
+from hedging import LatencyTracker
+import metrics
+import logs
+
+load_dotenv()  # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+# Model tiers, fastest first. LLM_TIER_<NAME> overrides the model of a tier.
+DEFAULT_TIERS = {
+    'fast': 'gpt-4o-mini',
+    'large': 'gpt-4o',
+}
+
+# Tier each kind of call is sent to, and the latency SLO in seconds that triggers a
+# fallback to a faster tier (None for no fallback). Short, structured answers go to the
+# fast tier; only the calls that weigh several frameworks against each other get the
+# larger model.
+DEFAULT_ROUTES = {
+    'parse': ('fast', None),
+    'explain': ('fast', None),
+    'apply': ('fast', None),
+    'compare': ('large', 20),
+    'compare_evaluate': ('fast', None),
+    'compare_synthesis': ('large', 10),
+}
+
+
+def tier_model(tier):
+    """
+    Return the model of a tier.
+
+    Args:
+        tier (str): A tier name such as "fast", or a model name to use as-is
+
+    Returns:
+        str: The model name
+    """
+    if tier in DEFAULT_TIERS:
+        return os.getenv(f'LLM_TIER_{tier.upper()}', DEFAULT_TIERS[tier])
+    return tier
+
+
+class Route:
+    """
+    How the model of one kind of call is picked.
+
+    Settings are read from the environment, with the route name upper-cased
+    (e.g. LLM_ROUTE_COMPARE_SYNTHESIS):
+
+    - LLM_ROUTE_<NAME>: tier (or model name) the route normally uses
+    - LLM_ROUTE_<NAME>_LONG_CHARS / LLM_ROUTE_<NAME>_LONG_TIER: prompts longer than this
+      many characters go to the long tier instead (default: off / "large")
+    - LLM_SLO_<NAME>: latency objective in seconds; 0 turns the fallback off
+    - LLM_SLO_FALLBACK_<NAME>: tier used while the SLO is breached (default: "fast")
+    """
+
+    def __init__(self, name):
+        """
+        Initialize the route from its defaults and the environment.
+
+        Args:
+            name (str): Route name, e.g. "parse" or "compare_synthesis"
+        """
+        tier, slo = DEFAULT_ROUTES.get(name, ('fast', None))
+        key = name.upper()
+        self.name = name
+        self.tier = os.getenv(f'LLM_ROUTE_{key}', tier)
+        self.long_chars = int(os.getenv(f'LLM_ROUTE_{key}_LONG_CHARS', '0')) or None
+        self.long_tier = os.getenv(f'LLM_ROUTE_{key}_LONG_TIER', 'large')
+        value = os.getenv(f'LLM_SLO_{key}')
+        if value is not None:
+            slo = float(value) if float(value) > 0 else None
+        self.slo = slo
+        self.fallback_tier = os.getenv(f'LLM_SLO_FALLBACK_{key}', 'fast')
+
+
+class ModelRouter:
+    """
+    Picks the model for each LLM call from the kind of call, the prompt size and observed latency.
+
+    Every call belongs to a route (see DEFAULT_ROUTES). The route names a tier, and a
+    tier names a model, so moving a whole class of calls to another model is a one-line
+    setting. Prompts above a route's long-input threshold can be sent to another tier.
+
+    Routes with a latency SLO keep a window of their recent successful call latencies per
+    model. Once the configured percentile of that window exceeds the SLO, the route falls
+    back to its faster fallback tier for `cooldown` seconds. The window is then started
+    afresh, so the primary model gets back its traffic only while it meets the SLO again.
+    """
+
+    def __init__(self, percentile=None, min_samples=None, window=None, cooldown=None):
+        """
+        Initialize the router.
+
+        Args:
+            percentile (float): Latency percentile compared with the SLO (env LLM_SLO_PERCENTILE, default: 95)
+            min_samples (int): Latencies observed before the SLO is checked (env LLM_SLO_MIN_SAMPLES, default: 20)
+            window (int): Recent latencies the percentile is computed over (env LLM_SLO_WINDOW, default: 200)
+            cooldown (float): Seconds a route stays on its fallback tier (env LLM_SLO_COOLDOWN, default: 60)
+        """
+        if percentile is None:
+            percentile = float(os.getenv('LLM_SLO_PERCENTILE', '95'))
+        if min_samples is None:
+            min_samples = int(os.getenv('LLM_SLO_MIN_SAMPLES', '20'))
+        if window is None:
+            window = int(os.getenv('LLM_SLO_WINDOW', '200'))
+        if cooldown is None:
+            cooldown = float(os.getenv('LLM_SLO_COOLDOWN', '60'))
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._latencies = {}  # (route, model) -> LatencyTracker
+        self._degraded_until = {}  # (route, model) -> time.monotonic() the fallback ends
+        self._counts = {}  # (route, reason) -> calls
+
+    def route(self, name):
+        """
+        Return the settings of a route, reading them on first use.
+
+        Args:
+            name (str): Route name
+
+        Returns:
+            Route: The route
+        """
+        with self._lock:
+            if name not in self._routes:
+                self._routes[name] = Route(name)
+            return self._routes[name]
+
+    def primary_model(self, name):
+        """
+        Return the model a route uses when its prompt is short and its SLO is met.
+
+        Args:
+            name (str): Route name
+
+        Returns:
+            str: The model name
+        """
+        return tier_model(self.route(name).tier)
+
+    def choose(self, name, input_chars=0):
+        """
+        Pick the model for one call.
+
+        Args:
+            name (str): Route name
+            input_chars (int): Characters in the call's messages (default: 0)
+
+        Returns:
+            str: The model to send the call to
+        """
+        route = self.route(name)
+        model, reason = tier_model(route.tier), 'primary'
+        if route.long_chars and input_chars > route.long_chars:
+            model, reason = tier_model(route.long_tier), 'long_input'
+        if self.is_degraded(name, model):
+            model, reason = tier_model(route.fallback_tier), 'slo_fallback'
+        with self._lock:
+            self._counts[(name, reason)] = self._counts.get((name, reason), 0) + 1
+        metrics.count_route(model, name, reason)
+        return model
+
+    def is_degraded(self, name, model):
+        """
+        Check whether a route is currently avoiding a model because it breached the SLO.
+
+        Args:
+            name (str): Route name
+            model (str): The model
+
+        Returns:
+            bool: True during the cooldown after a breach
+        """
+        with self._lock:
+            until = self._degraded_until.get((name, model))
+            return until is not None and time.monotonic() < until
+
+    def observe(self, name, model, seconds):
+        """
+        Record the latency of a successful call and fall back if the route breaches its SLO.
+
+        Args:
+            name (str): Route name
+            model (str): Model the call was sent to
+            seconds (float): Time the call took
+        """
+        route = self.route(name)
+        if route.slo is None or model == tier_model(route.fallback_tier):
+            return
+        with self._lock:
+            tracker = self._latencies.setdefault((name, model), LatencyTracker(self.window))
+        tracker.observe(seconds)
+        if len(tracker) < self.min_samples:
+            return
+        observed = tracker.percentile(self.percentile)
+        if observed <= route.slo:
+            return
+        with self._lock:
+            if self._latencies.get((name, model)) is not tracker:
+                return  # Another thread already reacted to this breach
+            self._latencies[(name, model)] = LatencyTracker(self.window)
+            self._degraded_until[(name, model)] = time.monotonic() + self.cooldown
+        logs.log_event(logger, logging.WARNING, "llm.slo_fallback", route=name, model=model,
+                       fallback=tier_model(route.fallback_tier), observed_ms=round(observed * 1000, 1),
+                       slo_ms=round(route.slo * 1000, 1), cooldown_s=self.cooldown)
+
+    def stats(self):
+        """
+        Report the model, SLO state and call counts of every route used so far.
+
+        Returns:
+            dict: Per route: primary model, SLO, recent percentile, whether it is falling
+                  back, and calls by reason ("primary", "long_input", "slo_fallback")
+        """
+        with self._lock:
+            routes = dict(self._routes)
+            counts = dict(self._counts)
+            latencies = dict(self._latencies)
+        report = {}
+        for name, route in routes.items():
+            model = tier_model(route.tier)
+            tracker = latencies.get((name, model))
+            observed = tracker.percentile(self.percentile) if tracker is not None else None
+            report[name] = {
+                'model': model,
+                'slo_ms': round(route.slo * 1000, 1) if route.slo is not None else None,
+                f'p{self.percentile:g}_ms': round(observed * 1000, 1) if observed is not None else None,
+                'falling_back': self.is_degraded(name, model),
+                'calls': {reason: count for (route_name, reason), count in counts.items() if route_name == name},
+            }
+        return report
+
+
+_shared_router = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_router():
+    """
+    Return the process-wide model router.
+
+    Agents share one router so every agent serving a route sees the same latency
+    window and falls back together.
+
+    Returns:
+        ModelRouter: The shared router, or None if LLM_ROUTING is turned off
+    """
+    global _shared_router
+    if not env_flag('LLM_ROUTING', True):
+        return None
+    with _shared_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter()
+        return _shared_router
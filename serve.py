@@ -0,0 +1,187 @@
+"""
+Production server for the framework agents.
+
+Runs app.py (Flask, on threaded workers) or async_app.py (aiohttp, on event-loop
+workers) under gunicorn's preforking master. The app is imported once in the master,
+so agents, caches, the catalog and the retrieval index are built before the workers
+are forked and shared copy-on-write. Each worker then opens its own upstream
+connections, shared cache connections and log writer.
+
+On SIGTERM every worker starts draining: /readyz answers 503 so the load balancer
+stops sending traffic, new requests are still served for SERVE_DRAIN_DELAY seconds
+while it notices, and the worker exits once its in-flight requests and LLM calls have
+finished, or SERVE_GRACEFUL_TIMEOUT runs out.
+
+Usage:
+    python serve.py --workers 4 --threads 16
+    python serve.py --app async --bind 0.0.0.0:5001
+"""
+import os
+import gc
+import signal
+import shutil
+import tempfile
+import argparse
+import threading
+import importlib
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+
+load_dotenv()  # Load environment variables from .env file
+
+# Module serving each --app choice
+APP_MODULES = {
+    'flask': 'app',
+    'async': 'async_app',
+}
+
+_module = None  # The imported app module, for the worker hooks
+
+
+def when_ready(server):
+    """Freeze the objects built during preload so the workers' garbage collector leaves their pages shared."""
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Give the new worker its own connections and log writer, then start its background work."""
+    _module.reset_after_fork()
+    # Only the first worker of the server refreshes the catalog; the rest reload the file once it is saved
+    _module.start_process_services(refresh_catalog=worker.age == 1)
+
+
+def post_worker_init(worker):
+    """Replace the worker's SIGTERM handler with one that drains before exiting."""
+    delay = float(os.getenv('SERVE_DRAIN_DELAY', '5'))
+    lifecycle = _module.lifecycle
+
+    if hasattr(worker, 'loop'):
+        # aiohttp workers handle signals on their event loop
+        def drain():
+            lifecycle.start_draining()
+            worker.loop.call_later(delay, worker.handle_exit, signal.SIGTERM, None)
+
+        worker.loop.add_signal_handler(signal.SIGTERM, drain)
+    else:
+        def drain(sig, frame):
+            lifecycle.start_draining()
+            timer = threading.Timer(delay, worker.handle_exit, (sig, frame))
+            timer.daemon = True
+            timer.start()
+
+        signal.signal(signal.SIGTERM, drain)
+
+
+def worker_exit(server, worker):
+    """Wait for requests still in flight, then write out the worker's queued logs."""
+    if not _module.lifecycle.wait_idle(worker.cfg.graceful_timeout):
+        server.log.warning("Worker %s exiting with %s requests in flight", worker.pid, _module.lifecycle.in_flight)
+    _module.logs.shutdown_logging()
+
+
+def child_exit(server, worker):
+    """Drop the metric samples of a worker that exited, so gauges do not count it any more."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+class FrameworkServer(BaseApplication):
+    """Gunicorn application that preloads one of the app modules."""
+
+    def __init__(self, app_name, options):
+        """
+        Initialize the server.
+
+        Args:
+            app_name (str): "flask" or "async", see APP_MODULES
+            options (dict): Gunicorn settings
+        """
+        self.app_name = app_name
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        """Apply the settings to gunicorn's configuration."""
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        """
+        Import the app module. With preload_app this runs once, in the master.
+
+        Returns:
+            The WSGI callable, or the aiohttp application
+        """
+        global _module
+        _module = importlib.import_module(APP_MODULES[self.app_name])
+        if self.app_name == 'async':
+            return _module.create_app()
+        return _module.app
+
+
+def prepare_metrics_dir():
+    """
+    Point prometheus_client at an empty directory shared by all workers.
+
+    This has to happen before the app (and with it prometheus_client) is imported.
+    A directory left over from an earlier run is emptied, since its samples would
+    otherwise be added to the new server's.
+    """
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='framework-metrics-')
+        return
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def build_options(args):
+    """
+    Turn the command line into gunicorn settings.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        dict: Gunicorn settings
+    """
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+        'child_exit': child_exit,
+    }
+    if args.app == 'async':
+        options['worker_class'] = 'aiohttp.GunicornWebWorker'
+    else:
+        options['worker_class'] = 'gthread'
+        options['threads'] = args.threads
+    return options
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the framework agents on a preforking production server.")
+    parser.add_argument('--app', choices=sorted(APP_MODULES), default=os.getenv('SERVE_APP', 'flask'))
+    parser.add_argument('--bind', default=os.getenv('SERVE_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}"))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.getenv('WEB_CONCURRENCY', os.getenv('SERVE_WORKERS', str(os.cpu_count() or 2)))))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVE_THREADS', '16')),
+                        help="Request threads per worker (flask only)")
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('SERVE_TIMEOUT', '30')),
+                        help="Seconds a silent worker is given before the master restarts it")
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.getenv('SERVE_GRACEFUL_TIMEOUT', '130')),
+                        help="Seconds workers get to drain on shutdown; covers the longest request deadline")
+    parser.add_argument('--keepalive', type=int, default=int(os.getenv('SERVE_KEEPALIVE', '5')))
+    args = parser.parse_args()
+
+    os.environ['SERVE_PRELOAD'] = 'true'  # Workers start their background work after the fork
+    prepare_metrics_dir()
+    FrameworkServer(args.app, build_options(args)).run()
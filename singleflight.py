@@ -0,0 +1,281 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from dotenv import load_dotenv
+from transport import env_flag
+from resilience import remaining, DEADLINE_ERROR
+
+load_dotenv()  # Load environment variables from .env file
+
+
+def request_key(data):
+    """
+    Build the single-flight key of a completions request body.
+
+    Two requests share a key only if the model, the exact message list and every other
+    generation parameter are identical, so they would get interchangeable answers.
+
+    Args:
+        data (dict): The JSON body of the request
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical JSON encoding of the body
+    """
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """An in-flight call that followers can wait on."""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls made from different threads.
+
+    The first caller for a key (the leader) runs the function; callers that arrive
+    with the same key while it is running (followers) wait for it and share its
+    result or exception. A follower that waits longer than the timeout stops waiting
+    and runs the function itself, so a stuck leader never holds up more than one call.
+    A follower never waits past its own request's deadline: if that is what runs out,
+    it gets the deadline error instead of starting a call it has no time left for.
+    Followers also run it themselves when the leader's result is one only the leader
+    should get, such as an error caused by the leader's own deadline (see do).
+    """
+
+    def __init__(self, timeout=None):
+        """
+        Initialize the group.
+
+        Args:
+            timeout (float): Seconds a follower waits for the leader
+                             (env LLM_SINGLE_FLIGHT_TIMEOUT, default: 30)
+        """
+        if timeout is None:
+            timeout = float(os.getenv('LLM_SINGLE_FLIGHT_TIMEOUT', '30'))
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.unshared = 0
+
+    def do(self, key, fn, shareable=None):
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key (str): Identity of the call, e.g. from request_key
+            fn (callable): Function taking no arguments that performs the call
+            shareable (callable): Takes the leader's value and returns False if followers must
+                                  run fn themselves instead (default: None, share every value)
+
+        Returns:
+            tuple: (value, shared) where shared is True if the value came from another caller's call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+
+        if leader:
+            try:
+                call.value = fn()
+                return call.value, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(_follower_timeout(self.timeout)):
+            with self._lock:
+                self.timeouts += 1
+            if _deadline_passed():
+                return {"error": DEADLINE_ERROR}, False
+            return fn(), False
+
+        if call.error is None and shareable is not None and not shareable(call.value):
+            with self._lock:
+                self.unshared += 1
+            return fn(), False
+
+        with self._lock:
+            self.coalesced += 1
+        if call.error is not None:
+            raise call.error
+        return call.value, True
+
+    def stats(self):
+        """
+        Report coalescing counters.
+
+        Returns:
+            dict: Leader calls, coalesced followers, follower timeouts, followers that did not
+                  get the leader's value and calls in flight
+        """
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'unshared': self.unshared,
+                'in_flight': len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent identical calls made from coroutines on one event loop.
+
+    Same contract as SingleFlight. Followers wait on a shielded future, so a follower
+    being cancelled never cancels the leader's call. If the leader itself is cancelled
+    (e.g. its client disconnected), its followers make their own calls instead of
+    failing with it.
+    """
+
+    def __init__(self, timeout=None):
+        """
+        Initialize the group.
+
+        Args:
+            timeout (float): Seconds a follower waits for the leader
+                             (env LLM_SINGLE_FLIGHT_TIMEOUT, default: 30)
+        """
+        if timeout is None:
+            timeout = float(os.getenv('LLM_SINGLE_FLIGHT_TIMEOUT', '30'))
+        self.timeout = timeout
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.unshared = 0
+
+    async def do(self, key, fn, shareable=None):
+        """
+        Await fn() once for all concurrent callers with the same key.
+
+        Args:
+            key (str): Identity of the call, e.g. from request_key
+            fn (callable): Coroutine function taking no arguments that performs the call
+            shareable (callable): Takes the leader's value and returns False if followers must
+                                  run fn themselves instead (default: None, share every value)
+
+        Returns:
+            tuple: (value, shared) where shared is True if the value came from another caller's call
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.get_running_loop().create_future()
+            self.leaders += 1
+            try:
+                value = await fn()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # Mark as retrieved when nobody was waiting
+                raise
+            else:
+                future.set_result(value)
+                return value, False
+            finally:
+                del self._calls[key]
+
+        try:
+            value = await asyncio.wait_for(asyncio.shield(future), _follower_timeout(self.timeout))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if _deadline_passed():
+                return {"error": DEADLINE_ERROR}, False
+            return await fn(), False
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise  # This follower was cancelled, not the leader
+            return await fn(), False
+
+        if shareable is not None and not shareable(value):
+            self.unshared += 1
+            return await fn(), False
+        self.coalesced += 1
+        return value, True
+
+    def stats(self):
+        """
+        Report coalescing counters.
+
+        Returns:
+            dict: Leader calls, coalesced followers, follower timeouts, followers that did not
+                  get the leader's value and calls in flight
+        """
+        return {
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'timeouts': self.timeouts,
+            'unshared': self.unshared,
+            'in_flight': len(self._calls),
+        }
+
+
+def _follower_timeout(timeout):
+    """Cap a follower's wait for the leader at the time left before the current deadline."""
+    left = remaining()
+    return timeout if left is None else max(min(timeout, left), 0)
+
+
+def _deadline_passed():
+    """Check whether the current request's deadline has passed."""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+_shared_single_flight = None
+_shared_async_single_flight = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_single_flight():
+    """
+    Return the process-wide single-flight group used by the threaded agents.
+
+    Returns:
+        SingleFlight: The shared group, or None if LLM_SINGLE_FLIGHT is turned off
+    """
+    global _shared_single_flight
+    if not env_flag('LLM_SINGLE_FLIGHT', True):
+        return None
+    with _shared_lock:
+        if _shared_single_flight is None:
+            _shared_single_flight = SingleFlight()
+        return _shared_single_flight
+
+
+def get_shared_async_single_flight():
+    """
+    Return the process-wide single-flight group used by the async agents.
+
+    Returns:
+        AsyncSingleFlight: The shared group, or None if LLM_SINGLE_FLIGHT is turned off
+    """
+    global _shared_async_single_flight
+    if not env_flag('LLM_SINGLE_FLIGHT', True):
+        return None
+    with _shared_lock:
+        if _shared_async_single_flight is None:
+            _shared_async_single_flight = AsyncSingleFlight()
+        return _shared_async_single_flight
@@ -1,99 +1,443 @@
 import config from './config.js'; // Import the config file
 
+// Results of /explain, /apply and /compare are reused for a day; the server caches them as long
+const RESULT_TTL_MS = 24 * 60 * 60 * 1000;
+const MEMORY_CACHE_SIZE = 100;
+const RESULT_DB_NAME = 'framework-results';
+const RESULT_STORE_NAME = 'results';
+
+const memoryResults = new Map(); // Request key -> { result, storedAt }, oldest first
+const inFlightRequests = new Map(); // Request key -> shared request, see startSharedRequest
+let resultDbPromise = null;
+let activeParse = null; // { inputText, controller } of the /parse stream being shown
+
 /**
  * Main event listener for the submit button.
  * This function handles the initial user input and calls the framework suggester agent.
+ * Frameworks are streamed from the server and each card is rendered as soon as it arrives.
+ * Submitting the same situation again while it is still loading is ignored; submitting a
+ * new one cancels the previous stream and every request made from its results.
  */
 document.getElementById('submitBtn').addEventListener('click', async () => {
     const inputText = document.getElementById('inputText').value; // Get user input
     const resultDiv = document.getElementById('result');
+    const frameworks = [];
+
+    if (activeParse && activeParse.inputText === inputText) {
+        return; // Double click or re-submit of the situation that is still loading
+    }
+    if (activeParse) {
+        activeParse.controller.abort();
+    }
+    const parse = { inputText, controller: new AbortController() };
+    activeParse = parse;
 
-    // Clear previous results
+    // Cancel requests of the panels being cleared, then clear previous results
+    resultDiv.querySelectorAll('[data-panel]').forEach(panel => panel.requestController.abort());
     resultDiv.innerHTML = '<p>Loading...</p>';
 
+    // Add global functions for the buttons
+    window.explainFramework = explainFramework;
+    window.applyFramework = applyFramework;
+    window.compareFrameworks = compareFrameworks;
+    window.closePanel = closePanel;
+
     try {
-        // Call the framework suggester agent via the /parse endpoint
-        const response = await fetch('http://127.0.0.1:5000/parse', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
+        // Call the framework suggester agent via the streaming /parse endpoint
+        // Keep the commented mock data for reference
+        // response: JSON.stringify([
+        //     { name: "SWOT Analysis", description: "A framework for identifying strengths, weaknesses, opportunities, and threats.", strengths: "Helps in strategic planning." },
+        //     { name: "Decision Matrix", description: "A tool for evaluating and prioritizing options based on specific criteria.", strengths: "Provides a clear comparison." },
+        //     { name: "Cost-Benefit Analysis", description: "A method for comparing the costs and benefits of different choices.", strengths: "Helps in financial decision-making." }
+        // ]),
+        await postEventStream('http://127.0.0.1:5000/parse/stream', {
+            response: inputText,
+            num_frameworks: 3 // Show 3 frameworks by default
+        }, {
+            framework: (framework) => {
+                // Replace the loading message with the heading when the first framework arrives
+                if (frameworks.length === 0) {
+                    resultDiv.innerHTML = `<h2>Recommended Frameworks:</h2>`;
+                }
+                frameworks.push(framework);
+                resultDiv.insertAdjacentHTML('beforeend', renderFrameworkCard(framework, inputText));
             },
-            body: JSON.stringify({
-                // Keep the commented mock data for reference
-                // response: JSON.stringify([
-                //     { name: "SWOT Analysis", description: "A framework for identifying strengths, weaknesses, opportunities, and threats.", strengths: "Helps in strategic planning." },
-                //     { name: "Decision Matrix", description: "A tool for evaluating and prioritizing options based on specific criteria.", strengths: "Provides a clear comparison." },
-                //     { name: "Cost-Benefit Analysis", description: "A method for comparing the costs and benefits of different choices.", strengths: "Helps in financial decision-making." }
-                // ]),
-                response: inputText,
-                num_frameworks: 3 // Show 3 frameworks by default
-            }),
-        });
-
-        if (response.ok) {
-            const data = await response.json();
-            
-            // Validate JSON format
-            if (!validateJSON(JSON.stringify(data))) {
-                resultDiv.innerHTML = '<p>Error: Invalid JSON format received.</p>';
-                return;
-            }
-
-            resultDiv.innerHTML = `<h2>Recommended Frameworks:</h2>`;
-            data.forEach((framework, index) => {
-                // Check if strengths is an array and handle it appropriately
-                let strengthsHtml = '';
-                if (Array.isArray(framework.strengths)) {
-                    strengthsHtml = `
-                        <p><strong>Strengths:</strong></p>
-                        <ul>
-                            ${framework.strengths.map(strength => `<li>${strength}</li>`).join('')}
-                        </ul>
-                    `;
+            error: (errorData) => {
+                if (frameworks.length === 0) {
+                    resultDiv.innerHTML = `<p>Error: ${errorData.error}</p>`;
                 } else {
-                    strengthsHtml = `<p><strong>Strengths:</strong> ${framework.strengths}</p>`;
+                    resultDiv.insertAdjacentHTML('beforeend', `<p>Error: ${errorData.error}</p>`);
                 }
-                
-                resultDiv.innerHTML += `
-                    <div class="framework-card">
-                        <h3>${framework.name}</h3>
-                        <p>${framework.description}</p>
-                        ${strengthsHtml}
-                        <div class="framework-actions">
-                            <button onclick="explainFramework('${framework.name}')">Explain in Detail</button>
-                            <button onclick="applyFramework('${framework.name}', '${encodeURIComponent(inputText)}')">Apply to My Situation</button>
-                        </div>
-                    </div>
-                `;
-            });
-
-            // Add comparison button if more than one framework is returned
-            if (data.length > 1) {
-                const frameworkNames = data.map(f => f.name);
-                resultDiv.innerHTML += `
-                    <div class="comparison-section">
-                        <h3>Compare Frameworks</h3>
-                        <button onclick="compareFrameworks(${JSON.stringify(frameworkNames)}, '${encodeURIComponent(inputText)}')">
-                            Compare All Frameworks
-                        </button>
-                    </div>
-                `;
             }
+        }, parse.controller.signal);
 
-            // Add global functions for the buttons
-            window.explainFramework = explainFramework;
-            window.applyFramework = applyFramework;
-            window.compareFrameworks = compareFrameworks;
-        } else {
-            const errorData = await response.json();
-            resultDiv.innerHTML = `<p>Error: ${errorData.error}</p>`;
+        // Add comparison button if more than one framework is returned
+        if (frameworks.length > 1) {
+            const frameworkNames = frameworks.map(f => f.name);
+            resultDiv.insertAdjacentHTML('beforeend', `
+                <div class="comparison-section">
+                    <h3>Compare Frameworks</h3>
+                    <button onclick="compareFrameworks(${JSON.stringify(frameworkNames)}, '${encodeURIComponent(inputText)}')">
+                        Compare All Frameworks
+                    </button>
+                </div>
+            `);
         }
     } catch (error) {
+        if (error.name === 'AbortError') {
+            return; // Superseded by a newer submit, which owns the result area now
+        }
         console.error('Fetch error:', error);
         resultDiv.innerHTML = '<p>Error retrieving response. Please try again.</p>';
+    } finally {
+        if (activeParse === parse) {
+            activeParse = null;
+        }
     }
 });
 
+/**
+ * Function to render the card for one suggested framework.
+ *
+ * @param {Object} framework - Framework object with 'name', 'description' and 'strengths'
+ * @param {string} inputText - The user's description of their situation
+ * @returns {string} - The HTML for the card
+ */
+function renderFrameworkCard(framework, inputText) {
+    // Check if strengths is an array and handle it appropriately
+    let strengthsHtml = '';
+    if (Array.isArray(framework.strengths)) {
+        strengthsHtml = `
+            <p><strong>Strengths:</strong></p>
+            <ul>
+                ${framework.strengths.map(strength => `<li>${strength}</li>`).join('')}
+            </ul>
+        `;
+    } else {
+        strengthsHtml = `<p><strong>Strengths:</strong> ${framework.strengths}</p>`;
+    }
+
+    return `
+        <div class="framework-card">
+            <h3>${framework.name}</h3>
+            <p>${framework.description}</p>
+            ${strengthsHtml}
+            <div class="framework-actions">
+                <button onclick="explainFramework('${framework.name}')">Explain in Detail</button>
+                <button onclick="applyFramework('${framework.name}', '${encodeURIComponent(inputText)}')">Apply to My Situation</button>
+            </div>
+        </div>
+    `;
+}
+
+/**
+ * Function to POST a JSON body to a streaming endpoint and dispatch its Server-Sent Events.
+ * EventSource only supports GET, so the stream is read from fetch() and split into
+ * events by hand. Each event's JSON data is passed to the handler registered for its name.
+ * If the server rejects the request before streaming, the error handler receives its JSON body.
+ *
+ * Aborting the signal stops the request and rejects with an AbortError.
+ *
+ * @param {string} url - The streaming endpoint to call
+ * @param {Object} body - The request body, sent as JSON
+ * @param {Object} handlers - Map of event name ('framework', 'delta', 'result', 'error', ...) to callback
+ * @param {AbortSignal} [signal] - Signal that cancels the request
+ */
+async function postEventStream(url, body, handlers, signal) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(body),
+        signal: signal,
+    });
+
+    if (!response.ok) {
+        const errorData = await response.json();
+        if (handlers.error) {
+            handlers.error(errorData);
+        }
+        return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice('event:'.length).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice('data:'.length).trim();
+                }
+            });
+
+            if (handlers[eventName]) {
+                handlers[eventName](data ? JSON.parse(data) : {});
+            }
+        }
+    }
+}
+
+/**
+ * Function to build the cache key of a request from its endpoint and payload.
+ * Object keys are sorted, so payloads that only differ in key order share a key.
+ *
+ * @param {string} url - The endpoint
+ * @param {Object} body - The request body
+ * @returns {string} - The key
+ */
+function requestKey(url, body) {
+    const stableStringify = (value) => {
+        if (Array.isArray(value)) {
+            return `[${value.map(stableStringify).join(',')}]`;
+        }
+        if (value && typeof value === 'object') {
+            return `{${Object.keys(value).sort().map(key => `${JSON.stringify(key)}:${stableStringify(value[key])}`).join(',')}}`;
+        }
+        return JSON.stringify(value);
+    };
+    return `${new URL(url, window.location.href).pathname} ${stableStringify(body)}`;
+}
+
+/**
+ * Function to open the IndexedDB database that keeps results across page loads.
+ *
+ * @returns {Promise<IDBDatabase|null>} - The database, or null if IndexedDB is unavailable
+ */
+function openResultDb() {
+    if (!resultDbPromise) {
+        resultDbPromise = new Promise(resolve => {
+            if (!window.indexedDB) {
+                resolve(null);
+                return;
+            }
+            const request = indexedDB.open(RESULT_DB_NAME, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(RESULT_STORE_NAME);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => resolve(null); // e.g. private browsing; the memory cache still works
+        });
+    }
+    return resultDbPromise;
+}
+
+/**
+ * Function to look up a stored result, in memory first and then in IndexedDB.
+ *
+ * @param {string} key - The request key
+ * @returns {Promise<Object|null>} - The result, or null if none is stored or it expired
+ */
+async function readStoredResult(key) {
+    let entry = memoryResults.get(key);
+    if (!entry) {
+        const db = await openResultDb();
+        if (db) {
+            entry = await new Promise(resolve => {
+                const request = db.transaction(RESULT_STORE_NAME).objectStore(RESULT_STORE_NAME).get(key);
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => resolve(undefined);
+            });
+        }
+    }
+    if (!entry) {
+        return null;
+    }
+    if (Date.now() - entry.storedAt > RESULT_TTL_MS) {
+        forgetResult(key);
+        return null;
+    }
+    rememberResult(key, entry);
+    return entry.result;
+}
+
+/**
+ * Function to keep a result in the in-memory cache, evicting the least recently used one.
+ *
+ * @param {string} key - The request key
+ * @param {Object} entry - { result, storedAt }
+ */
+function rememberResult(key, entry) {
+    memoryResults.delete(key);
+    memoryResults.set(key, entry);
+    if (memoryResults.size > MEMORY_CACHE_SIZE) {
+        memoryResults.delete(memoryResults.keys().next().value);
+    }
+}
+
+/**
+ * Function to remove an expired result from memory and from IndexedDB.
+ *
+ * @param {string} key - The request key
+ */
+async function forgetResult(key) {
+    memoryResults.delete(key);
+    const db = await openResultDb();
+    if (db) {
+        db.transaction(RESULT_STORE_NAME, 'readwrite').objectStore(RESULT_STORE_NAME).delete(key);
+    }
+}
+
+/**
+ * Function to store a result in memory and in IndexedDB.
+ *
+ * @param {string} key - The request key
+ * @param {Object} result - The result to store
+ */
+async function storeResult(key, result) {
+    const entry = { result, storedAt: Date.now() };
+    rememberResult(key, entry);
+    const db = await openResultDb();
+    if (db) {
+        db.transaction(RESULT_STORE_NAME, 'readwrite').objectStore(RESULT_STORE_NAME).put(entry, key);
+    }
+}
+
+/**
+ * Function to start a streaming request that several callers can share.
+ * The request is aborted once every caller has gone, e.g. all their panels were closed.
+ *
+ * @param {string} key - The request key
+ * @param {string} url - The streaming endpoint to call
+ * @param {Object} body - The request body
+ * @returns {Object} - The shared request, with a subscribe(onDelta, signal) function
+ */
+function startSharedRequest(key, url, body) {
+    const controller = new AbortController();
+    const listeners = new Set();
+    let result = null;
+    let errorData = null;
+
+    const done = postEventStream(url, body, {
+        delta: (chunk) => listeners.forEach(listener => listener.onDelta && listener.onDelta(chunk)),
+        result: (data) => { result = data; },
+        error: (data) => { errorData = data; }
+    }, controller.signal).then(() => {
+        if (result) {
+            storeResult(key, result); // Only results are cached; errors are retried on the next click
+            return result;
+        }
+        return errorData || { error: 'No result received' };
+    }).finally(() => {
+        if (inFlightRequests.get(key) === shared) {
+            inFlightRequests.delete(key);
+        }
+    });
+
+    const shared = {
+        subscribe(onDelta, signal) {
+            const listener = { onDelta };
+            listeners.add(listener);
+            return new Promise((resolve, reject) => {
+                done.then(resolve, reject);
+                if (signal) {
+                    signal.addEventListener('abort', () => {
+                        listeners.delete(listener);
+                        if (listeners.size === 0) {
+                            // Nobody is waiting any more; a later click starts a fresh request
+                            inFlightRequests.delete(key);
+                            controller.abort();
+                        }
+                        reject(new DOMException('The request was cancelled', 'AbortError'));
+                    }, { once: true });
+                }
+            });
+        }
+    };
+    inFlightRequests.set(key, shared);
+    return shared;
+}
+
+/**
+ * Function to get the result of a streaming endpoint through the client-side request layer.
+ * Stored results are returned without a request, and a caller asking for a result that is
+ * already being fetched joins that request instead of sending another one. Deltas are only
+ * delivered while a request is running, so a stored result arrives without progress updates.
+ *
+ * @param {string} url - The streaming endpoint to call
+ * @param {Object} body - The request body, sent as JSON
+ * @param {Object} [options] - { onDelta: callback for 'delta' events, signal: AbortSignal of the caller }
+ * @returns {Promise<Object>} - The result, or an object with an 'error' key
+ */
+async function requestResult(url, body, { onDelta, signal } = {}) {
+    const key = requestKey(url, body);
+    const stored = await readStoredResult(key);
+    if (stored) {
+        return stored;
+    }
+    if (signal && signal.aborted) {
+        throw new DOMException('The request was cancelled', 'AbortError');
+    }
+    const shared = inFlightRequests.get(key) || startSharedRequest(key, url, body);
+    return shared.subscribe(onDelta, signal);
+}
+
+/**
+ * Function to add a result panel (explanation, application guide or comparison) to the results.
+ * If a panel for the same request is already open, it is scrolled into view instead and no
+ * new request is made, so double clicks do nothing.
+ *
+ * @param {string} key - The request key of the panel
+ * @param {string} className - CSS class of the panel
+ * @param {string} loadingHtml - Content shown while the result loads
+ * @returns {HTMLElement|null} - The new panel, or null if one is already open
+ */
+function openPanel(key, className, loadingHtml) {
+    const resultDiv = document.getElementById('result');
+    const existing = Array.from(resultDiv.querySelectorAll('[data-request-key]')).find(panel => panel.dataset.requestKey === key);
+    if (existing) {
+        existing.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+        return null;
+    }
+    const panel = document.createElement('div');
+    panel.className = className;
+    panel.dataset.panel = '';
+    panel.dataset.requestKey = key;
+    panel.requestController = new AbortController(); // Aborted when the panel is closed or the results are replaced
+    panel.innerHTML = loadingHtml;
+    resultDiv.appendChild(panel);
+    return panel;
+}
+
+/**
+ * Function to show an error in a panel. The panel stops counting as open, so clicking the
+ * button again retries the request.
+ *
+ * @param {HTMLElement} panel - The panel
+ * @param {string} html - The error content
+ */
+function showPanelError(panel, html) {
+    delete panel.dataset.requestKey;
+    panel.innerHTML = html;
+}
+
+/**
+ * Function behind the Close button of a panel: cancels its request if it is still running
+ * and removes the panel.
+ *
+ * @param {HTMLElement} button - The Close button that was clicked
+ */
+function closePanel(button) {
+    const panel = button.closest('[data-panel]');
+    panel.requestController.abort();
+    panel.remove();
+}
+
 // Keep the original code commented out for reference
 // let selectedFramework = null; // Variable to store the selected framework
 // 
@@ -195,194 +539,194 @@ document.getElementById('submitBtn').addEventListener('click', async () => {
  * Function to explain a framework in detail.
  * This function calls the framework explainer agent to get comprehensive information
  * about a specific framework, including how it works, steps to apply it, examples,
- * and limitations.
+ * and limitations. Explanations fetched before are shown without a request.
  * 
  * @param {string} frameworkName - The name of the framework to explain
  */
 async function explainFramework(frameworkName) {
-    const resultDiv = document.getElementById('result');
-    const detailsDiv = document.createElement('div');
-    detailsDiv.className = 'framework-details';
-    detailsDiv.innerHTML = '<p>Loading explanation...</p>';
+    const url = 'http://127.0.0.1:5000/explain/stream';
+    const body = { framework_name: frameworkName };
     
     // Add the details div after the framework cards
-    resultDiv.appendChild(detailsDiv);
+    const detailsDiv = openPanel(requestKey(url, body), 'framework-details', '<p>Loading explanation...</p>');
+    if (!detailsDiv) {
+        return;
+    }
     
     try {
-        // Call the framework explainer agent via the /explain endpoint
-        const response = await fetch('http://127.0.0.1:5000/explain', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                framework_name: frameworkName
-            }),
+        // Call the framework explainer agent via the streaming /explain endpoint
+        let received = 0;
+        const data = await requestResult(url, body, {
+            signal: detailsDiv.requestController.signal,
+            onDelta: (chunk) => {
+                // Show progress while the response is being generated
+                received += chunk.text.length;
+                detailsDiv.innerHTML = `<p>Loading explanation... (${received} characters received)</p>`;
+            }
         });
-
-        if (response.ok) {
-            const data = await response.json();
-            
-            detailsDiv.innerHTML = `
-                <div class="details-header">
-                    <h2>${frameworkName} - Detailed Explanation</h2>
-                    <button onclick="this.parentElement.parentElement.remove()">Close</button>
-                </div>
-                <div class="details-content">
-                    <h3>How it Works</h3>
-                    <p>${data.explanation}</p>
-                    
-                    <h3>Steps to Apply</h3>
-                    <ol>
-                        ${data.steps.map(step => `<li>${step}</li>`).join('')}
-                    </ol>
-                    
-                    <h3>When to Use</h3>
-                    <ul>
-                        ${data.examples.map(example => `<li>${example}</li>`).join('')}
-                    </ul>
-                    
-                    <h3>Limitations</h3>
-                    <ul>
-                        ${data.limitations.map(limitation => `<li>${limitation}</li>`).join('')}
-                    </ul>
-                </div>
-            `;
-        } else {
-            const errorData = await response.json();
-            detailsDiv.innerHTML = `<p>Error: ${errorData.error}</p>`;
+        if (data.error) {
+            showPanelError(detailsDiv, `<p>Error: ${data.error}</p>`);
+            return;
         }
+        detailsDiv.innerHTML = `
+            <div class="details-header">
+                <h2>${frameworkName} - Detailed Explanation</h2>
+                <button onclick="closePanel(this)">Close</button>
+            </div>
+            <div class="details-content">
+                <h3>How it Works</h3>
+                <p>${data.explanation}</p>
+            
+                <h3>Steps to Apply</h3>
+                <ol>
+                    ${data.steps.map(step => `<li>${step}</li>`).join('')}
+                </ol>
+            
+                <h3>When to Use</h3>
+                <ul>
+                    ${data.examples.map(example => `<li>${example}</li>`).join('')}
+                </ul>
+            
+                <h3>Limitations</h3>
+                <ul>
+                    ${data.limitations.map(limitation => `<li>${limitation}</li>`).join('')}
+                </ul>
+            </div>
+        `;
     } catch (error) {
+        if (error.name === 'AbortError') {
+            return; // The panel was closed or the results were replaced
+        }
         console.error('Fetch error:', error);
-        detailsDiv.innerHTML = '<p>Error retrieving explanation. Please try again.</p>';
+        showPanelError(detailsDiv, '<p>Error retrieving explanation. Please try again.</p>');
     }
 }
 
 /**
  * Function to apply a framework to the user's situation.
  * This function calls the framework application agent to get tailored guidance
- * for applying a specific framework to the user's unique situation.
+ * for applying a specific framework to the user's unique situation. Guides fetched
+ * before for the same framework and situation are shown without a request.
  * 
  * @param {string} frameworkName - The name of the framework to apply
  * @param {string} situationEncoded - URL-encoded description of the user's situation
  */
 async function applyFramework(frameworkName, situationEncoded) {
     const situation = decodeURIComponent(situationEncoded);
-    const resultDiv = document.getElementById('result');
-    const applicationDiv = document.createElement('div');
-    applicationDiv.className = 'framework-application';
-    applicationDiv.innerHTML = '<p>Loading application guide...</p>';
+    const url = 'http://127.0.0.1:5000/apply/stream';
+    const body = { framework_name: frameworkName, situation: situation };
     
     // Add the application div after the framework cards
-    resultDiv.appendChild(applicationDiv);
+    const applicationDiv = openPanel(requestKey(url, body), 'framework-application', '<p>Loading application guide...</p>');
+    if (!applicationDiv) {
+        return;
+    }
     
     try {
-        // Call the framework application agent via the /apply endpoint
-        const response = await fetch('http://127.0.0.1:5000/apply', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                framework_name: frameworkName,
-                situation: situation
-            }),
+        // Call the framework application agent via the streaming /apply endpoint
+        let received = 0;
+        const data = await requestResult(url, body, {
+            signal: applicationDiv.requestController.signal,
+            onDelta: (chunk) => {
+                // Show progress while the response is being generated
+                received += chunk.text.length;
+                applicationDiv.innerHTML = `<p>Loading application guide... (${received} characters received)</p>`;
+            }
         });
-
-        if (response.ok) {
-            const data = await response.json();
+        if (data.error) {
+            showPanelError(applicationDiv, `<p>Error: ${data.error}</p>`);
+            return;
+        }
+        applicationDiv.innerHTML = `
+            <div class="application-header">
+                <h2>Applying ${frameworkName} to Your Situation</h2>
+                <button onclick="closePanel(this)">Close</button>
+            </div>
+            <div class="application-content">
+                <h3>Key Questions to Answer</h3>
+                <ul>
+                    ${data.questions.map(question => `<li>${question}</li>`).join('')}
+                </ul>
             
-            applicationDiv.innerHTML = `
-                <div class="application-header">
-                    <h2>Applying ${frameworkName} to Your Situation</h2>
-                    <button onclick="this.parentElement.parentElement.remove()">Close</button>
+                <h3>Application Template</h3>
+                <div class="template">
+                    ${data.template}
                 </div>
-                <div class="application-content">
-                    <h3>Key Questions to Answer</h3>
-                    <ul>
-                        ${data.questions.map(question => `<li>${question}</li>`).join('')}
-                    </ul>
-                    
-                    <h3>Application Template</h3>
-                    <div class="template">
-                        ${data.template}
-                    </div>
-                    
-                    <h3>Interpreting Results</h3>
-                    <p>${data.interpretation_guidance}</p>
-                </div>
-            `;
-        } else {
-            const errorData = await response.json();
-            applicationDiv.innerHTML = `<p>Error: ${errorData.error}</p>`;
-        }
+            
+                <h3>Interpreting Results</h3>
+                <p>${data.interpretation_guidance}</p>
+            </div>
+        `;
     } catch (error) {
+        if (error.name === 'AbortError') {
+            return; // The panel was closed or the results were replaced
+        }
         console.error('Fetch error:', error);
-        applicationDiv.innerHTML = '<p>Error retrieving application guide. Please try again.</p>';
+        showPanelError(applicationDiv, '<p>Error retrieving application guide. Please try again.</p>');
     }
 }
 
 /**
  * Function to compare multiple frameworks for a specific situation.
  * This function calls the framework comparison agent to get a comparative analysis
- * of multiple frameworks in the context of the user's situation.
+ * of multiple frameworks in the context of the user's situation. Comparisons fetched
+ * before for the same frameworks and situation are shown without a request.
  * 
  * @param {Array} frameworkNames - Array of framework names to compare
  * @param {string} situationEncoded - URL-encoded description of the user's situation
  */
 async function compareFrameworks(frameworkNames, situationEncoded) {
     const situation = decodeURIComponent(situationEncoded);
-    const resultDiv = document.getElementById('result');
-    const comparisonDiv = document.createElement('div');
-    comparisonDiv.className = 'frameworks-comparison';
-    comparisonDiv.innerHTML = '<p>Loading comparison...</p>';
+    const url = 'http://127.0.0.1:5000/compare/stream';
+    const body = { framework_names: frameworkNames, situation: situation };
     
     // Add the comparison div after the framework cards
-    resultDiv.appendChild(comparisonDiv);
+    const comparisonDiv = openPanel(requestKey(url, body), 'frameworks-comparison', '<p>Loading comparison...</p>');
+    if (!comparisonDiv) {
+        return;
+    }
     
     try {
-        // Call the framework comparison agent via the /compare endpoint
-        const response = await fetch('http://127.0.0.1:5000/compare', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                framework_names: frameworkNames,
-                situation: situation
-            }),
+        // Call the framework comparison agent via the streaming /compare endpoint
+        let received = 0;
+        const data = await requestResult(url, body, {
+            signal: comparisonDiv.requestController.signal,
+            onDelta: (chunk) => {
+                // Show progress while the response is being generated
+                received += chunk.text.length;
+                comparisonDiv.innerHTML = `<p>Loading comparison... (${received} characters received)</p>`;
+            }
         });
-
-        if (response.ok) {
-            const data = await response.json();
-            
-            comparisonDiv.innerHTML = `
-                <div class="comparison-header">
-                    <h2>Framework Comparison</h2>
-                    <button onclick="this.parentElement.parentElement.remove()">Close</button>
+        if (data.error) {
+            showPanelError(comparisonDiv, `<p>Error: ${data.error}</p>`);
+            return;
+        }
+        comparisonDiv.innerHTML = `
+            <div class="comparison-header">
+                <h2>Framework Comparison</h2>
+                <button onclick="closePanel(this)">Close</button>
+            </div>
+            <div class="comparison-content">
+                <h3>Feature Comparison</h3>
+                <div class="comparison-table">
+                    ${data.comparison}
                 </div>
-                <div class="comparison-content">
-                    <h3>Feature Comparison</h3>
-                    <div class="comparison-table">
-                        ${data.comparison}
-                    </div>
-                    
-                    <h3>Pros and Cons for Your Situation</h3>
-                    <div class="pros-cons">
-                        ${data.pros_cons}
-                    </div>
-                    
-                    <h3>Recommendation</h3>
-                    <p>${data.recommendation}</p>
+            
+                <h3>Pros and Cons for Your Situation</h3>
+                <div class="pros-cons">
+                    ${data.pros_cons}
                 </div>
-            `;
-        } else {
-            const errorData = await response.json();
-            comparisonDiv.innerHTML = `<p>Error: ${errorData.error}</p>`;
-        }
+            
+                <h3>Recommendation</h3>
+                <p>${data.recommendation}</p>
+            </div>
+        `;
     } catch (error) {
+        if (error.name === 'AbortError') {
+            return; // The panel was closed or the results were replaced
+        }
         console.error('Fetch error:', error);
-        comparisonDiv.innerHTML = '<p>Error retrieving comparison. Please try again.</p>';
+        showPanelError(comparisonDiv, '<p>Error retrieving comparison. Please try again.</p>');
     }
 }
 
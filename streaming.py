@@ -0,0 +1,113 @@
+import json
+
+
+def sse_event(event, data):
+    """
+    Format one Server-Sent Event.
+
+    Args:
+        event (str): The event name, e.g. "framework", "delta", "result", "error" or "done"
+        data: A JSON-serializable payload
+
+    Returns:
+        str: The event in text/event-stream wire format
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iter_completion_deltas(lines):
+    """
+    Extract content deltas from a streamed chat-completions response.
+
+    The API sends one "data: {...}" line per chunk and ends with "data: [DONE]".
+    Blank keep-alive lines and chunks without content (e.g. the role header or the
+    final finish_reason chunk) are skipped.
+
+    Args:
+        lines (iterable): Decoded lines of the response body
+
+    Yields:
+        str: Each piece of generated content in order
+    """
+    for line in lines:
+        if not line or not line.startswith('data:'):
+            continue
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            return
+        chunk = json.loads(payload)
+        choices = chunk.get('choices') or []
+        if not choices:
+            continue
+        content = (choices[0].get('delta') or {}).get('content')
+        if content:
+            yield content
+
+
+class JSONArrayItemParser:
+    """
+    Incrementally picks complete items out of a JSON array as its text streams in.
+
+    The suggester answers with a JSON array of framework objects. Rather than waiting
+    for the closing bracket, feed() tracks string/escape state and nesting depth across
+    chunks and returns the text of every top-level item as soon as it is complete, so
+    each framework can be sent to the browser while the rest is still being generated.
+    Text before the opening bracket (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        """Initialize an empty parser."""
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self.finished = False
+
+    def feed(self, chunk):
+        """
+        Consume the next piece of streamed text.
+
+        Args:
+            chunk (str): The next piece of the response
+
+        Returns:
+            list: The decoded items that were completed by this chunk
+        """
+        items = []
+        for char in chunk:
+            if self.finished:
+                break
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                continue
+
+            if self._depth > 0:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 0:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # The closing bracket of the outer array
+                    self.finished = True
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(json.loads(''.join(self._buffer)))
+                    self._buffer = []
+        return items
@@ -0,0 +1,211 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()  # Load environment variables from .env file
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+
+
+def env_flag(name, default=False):
+    """
+    Read a boolean flag from the environment.
+
+    Args:
+        name (str): The environment variable to read
+        default (bool): The value to use when the variable is not set
+
+    Returns:
+        bool: True for values like "1", "true", "yes" or "on", False otherwise
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class PooledTransport:
+    """
+    Pooled, keep-alive HTTP transport for talking to the completions API.
+
+    A bare requests.post() opens a new TCP+TLS connection for every call. This class
+    wraps a single requests.Session whose connection pool is shared by every agent,
+    so a busy worker reuses warm connections instead of paying the handshake on each
+    /parse, /explain, /apply and /compare request.
+
+    The pool is sized for the number of worker threads that may call the API at the
+    same time. Connections beyond pool_maxsize are still opened when needed, but are
+    discarded instead of being kept alive once the request finishes.
+    """
+
+    def __init__(self, base_url=None, pool_connections=None, pool_maxsize=None, keep_alive=None):
+        """
+        Initialize the transport with pool configuration.
+
+        Any argument left as None is read from the environment, falling back to a default.
+
+        Args:
+            base_url (str): Base URL of the API (env LLM_API_BASE, default: "https://api.openai.com/v1")
+            pool_connections (int): Number of per-host pools to cache (env LLM_POOL_CONNECTIONS, default: 4)
+            pool_maxsize (int): Connections kept alive per host (env LLM_POOL_MAXSIZE, default: 32)
+            keep_alive (bool): Whether to reuse connections between requests (env LLM_KEEP_ALIVE, default: True)
+        """
+        if base_url is None:
+            base_url = os.getenv('LLM_API_BASE', DEFAULT_API_BASE)
+        if pool_connections is None:
+            pool_connections = int(os.getenv('LLM_POOL_CONNECTIONS', '4'))
+        if pool_maxsize is None:
+            pool_maxsize = int(os.getenv('LLM_POOL_MAXSIZE', '32'))
+        if keep_alive is None:
+            keep_alive = env_flag('LLM_KEEP_ALIVE', True)
+
+        self.base_url = base_url.rstrip('/')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+
+        self._open_session()
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.preconnect_failures = 0
+
+    def _open_session(self):
+        """Create the session and its connection pool."""
+        self.adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        if not self.keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def reset(self):
+        """
+        Start with an empty connection pool in a process forked after the transport was created.
+
+        Pooled sockets inherited from the parent are shared with it, and two processes
+        reading responses from one socket would corrupt each other's responses. They are
+        abandoned rather than closed, so the parent's connections stay usable.
+        """
+        self._open_session()
+        self._lock = threading.Lock()
+
+    def url(self, path, base_url=None):
+        """
+        Build an absolute URL for an API path.
+
+        Args:
+            path (str): Path relative to the base URL, e.g. "/chat/completions"
+            base_url (str): Base URL to use instead of the transport's own (default: None)
+
+        Returns:
+            str: The absolute URL
+        """
+        return f"{(base_url or self.base_url).rstrip('/')}/{path.lstrip('/')}"
+
+    def post(self, path, base_url=None, **kwargs):
+        """
+        Send a POST request through the shared connection pool.
+
+        The session keeps a pool per host, so requests to several backends share one
+        transport and each backend still gets its own warm connections.
+
+        Args:
+            path (str): Path relative to the base URL, e.g. "/chat/completions"
+            base_url (str): Base URL of the backend to send to (default: the transport's base URL)
+            **kwargs: Extra arguments passed through to requests.Session.post
+
+        Returns:
+            requests.Response: The response from the API
+        """
+        with self._lock:
+            self.requests_sent += 1
+        return self.session.post(self.url(path, base_url), **kwargs)
+
+    def preconnect(self, count=1, timeout=5, base_url=None):
+        """
+        Open warm connections to the API host ahead of the first real request.
+
+        Each warm-up request is a HEAD to the base URL. The status code does not matter:
+        once the response is read the connection goes back into the pool ready for reuse.
+        Failures are counted and otherwise ignored so a slow or unreachable API never
+        blocks startup.
+
+        Args:
+            count (int): Number of connections to open, capped at pool_maxsize
+            timeout (float): Seconds to wait for each warm-up request
+            base_url (str): Base URL of the backend to warm up (default: the transport's base URL)
+
+        Returns:
+            int: The number of connections that were opened successfully
+        """
+        count = max(1, min(count, self.pool_maxsize))
+        opened = []
+
+        def warm():
+            try:
+                self.session.head(base_url or self.base_url, timeout=timeout)
+                opened.append(True)
+            except requests.RequestException:
+                with self._lock:
+                    self.preconnect_failures += 1
+
+        # Run the warm-up requests concurrently, otherwise they would all reuse the same connection
+        threads = [threading.Thread(target=warm, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(opened)
+
+    def stats(self):
+        """
+        Report connection-reuse counters for the pool.
+
+        Returns:
+            dict: Requests sent, connections opened and reused, plus the pool configuration
+        """
+        connections_opened = 0
+        pool_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+            pool_requests += pool.num_requests
+
+        return {
+            'base_url': self.base_url,
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'keep_alive': self.keep_alive,
+            'requests_sent': self.requests_sent,
+            'connections_opened': connections_opened,
+            'connections_reused': max(0, pool_requests - connections_opened),
+            'preconnect_failures': self.preconnect_failures,
+        }
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+
+def get_shared_transport():
+    """
+    Return the process-wide transport shared by all agents, creating it on first use.
+
+    Returns:
+        PooledTransport: The shared transport
+    """
+    global _shared_transport
+    if _shared_transport is None:
+        with _shared_transport_lock:
+            if _shared_transport is None:
+                _shared_transport = PooledTransport()
+    return _shared_transport
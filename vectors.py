@@ -0,0 +1,115 @@
+import re
+import zlib
+import numpy as np
+
+# Common English words that carry no information about the situation
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves i'm i've i'd i'll
+""".split())
+
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens, dropping stop words.
+
+    Args:
+        text (str): The text to tokenize
+
+    Returns:
+        list: The remaining tokens in order
+    """
+    words = re.findall(r"[a-z0-9][a-z0-9'\-]*", text.lower())
+    return [word for word in words if word not in STOP_WORDS]
+
+
+class HashingVectorizer:
+    """
+    Turns text into fixed-width term-frequency vectors using the hashing trick.
+
+    Unigrams and bigrams are hashed into a fixed number of buckets with CRC32, so no
+    vocabulary has to be built or stored and vectors from different processes line up.
+    Term counts are dampened with 1 + log(count). The vectorizer has no state and runs
+    fully offline; callers apply their own IDF weighting on top if they need it.
+    """
+
+    def __init__(self, n_features=4096, ngram_range=(1, 2)):
+        """
+        Initialize the vectorizer.
+
+        Args:
+            n_features (int): Number of hash buckets, i.e. the vector width (default: 4096)
+            ngram_range (tuple): Smallest and largest n-gram size to include (default: (1, 2))
+        """
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+
+    def features(self, text):
+        """
+        Extract the n-grams for a piece of text.
+
+        Args:
+            text (str): The text to process
+
+        Returns:
+            list: The n-grams as space-joined strings
+        """
+        tokens = tokenize(text)
+        low, high = self.ngram_range
+        grams = []
+        for n in range(low, high + 1):
+            for i in range(len(tokens) - n + 1):
+                grams.append(" ".join(tokens[i:i + n]))
+        return grams
+
+    def transform_one(self, text):
+        """
+        Vectorize a single text.
+
+        Args:
+            text (str): The text to vectorize
+
+        Returns:
+            numpy.ndarray: A float32 vector of length n_features (not normalized)
+        """
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        for gram in self.features(text):
+            vector[zlib.crc32(gram.encode('utf-8')) % self.n_features] += 1.0
+        nonzero = vector > 0
+        vector[nonzero] = 1.0 + np.log(vector[nonzero])
+        return vector
+
+    def transform(self, texts):
+        """
+        Vectorize several texts at once.
+
+        Args:
+            texts (list): The texts to vectorize
+
+        Returns:
+            numpy.ndarray: A float32 matrix with one row per text (not normalized)
+        """
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.transform_one(text)
+        return matrix
+
+
+def l2_normalize(matrix):
+    """
+    Scale vectors to unit length so dot products become cosine similarities.
+
+    Args:
+        matrix (numpy.ndarray): A vector or a matrix with one vector per row
+
+    Returns:
+        numpy.ndarray: The normalized vector or matrix; all-zero rows are left as zeros
+    """
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms